@@ -1,43 +1,163 @@
 import csv
 from typing import List, Dict
+
+import numpy as np
+
 from utils import parse_time_to_minutes
 
-def MOST(requests, session_start_minute: int, session_end_minute: int):
+# Risoluzione di default degli slot, in minuti
+SLOT_MINUTES = 10
+
+
+def _mandatory_intervals(requests):
+    """
+    Intervalli [β_i, α_i + t_i) in cui la richiesta i è sicuramente in corso,
+    qualunque sia l'istante di inizio scelto nella finestra [α_i, β_i].
+
+    :return: due array (inizi, fini) in minuti.
+    """
+    starts = np.empty(len(requests))
+    ends = np.empty(len(requests))
+    for idx, req in enumerate(requests):
+        starts[idx] = parse_time_to_minutes(req['max_time_begin'])
+        ends[idx] = parse_time_to_minutes(req['min_time_begin']) + req['duration']
+    return starts, ends
+
+
+def _slot_ranges(starts, ends, session_start_minute, n_s, slot_minutes):
+    """
+    Per ogni intervallo, primo e ultimo slot t (0..n_s) con
+    β_i <= session_start + t * slot_minutes < α_i + t_i.
+    """
+    first = np.ceil((starts - session_start_minute) / slot_minutes).astype(int)
+    last = np.ceil((ends - session_start_minute) / slot_minutes).astype(int) - 1
+    return np.clip(first, 0, n_s + 1), np.clip(last, -1, n_s)
+
+
+def _slot_counts(rows, n_rows, starts, ends, session_start_minute, n_s, slot_minutes):
+    """
+    Conteggio delle richieste attive per riga e per slot con un array delle differenze:
+    +1 al primo slot dell'intervallo, -1 dopo l'ultimo, poi somma cumulativa.
+
+    :param rows: riga (sottoinsieme, paziente, ...) a cui sommare ciascun intervallo.
+    :return: matrice n_rows × (n_s + 1).
+    """
+    first, last = _slot_ranges(starts, ends, session_start_minute, n_s, slot_minutes)
+    active = first <= last
+
+    # una colonna di guardia per il -1 dopo l'ultimo slot
+    diff = np.zeros((n_rows, n_s + 2), dtype=int)
+    np.add.at(diff, (rows[active], first[active]), 1)
+    np.add.at(diff, (rows[active], last[active] + 1), -1)
+    return np.cumsum(diff[:, :n_s + 1], axis=1)
+
+
+def _peak_exact(starts, ends, session_start_minute, session_end_minute):
+    """
+    Massimo numero di intervalli sovrapposti in un qualsiasi istante di
+    [session_start, session_end], con una scansione degli eventi ordinati.
+    """
+    starts = np.maximum(starts, session_start_minute)
+    ends = np.minimum(ends, session_end_minute + 1e-9)
+    valid = starts < ends
+    if not valid.any():
+        return 0
+    times = np.concatenate((starts[valid], ends[valid]))
+    deltas = np.concatenate((np.ones(valid.sum(), dtype=int), -np.ones(valid.sum(), dtype=int)))
+    # a parità di istante le fini precedono gli inizi: gli intervalli sono semiaperti
+    order = np.lexsort((deltas, times))
+    return int(np.cumsum(deltas[order]).max())
+
+
+def MOST(requests, session_start_minute: int, session_end_minute: int, slot_minutes=SLOT_MINUTES):
     """
     Calcola il numero massimo di operatori necessari contemporaneamente
     in una sessione (definita da orario di inizio/fine in minuti).
 
+    La richiesta i occupa sicuramente un operatore nell'intervallo [β_i, α_i + t_i).
+    La sessione viene campionata agli istanti session_start + t * slot_minutes,
+    per t = 0..(session_end - session_start) // slot_minutes, e per ogni istante
+    si contano le richieste attive con un array delle differenze (+1 al primo
+    slot dell'intervallo, -1 dopo l'ultimo, somma cumulativa), in O(R + slot).
+    Con slot_minutes=None si considera ogni istante della sessione, con una
+    scansione degli estremi ordinati in O(R log R).
+
     :param requests: elenco delle richieste (lista di dict):
     :param session_start_minute: orario di inizio sessione in minuti (es: 540 = 9:00)
     :param session_end_minute: orario di fine sessione in minuti (es: 780 = 13:00)
+    :param slot_minutes: risoluzione degli slot in minuti, None per la valutazione esatta.
     :return: intero, numero minimo di operatori richiesti nello stesso momento durante la sessione
     """
-    # Calcola la durata in minuti e quanti "slot" di 10 minuti contiene
-    session_duration = session_end_minute - session_start_minute
-    n_s = session_duration // 5
+    return MOST_batch([requests], session_start_minute, session_end_minute, slot_minutes)[0]
+
+
+def MOST_batch(request_subsets, session_start_minute: int, session_end_minute: int, slot_minutes=SLOT_MINUTES):
+    """
+    Calcola MOST per più sottoinsiemi di richieste della stessa sessione in una
+    sola chiamata (es. tutti i cluster di una configurazione k): gli orari di
+    ogni richiesta vengono convertiti una sola volta e i conteggi per slot di
+    tutti i sottoinsiemi vengono accumulati in un'unica matrice.
+
+    :param request_subsets: lista di liste di richieste.
+    :return: lista con il picco di richieste contemporanee di ciascun sottoinsieme.
+    """
+    # Conversione degli orari una sola volta per richiesta, anche se compare in più sottoinsiemi
+    unique = {}
+    for subset in request_subsets:
+        for req in subset:
+            unique.setdefault(id(req), req)
+    position = {key: idx for idx, key in enumerate(unique)}
+    starts, ends = _mandatory_intervals(list(unique.values()))
 
-    # T[i][t] = numero di operatori richiesti dalla i-esima richiesta
-    #           allo slot t, se è attiva, altrimenti 0
-    T = []
+    subset_idx = np.fromiter((s for s, subset in enumerate(request_subsets) for _ in subset), dtype=int)
+    req_idx = np.fromiter((position[id(req)] for subset in request_subsets for req in subset), dtype=int)
 
-    for req in requests:
-        alpha_i = parse_time_to_minutes(req['min_time_begin'])
-        beta_i  = parse_time_to_minutes(req['max_time_begin'])   
-        t_i     = req['duration']
+    if slot_minutes is None:
+        return [
+            _peak_exact(starts[req_idx[subset_idx == s]], ends[req_idx[subset_idx == s]],
+                        session_start_minute, session_end_minute)
+            for s in range(len(request_subsets))
+        ]
 
-        row = []
-        for t in range(n_s + 1):
-            time_slot = session_start_minute + (t * 10)
-            
-            if beta_i <= time_slot < (alpha_i + t_i):
-                row.append(1)
-            else:
-                row.append(0)
-        T.append(row)
+    n_s = (session_end_minute - session_start_minute) // slot_minutes
+    NO_t = _slot_counts(subset_idx, len(request_subsets), starts[req_idx], ends[req_idx],
+                        session_start_minute, n_s, slot_minutes)
 
+    return [int(peak) for peak in NO_t.max(axis=1, initial=0)]
 
-    NO_t = [0] * (n_s + 1)
-    for t in range(n_s + 1):
-        NO_t[t] = sum(T[i][t] for i in range(len(T)))
 
-    return max(NO_t)
\ No newline at end of file
+def patient_profiles(requests, patient_ids, session_start_minute: int, session_end_minute: int, slot_minutes=SLOT_MINUTES):
+    """
+    Profili di attività per paziente, calcolati una sola volta per sessione: poiché
+    i conteggi per slot sono additivi, il profilo di un cluster è la somma dei
+    profili dei suoi pazienti e MOST del cluster ne è il massimo.
+
+    :param requests: richieste della sessione (Rds).
+    :param patient_ids: id dei pazienti, nell'ordine delle righe dei profili (es. Pds).
+    :return: (profiles, durations) con profiles[p, t] numero di richieste del paziente p
+             attive nello slot t e durations[p] somma delle durate delle sue richieste.
+    """
+    position = {pid: idx for idx, pid in enumerate(patient_ids)}
+    rows = np.fromiter((position[req['project_id']] for req in requests), dtype=int, count=len(requests))
+    starts, ends = _mandatory_intervals(requests)
+
+    n_s = (session_end_minute - session_start_minute) // slot_minutes
+    profiles = _slot_counts(rows, len(patient_ids), starts, ends, session_start_minute, n_s, slot_minutes)
+    durations = np.bincount(rows, weights=[req['duration'] for req in requests], minlength=len(patient_ids))
+    return profiles, durations
+
+
+def cluster_concurrency(profiles, durations, labels, n_clusters):
+    """
+    MOST e durata totale delle richieste per tutti i cluster di una configurazione,
+    a partire dai profili di patient_profiles.
+
+    :param labels: labels[p] = indice del cluster (0..n_clusters-1) del paziente p,
+                   -1 per i pazienti non assegnati.
+    :return: (mc, total_durations), un valore per cluster.
+    """
+    labels = np.asarray(labels, dtype=int)
+    assigned = labels >= 0
+    counts = np.zeros((n_clusters, profiles.shape[1]), dtype=profiles.dtype)
+    np.add.at(counts, labels[assigned], profiles[assigned])
+    return counts.max(axis=1, initial=0), np.bincount(labels[assigned], weights=durations[assigned], minlength=n_clusters)
@@ -0,0 +1,97 @@
+# Registro delle assegnazioni: stato di ogni richiesta indicizzato per id
+
+ASSIGNED = "assigned"
+UNASSIGNED = "unassigned"
+
+# Motivi di mancata assegnazione, come nelle statistiche di grs_time
+ARRIVAL = "arrival"
+WORK = "work"
+
+
+def unassignment_reason(beta_i, operators, tau_row):
+    """
+    Classifica il motivo per cui una richiesta non è assegnabile agli operatori dati:
+      - "arrival": nessun operatore riesce ad arrivare entro β_i
+      - "work": almeno un operatore arriva in tempo, ma nessuno ha tempo residuo
+        sufficiente per viaggio, attesa e durata della richiesta
+
+    :param tau_row: tempi di viaggio verso la richiesta indicizzati per posizione di partenza.
+    """
+    for op in operators:
+        if op["eo"] + tau_row[op["current_patient_id"]] <= beta_i:
+            return WORK
+    return ARRIVAL
+
+
+class AssignmentLedger:
+    """
+    Stato delle richieste di una pianificazione: per ogni id di richiesta registra
+    stato, operatore, b_i, motivo della mancata assegnazione e sessione (giorno, s).
+
+    Le interrogazioni per singola richiesta sono O(1); i riepiloghi scorrono una
+    sola volta le voci del registro.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries) if entries else {}
+
+    def assign(self, req, op_id, b_i, session=None):
+        self.entries[req["id"]] = {"status": ASSIGNED, "operator": op_id, "b_i": b_i,
+                                   "reason": None, "session": session}
+
+    def unassign(self, req, reason, session=None):
+        self.entries[req["id"]] = {"status": UNASSIGNED, "operator": None, "b_i": None,
+                                   "reason": reason, "session": session}
+
+    def remove(self, req_id):
+        self.entries.pop(req_id, None)
+
+    def record_routes(self, operators, k, session=None):
+        """
+        Registra come assegnate le richieste della sessione corrente presenti in Lo_k[k],
+        ad esempio dopo che local_search le ha spostate tra operatori.
+        """
+        for op in operators:
+            for req, b_i in op["Lo_k"][k][len(op["Lo"]):]:
+                self.assign(req, op["id"], b_i, session)
+
+    def merge(self, other):
+        """
+        Aggiunge le voci di un altro registro (o di un dizionario di voci), sovrascrivendo
+        quelle con lo stesso id. Usato per i registri restituiti dai worker di run_clusters.
+        """
+        self.entries.update(other.entries if isinstance(other, AssignmentLedger) else other)
+
+    def status(self, req_id):
+        entry = self.entries.get(req_id)
+        return entry["status"] if entry else None
+
+    def is_assigned(self, req_id):
+        entry = self.entries.get(req_id)
+        return entry is not None and entry["status"] == ASSIGNED
+
+    def unassigned(self, requests):
+        """
+        Richieste di requests non assegnate, comprese quelle mai registrate.
+        """
+        return [r for r in requests if not self.is_assigned(r["id"])]
+
+    def summary(self, session=None):
+        """
+        Riepilogo nello stesso formato delle statistiche di grs_time, limitato a una
+        sessione (giorno, s) se indicata.
+        """
+        stats = {'total_requests': 0, 'assigned': 0, 'not_assigned': 0, 'arrival_fail': 0, 'work_fail': 0}
+        for entry in self.entries.values():
+            if session is not None and entry["session"] != session:
+                continue
+            stats['total_requests'] += 1
+            if entry["status"] == ASSIGNED:
+                stats['assigned'] += 1
+            else:
+                stats['not_assigned'] += 1
+                if entry["reason"] == ARRIVAL:
+                    stats['arrival_fail'] += 1
+                elif entry["reason"] == WORK:
+                    stats['work_fail'] += 1
+        return stats
@@ -0,0 +1,149 @@
+# Checkpoint binari dello stato consolidato di method_overview dopo ogni (giorno, sessione)
+
+import gzip
+import os
+import pickle
+import re
+
+from utils import SESSION_BOUNDS
+
+# Versione del formato, salvata in ogni checkpoint
+CHECKPOINT_VERSION = 1
+
+_CHECKPOINT_NAME = re.compile(r"checkpoint_D(\d+)_S([a-z])\.pkl\.gz$")
+
+
+def session_key(day, session):
+    """
+    Chiave ordinabile di una sessione: (giorno, posizione della sessione in SESSION_BOUNDS).
+    """
+    return day, list(SESSION_BOUNDS).index(session)
+
+
+def previous_session(day, session):
+    """
+    Sessione che precede (day, session), None per la prima sessione della settimana.
+    """
+    sessions = list(SESSION_BOUNDS)
+    idx = sessions.index(session)
+    if idx > 0:
+        return day, sessions[idx - 1]
+    if day > 0:
+        return day - 1, sessions[-1]
+    return None
+
+
+def checkpoint_path(checkpoint_dir, day, session):
+    return os.path.join(checkpoint_dir, f"checkpoint_D{day}_S{session}.pkl.gz")
+
+
+def operator_state(operators):
+    """
+    Copia serializzabile dello stato degli operatori, senza i campi temporanei
+    per configurazione (Lo_k, wo_k, ...) che vengono ricostruiti a ogni sessione.
+    """
+    return [{key: value for key, value in op.items() if not key.endswith("_k")} for op in operators]
+
+
+def restore_operators(operators, saved):
+    """
+    Ripristina sul posto lo stato salvato da operator_state: i dizionari degli
+    operatori restano gli stessi oggetti, già referenziati dal chiamante.
+    """
+    by_id = {op["id"]: op for op in saved}
+    for op in operators:
+        saved_op = by_id[op["id"]]
+        op.clear()
+        op.update(saved_op)
+
+
+def checkpoint_payload(day, session, state):
+    """
+    Serializza lo stato dopo la sessione (day, session) senza scriverlo: il risultato
+    non dipende più dagli oggetti di state, che possono essere modificati dalle sessioni
+    successive prima che write_checkpoint lo salvi (es. dal thread di SchedulingWriter).
+    """
+    payload = dict(state, version=CHECKPOINT_VERSION, day=day, session=session)
+    return pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_checkpoint(checkpoint_dir, day, session, payload):
+    """
+    Scrive un checkpoint_payload compresso con gzip. Il file viene scritto su un
+    temporaneo e poi rinominato, così un'interruzione durante il salvataggio non
+    lascia checkpoint incompleti.
+
+    :return: percorso del checkpoint.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = checkpoint_path(checkpoint_dir, day, session)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return path
+
+
+def save_checkpoint(checkpoint_dir, day, session, state):
+    """
+    Salva lo stato dopo la sessione (day, session) in un pickle compresso con gzip
+    (checkpoint_payload + write_checkpoint).
+
+    :return: percorso del checkpoint.
+    """
+    return write_checkpoint(checkpoint_dir, day, session, checkpoint_payload(day, session, state))
+
+
+def load_checkpoint(path):
+    with gzip.open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {path} con versione {state.get('version')} non supportata (attesa {CHECKPOINT_VERSION}).")
+    return state
+
+
+def _saved_sessions(checkpoint_dir):
+    """
+    Checkpoint presenti in checkpoint_dir come coppie (session_key, nome del file).
+    """
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    found = []
+    for name in os.listdir(checkpoint_dir):
+        match = _CHECKPOINT_NAME.match(name)
+        if match is None or match.group(2) not in SESSION_BOUNDS:
+            continue
+        found.append((session_key(int(match.group(1)), match.group(2)), name))
+    return found
+
+
+def discard_checkpoints(checkpoint_dir, after=None):
+    """
+    Rimuove i checkpoint delle sessioni successive a after (giorno, sessione), tutti se
+    after è None: dopo aver rielaborato una sessione quelli successivi non sono più
+    coerenti con lo stato e una ripresa non deve partire da lì.
+
+    :return: percorsi rimossi.
+    """
+    removed = []
+    for key, name in _saved_sessions(checkpoint_dir):
+        if after is None or key > session_key(*after):
+            path = os.path.join(checkpoint_dir, name)
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def latest_checkpoint(checkpoint_dir, before=None):
+    """
+    Ultimo checkpoint salvato in checkpoint_dir.
+
+    :param before: se specificato, (giorno, sessione): vengono considerati solo i
+                   checkpoint delle sessioni precedenti.
+    :return: percorso del checkpoint, None se non ce ne sono.
+    """
+    found = [(key, name) for key, name in _saved_sessions(checkpoint_dir)
+             if before is None or key < session_key(*before)]
+    if not found:
+        return None
+    return os.path.join(checkpoint_dir, max(found)[1])
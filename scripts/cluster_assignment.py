@@ -0,0 +1,111 @@
+# Assegnazione degli operatori selezionati (Ods) ai cluster di una configurazione k
+
+import numpy as np
+
+# Shift degli id degli operatori nella matrice delle distanze
+OPERATOR_TAU_OFFSET = 249
+
+
+def cluster_demands(cluster_info, multiplier):
+    """
+    Numero di operatori richiesto da ogni cluster: round(µc * multiplier).
+
+    :return: dizionario {c_idx: operatori richiesti}.
+    """
+    return {info['cluster_idx']: int(np.round(info['mu_c'] * multiplier, 0)) for info in cluster_info}
+
+
+def medoid_patient_ids(medoids_list, Pds):
+    """
+    Id dei pazienti medoidi: MIPClustering.get_medoids() restituisce posizioni in Pds,
+    mentre tau è indicizzata per id del paziente.
+
+    :return: lista allineata a medoids_list (stesso indice di cluster).
+    """
+    return [Pds[position]['id'] for position in medoids_list]
+
+
+def operator_medoid_costs(Ods, medoids, tau):
+    """
+    Matrice operatori × medoidi dei tempi di viaggio tau[op_id + 249, medoid],
+    raccolta in una sola passata.
+    """
+    return np.fromiter(
+        (tau[op["id"] + OPERATOR_TAU_OFFSET, medoid] for op in Ods for medoid in medoids),
+        dtype=float, count=len(Ods) * len(medoids)
+    ).reshape(len(Ods), len(medoids))
+
+
+def assign_operators_greedy(Ods, cluster_info, medoids_list, tau, multiplier):
+    """
+    Assegnazione greedy: per ogni cluster, nell'ordine di cluster_info, vengono
+    presi gli operatori rimasti più vicini al medoide. medoids_list contiene gli
+    id dei pazienti medoidi (vedi medoid_patient_ids), come per assign_operators_optimal.
+
+    :return: dizionario {c_idx: lista di operatori assegnati}.
+    """
+    demands = cluster_demands(cluster_info, multiplier)
+    remaining = list(Ods)
+    cluster_ops = {}
+    for info in cluster_info:
+        c_idx = info['cluster_idx']
+        medoid_id = medoids_list[c_idx]
+        ranked = sorted(remaining, key=lambda op: tau[op["id"] + OPERATOR_TAU_OFFSET, medoid_id])
+        cluster_ops[c_idx] = ranked[:demands[c_idx]]
+        # gli operatori rimasti mantengono l'ordine di Ods
+        chosen = {op["id"] for op in cluster_ops[c_idx]}
+        remaining = [op for op in remaining if op["id"] not in chosen]
+    return cluster_ops
+
+
+def assign_operators_optimal(Ods, cluster_info, medoids_list, tau, multiplier):
+    """
+    Assegnazione ottima degli operatori ai cluster: minimizza la somma dei tempi
+    di viaggio operatore-medoide rispettando la domanda round(µc * multiplier)
+    di ciascun cluster, con un'unica chiamata a linear_sum_assignment sulla
+    matrice dei costi in cui la colonna di ogni cluster è replicata tante volte
+    quanti sono gli operatori richiesti.
+
+    Se gli operatori non bastano a coprire tutta la domanda, ogni replica r-esima
+    riceve una penalità r * M (M maggiore di qualsiasi costo): vengono coperte
+    prima le prime repliche di tutti i cluster, come a dare almeno un operatore
+    a ciascun cluster. Quando la domanda è coperta la penalità è costante e non
+    cambia la soluzione.
+
+    :return: dizionario {c_idx: lista di operatori assegnati}, con gli operatori
+             di ciascun cluster nell'ordine di Ods.
+    """
+    demands = cluster_demands(cluster_info, multiplier)
+    c_indices = [info['cluster_idx'] for info in cluster_info]
+    cluster_ops = {c_idx: [] for c_idx in c_indices}
+    if not Ods or not c_indices:
+        return cluster_ops
+
+    costs = operator_medoid_costs(Ods, [medoids_list[c_idx] for c_idx in c_indices], tau)
+
+    # Colonne replicate: (posizione del cluster, indice della replica)
+    slot_cluster = np.repeat(np.arange(len(c_indices)), [demands[c_idx] for c_idx in c_indices])
+    if len(slot_cluster) == 0:
+        return cluster_ops
+    slot_rank = np.concatenate([np.arange(demands[c_idx]) for c_idx in c_indices])
+
+    # le coppie senza tempo di viaggio finito costano più di qualsiasi coppia raggiungibile
+    finite = np.isfinite(costs)
+    cap = costs[finite].max() + 1 if finite.any() else 1.0
+    costs = np.where(finite, costs, cap)
+    # la somma dei costi di qualsiasi assegnazione è minore di big_m
+    big_m = cap * len(Ods)
+    slot_costs = costs[:, slot_cluster] + slot_rank * big_m
+
+    from scipy.optimize import linear_sum_assignment
+    rows, cols = linear_sum_assignment(slot_costs)
+    for row, col in zip(rows, cols):
+        cluster_ops[c_indices[slot_cluster[col]]].append(Ods[row])
+    return cluster_ops
+
+
+# Strategie disponibili per method_overview
+OPERATOR_ASSIGNMENTS = {
+    "optimal": assign_operators_optimal,
+    "greedy": assign_operators_greedy,
+}
@@ -1,98 +1,90 @@
+from diagnostics import log
 from utils import RESULTS_DIR
+from results_warehouse import ResultsWarehouse
 import os
-import pandas as pd
+import sys
 
 def combine_results():
     """
     Combina i risultati di ogni variante in un unico CSV.
 
-    Per ogni cartella in RESULTS_DIR/results che inizia per "variant_",
-    legge:
-      - il file parameters.txt in RESULTS_DIR/results/variant_<variant_name>,
-        dove parameters.txt contiene:
-            epsilon: <valore>
-            down_time_true: <valore>
-            multiplier: <valore>
-      - il file global_statistics_<variant_name>.csv in 
-        RESULTS_DIR/results/variant_<variant_name>,
-        dal quale vengono estratte le colonne: 
-            Total Cost, Routing Cost, Overtime Cost, Occupation Ratio
+    I parametri e le statistiche globali di ogni esecuzione sono registrati da
+    run_configuration nel warehouse dei risultati (RESULTS_DIR/results.sqlite, vedi
+    results_warehouse.py): il CSV viene prodotto con una sola query sull'ultima
+    esecuzione di ogni variante, aggiornando solo le varianti eseguite dopo
+    l'ultima esportazione.
 
     Il CSV finale avrà le colonne:
-      Variant,epsilon,down_time_true,multiplier,Total Cost,Routing Cost,Overtime Cost,Occupation Ratio
-    e viene salvato in RESULTS_DIR/combined_results2.csv.
+      Variant,epsilon,down_time_true,multiplier,Total Waiting Time,Average Waiting Time,Total Cost,Routing Cost,Overtime Cost,Occupation Ratio
+    e viene salvato in RESULTS_DIR/combined_results.csv.
     """
-    combined_results = []
-    
-    # Definisce il percorso della cartella "results"
-    results_parent = os.path.join(RESULTS_DIR)
-    if not os.path.exists(results_parent):
-        print(f"Cartella {results_parent} non trovata.")
-        return
+    with ResultsWarehouse() as warehouse:
+        output_file = warehouse.export_combined()
 
-    # Lista e ordina alfabeticamente le varianti trovate nella cartella "results"
-    variant_dirs = []
-    for entry in os.listdir(results_parent):
-        variant_dir_path = os.path.join(results_parent, entry)
-        if os.path.isdir(variant_dir_path) and entry.startswith("variant_"):
-            # Estrae il nome della variante
-            variant = entry.split("variant_")[-1]
-            variant_dirs.append((variant, variant_dir_path))
-    variant_dirs.sort(key=lambda x: x[0])
-    
-    for variant, variant_dir_path in variant_dirs:
-        # Leggi parameters.txt
-        params_file = os.path.join(variant_dir_path, "parameters.txt")
-        if not os.path.exists(params_file):
-            print(f"File parameters.txt non trovato in {variant_dir_path}.")
-            continue
+    if output_file is not None:
+        log.info("File combinato salvato in %s", output_file)
+    else:
+        log.info("Nessun risultato da combinare.")
 
-        params = {}
-        with open(params_file, "r") as pf:
-            for line in pf:
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    params[key.strip()] = value.strip()
 
-        # Leggi global_statistics_<variant>.csv
-        stats_file = os.path.join(variant_dir_path, f"global_statistics_{variant}.csv")
-        if not os.path.exists(stats_file):
-            print(f"File {stats_file} non trovato.")
-            continue
+def import_variant_dirs():
+    """
+    Importa nel warehouse le varianti eseguite prima della sua introduzione e non ancora
+    registrate, leggendo per ogni cartella RESULTS_DIR/variant_<variant_name>:
+      - il file parameters.txt, che contiene:
+            epsilon: <valore>
+            down_time_true: <valore>
+            multiplier: <valore>
+      - il file global_statistics_<variant_name>.csv.
+    """
+    import pandas as pd
 
-        try:
-            stats_df = pd.read_csv(stats_file)
-        except Exception as e:
-            print(f"Errore nella lettura di {stats_file}: {e}")
-            continue
+    if not os.path.exists(RESULTS_DIR):
+        log.warning("Cartella %s non trovata.", RESULTS_DIR)
+        return
 
-        if stats_df.empty:
-            print(f"Il file {stats_file} è vuoto.")
-            continue
+    with ResultsWarehouse() as warehouse:
+        known = set(warehouse.latest()["variant"])
+        for entry in sorted(os.listdir(RESULTS_DIR)):
+            variant_dir_path = os.path.join(RESULTS_DIR, entry)
+            if not (os.path.isdir(variant_dir_path) and entry.startswith("variant_")):
+                continue
+            variant = entry.split("variant_")[-1]
+            if variant in known:
+                continue
 
-        stats = stats_df.iloc[0].to_dict()
+            params_file = os.path.join(variant_dir_path, "parameters.txt")
+            if not os.path.exists(params_file):
+                log.warning("File parameters.txt non trovato in %s.", variant_dir_path)
+                continue
+            params = {}
+            with open(params_file, "r") as pf:
+                for line in pf:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        params[key.strip()] = value.strip()
 
-        result_row = {
-            "Variant": variant,
-            "epsilon": params.get("epsilon", ""),
-            "down_time_true": params.get("down_time_true", ""),
-            "multiplier": params.get("multiplier", ""),
-            "Total Waiting Time": stats.get("Total Waiting Time", ""),
-            "Average Waiting Time": stats.get("Average Waiting Time", ""),
-            "Total Cost": stats.get("Total Cost", ""),
-            "Routing Cost": stats.get("Routing Cost", ""),
-            "Overtime Cost": stats.get("Overtime Cost", ""),
-            "Occupation Ratio": stats.get("Occupation Ratio", "")
-        }
-        combined_results.append(result_row)
-    
-    if combined_results:
-        combined_df = pd.DataFrame(combined_results)
-        output_file = os.path.join(RESULTS_DIR, "combined_results.csv")
-        combined_df.to_csv(output_file, index=False)
-        print(f"File combinato salvato in {output_file}")
-    else:
-        print("Nessun risultato da combinare.")
+            stats_file = os.path.join(variant_dir_path, f"global_statistics_{variant}.csv")
+            if not os.path.exists(stats_file):
+                log.warning("File %s non trovato.", stats_file)
+                continue
+            try:
+                stats_df = pd.read_csv(stats_file)
+            except Exception as e:
+                log.error("Errore nella lettura di %s: %s", stats_file, e)
+                continue
+            if stats_df.empty:
+                log.warning("Il file %s è vuoto.", stats_file)
+                continue
+
+            warehouse.record_run(variant,
+                                 {"epsilon": float(params["epsilon"]) if "epsilon" in params else None,
+                                  "down_time_true": params.get("down_time_true") == "True" if "down_time_true" in params else None,
+                                  "multiplier": float(params["multiplier"]) if "multiplier" in params else None},
+                                 stats_df.iloc[0].to_dict())
+            log.info("Variante %s importata nel warehouse dei risultati.", variant)
 
 if __name__ == "__main__":
+    if "--import" in sys.argv[1:]:
+        import_variant_dirs()
     combine_results()
@@ -0,0 +1,181 @@
+# Ricerca adattiva della configurazione (successive halving) al posto della griglia completa
+
+import itertools
+import json
+import math
+import os
+import string
+import sys
+from copy import deepcopy
+
+from diagnostics import log, configure_logging
+from method_overview import (method_overview, run_configuration, run_configurations_parallel, load_tau,
+                             variant_configurations, configuration_pool, configuration_worker_data)
+from combine_results import combine_results
+from utils import RESULTS_DIR
+
+# File dello spazio di ricerca di default, accanto a questo script
+SEARCH_SPACE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "search_space.json")
+
+
+def load_search_space(path=SEARCH_SPACE_FILE):
+    """
+    Legge lo spazio di ricerca da un file JSON con le chiavi:
+      - epsilon, down_time_true, multiplier: valori da combinare (come in variant_configurations);
+      - eta: frazione 1/eta di configurazioni promosse a ogni rung (default 2);
+      - rungs: budget crescenti, ciascuno {"days": giorni elaborati a partire dal giorno 0,
+        "Kmax": numero massimo di cluster}; l'ultimo rung è l'esecuzione completa.
+
+    Le configurazioni presenti in variant_configurations mantengono la lettera della
+    variante, così le cartelle variant_<lettera> coincidono con quelle di
+    run_all_configurations; le altre ricevono le prime lettere non usate.
+
+    :return: (configurazioni, eta, rungs), con le configurazioni come tuple
+             (lettera, epsilon, down_time_true, multiplier).
+    """
+    with open(path, "r") as f:
+        space = json.load(f)
+    grid = list(itertools.product(space["epsilon"], space["down_time_true"], space["multiplier"]))
+    known = {tuple(config): letter for letter, *config in variant_configurations()}
+    free = [letter for letter in string.ascii_uppercase if letter not in known.values()]
+    new = [config for config in grid if config not in known]
+    if len(new) > len(free):
+        raise ValueError(f"Spazio di ricerca con {len(new)} configurazioni nuove: al massimo {len(free)}.")
+    new_letters = dict(zip(new, free))
+    configurations = [(known.get(config) or new_letters[config], *config) for config in grid]
+    rungs = space["rungs"]
+    if not rungs:
+        raise ValueError("Lo spazio di ricerca deve contenere almeno un rung.")
+    return configurations, space.get("eta", 2), rungs
+
+
+def evaluate_configuration(config, rung_idx, rung, tau, requests, operators, patients):
+    """
+    Valuta una configurazione con il budget ridotto di un rung: method_overview sui
+    primi rung["days"] giorni con k in 1..rung["Kmax"]-1, partendo da copie nuove
+    di richieste e operatori. I file di output vanno in variant_search<rung>_<lettera>.
+
+    :return: costo totale dei giorni elaborati.
+    """
+    letter, epsilon, down_time_true, multiplier = config
+    results = method_overview(deepcopy(requests), deepcopy(operators), patients, tau,
+                              variant=f"search{rung_idx}_{letter}",
+                              epsilon=epsilon,
+                              down_time_true=down_time_true,
+                              Kmax=rung["Kmax"],
+                              multiplier=multiplier,
+                              wait_for_input=False,
+                              days=list(range(rung["days"])))
+    return results['total_cost']
+
+
+def _evaluate_job(job):
+    # Eseguito nei processi di configuration_pool
+    config, rung_idx, rung = job
+    tau, data = configuration_worker_data()
+    return config[0], evaluate_configuration(config, rung_idx, rung, tau,
+                                             data["requests"], data["operators"], data["patients"])
+
+
+def _final_days(rung):
+    return None if rung["days"] >= 7 else list(range(rung["days"]))
+
+
+def halving_rounds(configurations, eta, rungs, evaluate, run_final):
+    """
+    Selezione del successive halving, indipendente da come vengono eseguite le configurazioni.
+
+    :param evaluate: funzione (configurazioni, rung_idx, rung) -> {lettera: costo} dei rung ridotti.
+    :param run_final: funzione (configurazioni, rung) -> {lettera: costo} dell'ultimo rung.
+    :return: dizionario con il costo di ogni configurazione per rung ("history"),
+             la lettera della configurazione migliore ("best") e i suoi parametri ("configuration").
+    """
+    survivors = list(configurations)
+    history = []
+
+    for rung_idx, rung in enumerate(rungs[:-1]):
+        for config in survivors:
+            log.info("Rung %s (%s giorni, Kmax=%s): configurazione %s", rung_idx, rung["days"], rung["Kmax"], config)
+        costs = evaluate(survivors, rung_idx, rung)
+        history.append({"rung": rung_idx, **rung, "costs": costs})
+
+        keep = max(1, math.ceil(len(survivors) / eta))
+        survivors = sorted(survivors, key=lambda config: costs[config[0]])[:keep]
+        log.info("Promosse al rung %s: %s", rung_idx + 1, [config[0] for config in survivors])
+
+    final = rungs[-1]
+    costs = run_final(survivors, final)
+    history.append({"rung": len(rungs) - 1, **final, "costs": costs})
+
+    best = min(costs, key=costs.get)
+    by_letter = {config[0]: config[1:] for config in survivors}
+    return {"history": history, "best": best,
+            "configuration": dict(zip(("epsilon", "down_time_true", "multiplier"), by_letter[best]))}
+
+
+def successive_halving(configurations, eta, rungs, n_processes=None):
+    """
+    Successive halving: tutte le configurazioni vengono valutate con il budget del
+    primo rung, solo le migliori ceil(n / eta) passano al rung successivo e così via;
+    le configurazioni arrivate all'ultimo rung vengono eseguite per intero con
+    run_configuration, salvando i risultati nelle cartelle variant_<lettera> come
+    run_all_configurations.
+
+    Se n_processes è specificato, tutti i rung vengono eseguiti nello stesso
+    configuration_pool di n_processes processi (tau e dati caricati una sola volta),
+    altrimenti in sequenza.
+
+    Con 12 configurazioni, eta=2 e i rung di search_space.json l'esecuzione completa
+    riguarda 3 configurazioni invece di 12.
+
+    :return: dizionario con il costo di ogni configurazione per rung ("history")
+             e la lettera della configurazione migliore ("best").
+    """
+    if n_processes is not None:
+        with configuration_pool(n_processes) as pool:
+            def evaluate(survivors, rung_idx, rung):
+                return dict(pool.map(_evaluate_job, [(config, rung_idx, rung) for config in survivors]))
+
+            def run_final(survivors, rung):
+                return run_configurations_parallel(n_processes, configurations=survivors, Kmax=rung["Kmax"],
+                                                   days=_final_days(rung), pool=pool)
+
+            summary = halving_rounds(configurations, eta, rungs, evaluate, run_final)
+    else:
+        from data_loader import operators, requests, patients
+        tau = load_tau()
+
+        def evaluate(survivors, rung_idx, rung):
+            return {config[0]: evaluate_configuration(config, rung_idx, rung, tau, requests, operators, patients)
+                    for config in survivors}
+
+        def run_final(survivors, rung):
+            costs = {}
+            for letter, epsilon, down_time_true, multiplier in survivors:
+                results = run_configuration(letter, epsilon, down_time_true, multiplier,
+                                            deepcopy(requests), deepcopy(operators), deepcopy(patients), tau,
+                                            Kmax=rung["Kmax"], wait_for_input=False, days=_final_days(rung))
+                costs[letter] = results['total_cost']
+            combine_results()
+            return costs
+
+        summary = halving_rounds(configurations, eta, rungs, evaluate, run_final)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, "search_results.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    log.info("Configurazione migliore: %s %s", summary["best"], summary["configuration"])
+    return summary
+
+
+def main():
+    # Uso: python config_search.py [search_space.json] [n_processi]
+    configure_logging(os.environ.get("TESI_LOG_LEVEL", "INFO"), os.environ.get("TESI_DIAGNOSTICS_FILE"))
+    path = sys.argv[1] if len(sys.argv) > 1 else SEARCH_SPACE_FILE
+    n_processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    configurations, eta, rungs = load_search_space(path)
+    successive_halving(configurations, eta, rungs, n_processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -86,7 +86,29 @@ OPERATORS_FILE = os.path.join(base_dir, "operators.csv")
 REQUESTS_FILE = os.path.join(base_dir, "requests.csv")
 PATIENTS_FILE = os.path.join(base_dir, "patients.csv")
 
+# Dati letti dai CSV al primo accesso, non all'import del modulo
+_data = None
 
-operators = read_operators(OPERATORS_FILE)
-requests = read_requests(REQUESTS_FILE)
-patients = read_patients(PATIENTS_FILE)
+
+def load_data():
+    """
+    Legge operatori, richieste e pazienti dai CSV alla prima chiamata; le chiamate
+    successive restituiscono le stesse liste.
+
+    :return: dizionario con le chiavi "operators", "requests" e "patients".
+    """
+    global _data
+    if _data is None:
+        _data = {
+            "operators": read_operators(OPERATORS_FILE),
+            "requests": read_requests(REQUESTS_FILE),
+            "patients": read_patients(PATIENTS_FILE),
+        }
+    return _data
+
+
+def __getattr__(name):
+    # from data_loader import operators, requests, patients legge i CSV solo quando viene eseguito
+    if name in ("operators", "requests", "patients"):
+        return load_data()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
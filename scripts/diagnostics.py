@@ -0,0 +1,70 @@
+# Logging a livelli e diagnostica strutturata per i cicli principali
+
+import json
+import logging
+
+# Logger dei messaggi di avanzamento (console)
+log = logging.getLogger("tesi")
+
+# Logger della diagnostica dettagliata, scritta solo sul file JSON lines
+_diagnostics = logging.getLogger("tesi.diagnostics")
+_diagnostics.propagate = False
+_diagnostics.setLevel(logging.CRITICAL + 1)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Una riga JSON per record: evento, livello, istante e campi passati a diagnostic().
+    """
+
+    def format(self, record):
+        payload = {"time": self.formatTime(record), "level": record.levelname, "event": record.getMessage()}
+        payload.update(getattr(record, "fields", {}))
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level="INFO", diagnostics_file=None):
+    """
+    Configura il livello dei messaggi su console e, se indicato, il file JSON lines
+    della diagnostica dettagliata (richieste non assegnate, stato degli operatori, ...).
+    Senza diagnostics_file la diagnostica è disattivata e non viene formattato nulla.
+    """
+    log.setLevel(level)
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    log.addHandler(console)
+
+    for handler in list(_diagnostics.handlers):
+        _diagnostics.removeHandler(handler)
+        handler.close()
+    if diagnostics_file is None:
+        _diagnostics.setLevel(logging.CRITICAL + 1)
+    else:
+        sink = logging.FileHandler(diagnostics_file, mode="w", encoding="utf-8")
+        sink.setFormatter(JsonLinesFormatter())
+        _diagnostics.addHandler(sink)
+        _diagnostics.setLevel(logging.DEBUG)
+
+
+def debug_enabled():
+    """
+    Controllo economico da fare nei cicli prima di costruire un messaggio di debug.
+    """
+    return log.isEnabledFor(logging.DEBUG)
+
+
+def diagnostics_enabled():
+    """
+    Controllo economico da fare nei cicli prima di raccogliere i campi di diagnostic().
+    """
+    return _diagnostics.isEnabledFor(logging.DEBUG)
+
+
+def diagnostic(event, **fields):
+    """
+    Scrive un evento strutturato sul file di diagnostica, se attivo.
+    """
+    if _diagnostics.isEnabledFor(logging.DEBUG):
+        _diagnostics.debug(event, extra={"fields": fields})
@@ -1,7 +1,9 @@
 # Script utilizzato per implementare i 4 algoritmi  GRS, attualmente implementato solo il primo, grs-time
 
 import datetime, math
-from operators_requests import Operator, Request, Node
+import numpy as np
+from operators_requests import Operator, Request, Node, node_coordinates, travel_times
+from diagnostics import log, debug_enabled, diagnostic, diagnostics_enabled
 from typing import List, Optional, Tuple
 
 # funzione per ordinare le richieste in base all'istante di inizio della finestra temporale
@@ -41,6 +43,9 @@ def set_operator_state_afternoon(operator):
     operator.wo = 0 # tempo di lavoro accumulato
     operator.Lo = [] # Lista di richieste assegnate, inizialmente vuota
 
+# Chiave di grs_time per la lista di tutti gli operatori, distinta da ogni cluster_id (anche None)
+ALL_OPERATORS = object()
+
 # funzione per calcolare il tempo di viaggio tra due nodi
 def compute_travel_time(node_a: Node, node_b: Node) -> float:
     """
@@ -70,45 +75,90 @@ def is_feasible(operator: Operator, request: Request, shift_end: int, debug: boo
     
     if arrival_time > beta:
         if debug:
-            print(f"Richiesta {request.i} rifiutata per l'operatore {operator.id}:")
-            print(f"  Arrival time = {arrival_time:.2f} non rientra in finestra ({alpha}, {beta})")
+            log.debug("Richiesta %s rifiutata per l'operatore %s: arrival time = %.2f non rientra in finestra (%s, %s)",
+                      request.i, operator.id, arrival_time, alpha, beta)
         return False, "arrival"
     
     if operator.eo + travel_time + request.duration > shift_end:
         if debug:
-            print(f"Richiesta {request.i} rifiutata per l'operatore {operator.id}:")
-            print(f"  supererebbe la fine del turno (eo + travel + duration = {operator.eo + travel_time + request.duration:.2f} > {shift_end})")
+            log.debug("Richiesta %s rifiutata per l'operatore %s: supererebbe la fine del turno (eo + travel + duration = %.2f > %s)",
+                      request.i, operator.id, operator.eo + travel_time + request.duration, shift_end)
         return False, "work"
     
     if travel_time + request.duration > operator.ho:
         if debug:
-            print(f"Richiesta {request.i} rifiutata per l'operatore {operator.id}:")
-            print(f"  (Travel time + Durata) = {travel_time + request.duration:.2f} > Tempo rimanente ho = {operator.ho:.0f}")
+            log.debug("Richiesta %s rifiutata per l'operatore %s: (travel time + durata) = %.2f > tempo rimanente ho = %.0f",
+                      request.i, operator.id, travel_time + request.duration, operator.ho)
         return False, "work"
     
     return True, None
 
+# funzione per raccogliere in array lo stato degli operatori usato da evaluate_operators
+def operator_arrays(operators: List[Operator]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Restituisce gli array (eo, ho, coordinate dei current_patient) degli operatori.
+    Possono essere mantenuti aggiornati con sync_operator_arrays invece di
+    essere ricostruiti per ogni richiesta.
+    """
+    n = len(operators)
+    eo = np.fromiter((op.eo for op in operators), dtype=float, count=n)
+    ho = np.fromiter((op.ho for op in operators), dtype=float, count=n)
+    return eo, ho, node_coordinates([op.current_patient for op in operators])
+
+def sync_operator_arrays(arrays: Tuple[np.ndarray, np.ndarray, np.ndarray], j: int, operator: Operator):
+    """
+    Aggiorna la posizione j degli array con lo stato corrente dell'operatore.
+    """
+    eo, ho, coords = arrays
+    eo[j] = operator.eo
+    ho[j] = operator.ho
+    coords[j] = operator.current_patient.coordinates
+
+# funzione per valutare la fattibilità di una richiesta per più operatori contemporaneamente
+def evaluate_operators(operators: List[Operator], request: Request, shift_end: int,
+                       arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Versione vettoriale di is_feasible: valuta in una sola chiamata tutti gli operatori dati.
+
+    Restituisce tre array, uno per operatore nello stesso ordine:
+      - travel: tempo di viaggio τₚₒᵢ
+      - arrival_ok: eₒ + τₚₒᵢ ≤ βᵢ
+      - work_ok: eₒ + τₚₒᵢ + dᵢ ≤ shift_end  e  τₚₒᵢ + dᵢ ≤ hₒ
+
+    :param arrays: stato degli operatori già raccolto con operator_arrays (opzionale).
+    """
+    eo, ho, coords = arrays if arrays is not None else operator_arrays(operators)
+    travel = travel_times(coords, request.patient)
+    arrival_ok = eo + travel <= request.temporal_window[1]
+    work_ok = (eo + travel + request.duration <= shift_end) & (travel + request.duration <= ho)
+    return travel, arrival_ok, work_ok
+
 # funzione per selezionare il miglior operatore per una richiesta
-def select_best_operator_for_request(request: Request, operators: List[Operator], shift_end: int) -> Optional[Operator]:
+def select_best_operator_for_request(request: Request, operators: List[Operator], shift_end: int,
+                                     relevant_ops: Optional[List[Operator]] = None,
+                                     arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> Optional[Operator]:
     """
     Seleziona l'operatore che minimizza il travel time (τₚₒᵢ) tra quelli
     appartenenti al cluster della richiesta. Se nessun operatore è fattibile,
     restituisce None.
+
+    Se relevant_ops è già noto (ad es. precalcolato per cluster in grs_time)
+    il filtro sugli operatori non viene ripetuto; arrays è il loro stato
+    raccolto con operator_arrays.
     """
     # Filtra gli operatori in base al cluster della richiesta
-    relevant_ops = filter_operators_by_cluster(request, operators)
-    
-    feasible_ops = []
-    for op in relevant_ops:
-        travel_time = compute_travel_time(op.current_patient, request.patient)
-        if is_feasible(op, request, shift_end, debug=False)[0]:
-            feasible_ops.append((op, travel_time))
-    
-    if not feasible_ops:
+    if relevant_ops is None:
+        relevant_ops = filter_operators_by_cluster(request, operators)
+    if not relevant_ops:
         return None
 
-    best_operator, _ = min(feasible_ops, key=lambda x: x[1])
-    return best_operator
+    travel, arrival_ok, work_ok = evaluate_operators(relevant_ops, request, shift_end, arrays)
+    feasible = arrival_ok & work_ok
+    if not feasible.any():
+        return None
+
+    # a parità di travel time vince il primo operatore, come con min()
+    return relevant_ops[int(np.argmin(np.where(feasible, travel, np.inf)))]
 
 def group_requests_by_cluster(requests):
     from collections import defaultdict
@@ -138,6 +188,10 @@ def grs_time(operators: List[Operator],
       - True: turno mattutino (shift_end = 720)
       - False: turno pomeridiano (shift_end = 1290, con reset dello stato)
 
+    Con il livello DEBUG attivo per ogni richiesta non assegnata vengono stampati
+    i motivi di rifiuto di ciascun operatore del cluster (is_feasible con debug);
+    con la diagnostica attiva gli stessi motivi vengono scritti sul file strutturato.
+
     Restituisce una tupla con due elementi:
         - Uno schedule sotto forma di dict: {op_id: [richieste]}
         - Un dizionario con le statistiche del processo di scheduling
@@ -201,10 +255,28 @@ def grs_time(operators: List[Operator],
         'work_fail': 0 # richieste non assegnate per work time non rispettato
     }
 
+    # Operatori di ciascun cluster e relativi array di stato, calcolati una sola volta
+    # invece che per ogni richiesta; la chiave ALL_OPERATORS contiene tutti gli operatori
+    # (copia: la lista del chiamante non viene modificata)
+    ops_by_cluster = {ALL_OPERATORS: list(operators)}
+    for op in operators:
+        ops_by_cluster.setdefault(op.cluster_id, []).append(op)
+    arrays_by_cluster = {cid: operator_arrays(ops) for cid, ops in ops_by_cluster.items()}
+    # posizioni di ogni operatore negli array da aggiornare dopo un'assegnazione
+    array_slots = {id(op): [] for op in operators}
+    for cid, ops in ops_by_cluster.items():
+        for j, op in enumerate(ops):
+            array_slots[id(op)].append((arrays_by_cluster[cid], j))
+
     # (3) Per ciascuna richiesta, trova l'operatore con min travel_time
     for req in sorted_requests:
+        # come filter_operators_by_cluster: se il cluster non ha operatori si considerano tutti
+        cid = req.cluster_id if req.cluster_id in ops_by_cluster else ALL_OPERATORS
+        relevant_ops = ops_by_cluster[cid]
+        arrays = arrays_by_cluster[cid]
+
         # Seleziona il miglior operatore per la richiesta
-        chosen_op = select_best_operator_for_request(req, operators, shift_end)
+        chosen_op = select_best_operator_for_request(req, operators, shift_end, relevant_ops, arrays)
         
         # Se non è possibile assegnare la richiesta, imposta chosen_op a None
         if chosen_op is not None and chosen_op.ho <= 0:
@@ -232,6 +304,8 @@ def grs_time(operators: List[Operator],
 
             # Aggiorna il current patient: l'operatore si sposta presso il paziente della richiesta
             chosen_op.current_patient = req.patient
+            for op_arrays, j in array_slots[id(chosen_op)]:
+                sync_operator_arrays(op_arrays, j, chosen_op)
             
             # Aggiunge la richiesta allo schedule dell'operatore
             schedule[chosen_op.id].append(req)
@@ -239,17 +313,20 @@ def grs_time(operators: List[Operator],
         else:
             # La richiesta non è assegnabile: aggiorna il contatore
             stats['not_assigned'] += 1
-            # Per capire il motivo, esamina gli operatori rilevanti
-            reasons = set()
-            relevant_ops = filter_operators_by_cluster(req, operators)
-            for op in relevant_ops:
-                feasible, reason = is_feasible(op, req, shift_end, debug=True)
-                if not feasible and reason is not None:
-                    reasons.add(reason)
+            # Per capire il motivo, esamina gli operatori rilevanti:
+            # come in is_feasible, il controllo sull'arrivo precede quello sul lavoro
+            if debug_enabled():
+                for op in relevant_ops:
+                    is_feasible(op, req, shift_end, debug=True)
+            travel, arrival_ok, work_ok = evaluate_operators(relevant_ops, req, shift_end, arrays)
+            if diagnostics_enabled():
+                for j, op in enumerate(relevant_ops):
+                    diagnostic("request_rejected", request=req.i, operator=op.id, travel_time=float(travel[j]),
+                               reason="arrival" if not arrival_ok[j] else "work" if not work_ok[j] else None)
             # Se la ragione è "arrival", incrementa arrival_fail; altrimenti se "work", incrementa work_fail.
-            if "arrival" in reasons:
+            if not arrival_ok.all():
                 stats['arrival_fail'] += 1
-            elif "work" in reasons:
+            elif not work_ok.all():
                 stats['work_fail'] += 1
             # Se non è possibile determinarla, non si aggiornano ulteriori contatori
 
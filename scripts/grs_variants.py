@@ -1,12 +1,117 @@
 import datetime, math
 import os, sys
-import pandas as pd
 
 from utils import parse_time_to_minutes, parse_minutes_to_hours
+from assignment_ledger import unassignment_reason
+from diagnostics import log, diagnostic, diagnostics_enabled
 from typing import List, Optional, Tuple
 
-# TOLTA MOMENTANEAMENTE LA SELEZIONE DELLA VARIANTE, DA RIAGGIUNGERE IN INPUT E AGGIUNGERE LE ALTRE VARIANTI E LOGICA DI SELEZIONE  
-def grs_variants(operators, requests, patients, shift_end, down_time_true, tau, k):
+###############################################################################
+# Registro delle varianti di costo GRS
+###############################################################################
+
+# Ogni variante riceve (operator, request, travel_time, waiting_time, k, f_oi) e
+# restituisce il valore da minimizzare nella scelta dell'operatore.
+# I costi di routing e overtime restituiti da grs_variants sono sempre quelli
+# calcolati da compute_f_oi: la variante decide solo il criterio di selezione.
+GRS_COST_VARIANTS = {}
+
+
+def register_cost_variant(name, *aliases):
+    """
+    Decoratore per registrare una funzione di costo con il nome della variante
+    (ed eventuali alias).
+    """
+    def decorator(func):
+        for key in (name,) + aliases:
+            GRS_COST_VARIANTS[key] = func
+        return func
+    return decorator
+
+
+def get_cost_variant(variant):
+    """
+    Restituisce la funzione di costo associata alla variante.
+    """
+    if variant not in GRS_COST_VARIANTS:
+        raise ValueError(f"Variante GRS '{variant}' non registrata. Varianti disponibili: {', '.join(GRS_COST_VARIANTS)}")
+    return GRS_COST_VARIANTS[variant]
+
+
+@register_cost_variant("f_oi")
+def cost_f_oi(operator, request, travel_time, waiting_time, k, f_oi):
+    # Costo extra f_oi (routing + overtime + attesa), criterio di default
+    return f_oi
+
+
+@register_cost_variant("Time")
+def cost_time(operator, request, travel_time, waiting_time, k, f_oi):
+    # Minimizza gli spostamenti tra i pazienti
+    return travel_time
+
+
+@register_cost_variant("MaxTimeUse", "Saturami")
+def cost_max_time_use(operator, request, travel_time, waiting_time, k, f_oi):
+    # Minimizza il tempo residuo ho, massimizzando la saturazione
+    return operator["ho"] - request["duration"]
+
+
+@register_cost_variant("MinResidualTime", "LasciamiInPace")
+def cost_min_residual_time(operator, request, travel_time, waiting_time, k, f_oi):
+    # Massimizza il tempo residuo ho, lasciando più margine
+    return -(operator["ho"] - request["duration"])
+
+
+@register_cost_variant("TradeOff")
+def cost_trade_off(operator, request, travel_time, waiting_time, k, f_oi):
+    # Minimizza la somma tra lavoro accumulato, spostamento e durata
+    return operator["wo_k"][k] + travel_time + request["duration"]
+
+
+###############################################################################
+# Preparazione della sessione, condivisa tra le varianti
+###############################################################################
+
+def prepare_grs_session(operators, requests, patients, tau):
+    """
+    Prepara i dati della sessione che non dipendono dalla variante:
+      - ordinamento delle richieste per α_i e conversione di α_i, β_i in minuti
+      - raccolta dei tempi di viaggio verso ciascuna richiesta da tutte le
+        posizioni raggiungibili nella sessione (casa e pazienti delle richieste)
+      - pre-screening delle richieste non servibili da nessun operatore: un
+        operatore che parte da casa ha attesa e viaggio nulli, e nel corso della
+        sessione e_o può solo crescere e h_o solo diminuire
+
+    :return: lista di dizionari {"req", "alpha", "beta", "tau_row", "servable"}
+             nell'ordine in cui grs_variants elabora le richieste.
+    """
+    for p in patients:
+        tau['h', p["id"]] = 0
+
+    # Ordina le richieste per il tempo minimo di inizio (α_i)
+    parsed = [(parse_time_to_minutes(r["min_time_begin"]), parse_time_to_minutes(r["max_time_begin"]), r) for r in requests]
+    parsed.sort(key=lambda x: x[0])
+
+    locations = {'h'} | {op["current_patient_id"] for op in operators} | {r["project_id"] for r in requests}
+
+    session = []
+    for alpha_i, beta_i, req in parsed:
+        pid = req["project_id"]
+        tau_row = {loc: tau[loc, pid] for loc in locations if (loc, pid) in tau}
+        servable = any(
+            op["current_patient_id"] != 'h' or (op["eo"] <= beta_i and req["duration"] <= op["ho"])
+            for op in operators
+        )
+        session.append({"req": req, "alpha": alpha_i, "beta": beta_i, "tau_row": tau_row, "servable": servable})
+    return session
+
+
+###############################################################################
+# Algoritmo GRS
+###############################################################################
+
+def grs_variants(operators, requests, patients, shift_end, down_time_true, tau, k, variant="f_oi", session=None,
+                 ledger=None, ledger_session=None):
 
    
     # print("[DEBUG] Inizio grs_variants: tau =", tau, type(tau))
@@ -14,10 +119,11 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
     Funzione unica per l'algoritmo GRS che, in base alla variante scelta,
     assegna le richieste agli operatori.
 
-    ## Varianti disponibili:
+    ## Varianti disponibili (registrate in GRS_COST_VARIANTS):
+    - "f_oi": Minimizza il costo extra f_oi (routing + overtime + attesa), default
     - "Time": Minimizza gli spostamenti tra i pazienti
-    - "MaxTimeUse": Massimizza l’utilizzo del tempo disponibile, minimizzando il tempo residuo (ho)
-    - "MinResidualTime": Massimizza il tempo residuo, lasciando più margine (-ho)
+    - "MaxTimeUse" ("Saturami"): Massimizza l’utilizzo del tempo disponibile, minimizzando il tempo residuo (ho)
+    - "MinResidualTime" ("LasciamiInPace"): Massimizza il tempo residuo, lasciando più margine (-ho)
     - "TradeOff": Minimizza la somma tra lavoro accumulato, spostamento e durata (wo + tau + ti)
 
     :param variant: Nome della variante dell'algoritmo GRS.
@@ -25,26 +131,25 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
     :param requests: Lista di richieste (dizionari).
     :param patients: cluster di pazienti (dizionari).
     :param shift_end: Orario di fine turno (in minuti).
+    :param session: dati già preparati con prepare_grs_session (opzionale).
+    :param ledger: AssignmentLedger in cui registrare assegnazioni e motivi di mancata assegnazione (opzionale).
+    :param ledger_session: chiave (giorno, s) associata alle voci del ledger.
     :return: Tuple con:
-    - feasible: True se la soluzione trovata è ammissibile, False altrimenti.
     - total_routing_cost: Costo totale degli spostamenti.
     - total_overtime_cost: Costo totale degli straordinari.
     - total_waiting_time: Tempo totale di attesa.
     - not_used_ops: Lista degli operatori non utilizzati.
     """
 
-    used_ops = []
+    cost_variant = get_cost_variant(variant)
+    if session is None:
+        session = prepare_grs_session(operators, requests, patients, tau)
+
+    used_ops = set()
     feasible = True
-    assignments = {}
     total_routing_cost = 0
     total_overtime_cost = 0
 
-    for p in patients:
-        tau['h', p["id"]] = 0
-
-    # Ordina le richieste per il tempo minimo di inizio (α_i)
-    sorted_requests = sorted(requests, key=lambda r: parse_time_to_minutes(r["min_time_begin"]))
-
     # creo sorted_operators in modo che l'operatore a cui rimane più tempo da lavorare sia il primo 
     sorted_operators = sorted(operators, key=lambda o: o["Ho"] - o["wo_k"][k], reverse=True)
 
@@ -52,37 +157,41 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
 
 
     # Ciclo greedy: per ogni richiesta, seleziona l'operatore migliore in base al costo
-    for req in sorted_requests:
-        
-        alpha_i = parse_time_to_minutes(req["min_time_begin"])
-        beta_i = parse_time_to_minutes(req["max_time_begin"])
+    for entry in session:
+        req = entry["req"]
+        alpha_i = entry["alpha"]
+        beta_i = entry["beta"]
+        tau_row = entry["tau_row"]
 
         best_op = None
-        best_f_oi = float("inf")
+        best_cost = float("inf")
         best_r_c = float("inf")
         best_ov_c = float("inf")
         waiting_time = {}
 
-        for op in sorted_operators:
-            waiting_time[op["id"]] = max(alpha_i - op["eo"] - tau[op["current_patient_id"], req["project_id"]], 0) if op["current_patient_id"] != "h" else 0
-    
-        feasible_ops = [op for op in sorted_operators if op["eo"] + tau[op["current_patient_id"], req["project_id"]] <= beta_i and tau[op["current_patient_id"], req["project_id"]] + req["duration"] + waiting_time[op["id"]] <= op["ho"]]
+        if entry["servable"]:
+            for op in sorted_operators:
+                waiting_time[op["id"]] = max(alpha_i - op["eo"] - tau_row[op["current_patient_id"]], 0) if op["current_patient_id"] != "h" else 0
+        
+            feasible_ops = [op for op in sorted_operators if op["eo"] + tau_row[op["current_patient_id"]] <= beta_i and tau_row[op["current_patient_id"]] + req["duration"] + waiting_time[op["id"]] <= op["ho"]]
+        else:
+            feasible_ops = []
 
         if len(feasible_ops) == 0:
-            print(f"Richiesta {req['id']} non assegnata: nessun operatore disponibile.")
-            print("Beta_i: ", beta_i, " Alpha_i: ", alpha_i, " Duration: ", req["duration"])
-            print(""*5)
-            # for op in sorted_operators:
-            #     print(f"Operatore {op['id']}: eo = {op['eo']}, current_patient_id = {op['current_patient_id']}, ho = {op['ho']} tau = {tau[op['current_patient_id'], req['project_id']]}, waiting_time = {waiting_time[op['id']]}")
+            log.debug("Richiesta %s non assegnata: nessun operatore disponibile. Beta_i: %s Alpha_i: %s Duration: %s",
+                      req["id"], beta_i, alpha_i, req["duration"])
 
             feasible = False
+            if ledger is not None or diagnostics_enabled():
+                reason = unassignment_reason(beta_i, sorted_operators, tau_row)
+                if ledger is not None:
+                    ledger.unassign(req, reason, ledger_session)
+                diagnostic("unassigned_request", request=req["id"], alpha=alpha_i, beta=beta_i,
+                           duration=req["duration"], reason=reason, k=k, session=ledger_session)
            
 
         else:
             for op in feasible_ops:
-                # Calcolo il travel time dalla posizione corrente dell'operatore al paziente della richiesta
-                #travel_time = compute_travel_time(op, req["project_id"], patients)
-                
                 """
                 Calcolo del waiting_time:
                 - Se l'operatore ha già avuto almeno una richiesta assegnata (la lista op["Lo"] non è vuota),
@@ -95,8 +204,9 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
                
                 
                 r_c, ov_c, f_oi = compute_f_oi(op, req, waiting_time[op["id"]], k, tau=tau, down_time_true=down_time_true)
-                if f_oi < best_f_oi:
-                    best_f_oi = f_oi
+                cost = cost_variant(op, req, tau_row[op["current_patient_id"]], waiting_time[op["id"]], k, f_oi)
+                if cost < best_cost:
+                    best_cost = cost
                     best_op = op
                     best_ov_c = ov_c
                     best_r_c = r_c
@@ -104,7 +214,7 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
 
          # 4) Se ho trovato un operatore fattibile, aggiorno il suo stato e la richiesta
         if best_op is not None:
-            travel_time = tau[best_op["current_patient_id"], req["project_id"]]
+            travel_time = tau_row[best_op["current_patient_id"]]
 
 
             # print("Request ", req["id"], " assigned to operator ", best_op["id"], " with f_oi = ", best_f_oi, " and waiting time = ", waiting_time[best_op["id"]])
@@ -147,6 +257,8 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
             best_op["overtime_minutes_k"][k] = max(30 - best_op["ho"], 0)
 
             req["b_i"] = b_i
+            if ledger is not None:
+                ledger.assign(req, best_op["id"], b_i, ledger_session)
 
             # se b_i, inizio del servizio, è dopo le 11:30 e la richiesta non può iniziare dopo le 12:30
             # allora l'operatore ha lavorato un turno pieno la mattina e non può fare doppio turno
@@ -154,7 +266,7 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
             #     #Aggiungo che best op ha lavorato turno pieno la mattina e in questo giorno non può fare doppio turno
             #     best_op["worked_after_11:30am"] = True
 
-            used_ops.append(best_op["id"])
+            used_ops.add(best_op["id"])
 
             if b_i >= 11*60 + 30 and alpha_i < 12*60 + 30:
                 best_op["worked_after_11:30am_k"][k] = True
@@ -170,6 +282,47 @@ def grs_variants(operators, requests, patients, shift_end, down_time_true, tau,
 
     return total_routing_cost, total_overtime_cost, sum(op["do_k"][k] for op in operators), not_used_ops
 
+def grs_variants_batch(variants, operators, requests, patients, shift_end, down_time_true, tau, k):
+    """
+    Esegue più varianti GRS sulla stessa sessione condividendo la preparazione
+    (ordinamento delle richieste, conversione degli orari, tempi di viaggio e
+    pre-screening di fattibilità), calcolata una sola volta.
+
+    Ogni variante lavora su copie indipendenti degli operatori e delle richieste
+    (grs_variants scrive b_i nella richiesta), quindi operatori e richieste passati
+    non vengono modificati e ogni variante conserva i propri b_i.
+
+    :param variants: lista dei nomi delle varianti (chiavi di GRS_COST_VARIANTS).
+    :return: dizionario {variant: {"routing_cost", "overtime_cost", "waiting_time",
+             "not_used_ops", "operators", "requests"}} con un insieme di risultati per
+             variante; "requests" sono le copie delle richieste, nell'ordine di requests.
+    """
+    from copy import deepcopy
+
+    for variant in variants:
+        get_cost_variant(variant)
+
+    session = prepare_grs_session(operators, requests, patients, tau)
+
+    results = {}
+    for variant in variants:
+        # copie superficiali delle richieste, condivise tra Lo_k degli operatori copiati e la sessione
+        req_copies = {id(r): dict(r) for r in requests}
+        ops_variant = deepcopy(operators, dict(req_copies))
+        session_variant = [dict(entry, req=req_copies[id(entry["req"])]) for entry in session]
+        requests_variant = [req_copies[id(r)] for r in requests]
+        rc, ovc, doc, not_used_ops = grs_variants(ops_variant, requests_variant, patients, shift_end, down_time_true,
+                                                  tau, k, variant=variant, session=session_variant)
+        results[variant] = {
+            "routing_cost": rc,
+            "overtime_cost": ovc,
+            "waiting_time": doc,
+            "not_used_ops": not_used_ops,
+            "operators": ops_variant,
+            "requests": requests_variant,
+        }
+    return results
+
 ###############################################################################
 # Funzione per calcolare il costo extra (f_oi) dell'assegnazione
 ###############################################################################
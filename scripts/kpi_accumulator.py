@@ -0,0 +1,113 @@
+# Totali correnti dei KPI per operatore, sessione e settimana, aggiornati al consolidamento delle assegnazioni
+
+# KPI accumulati: minuti di attesa (do), viaggio (road_time), lavorati (wo), overtime
+# (overtime_minutes, azzerato all'inizio di ogni sessione), durata delle richieste
+# assegnate e numero di richieste assegnate
+KPI_FIELDS = ("waiting", "road", "worked", "overtime", "service", "requests")
+
+
+def operator_registry(operators):
+    """
+    Registro id -> operatore, al posto delle ricerche lineari per id in operators.
+    """
+    return {op["id"]: op for op in operators}
+
+
+class KPIAccumulator:
+    """
+    Totali dei KPI (KPI_FIELDS) aggiornati con commit() quando le assegnazioni della
+    configurazione migliore vengono consolidate negli operatori:
+      - per operatore (operator_totals), inizializzati dallo stato degli operatori alla creazione
+        (tranne overtime, che somma solo l'overtime delle sessioni consolidate);
+      - per sessione (session_totals e session_operators, solo gli operatori modificati);
+      - per la settimana (week_totals), somma su tutti gli operatori.
+
+    I riepiloghi di sessione e settimana sono letture dei totali, senza scorrere gli
+    operatori né confrontarli con una copia di inizio sessione.
+
+    L'overtime non si ricava dagli operatori (overtime_minutes vale solo per l'ultima
+    sessione): quando si riparte da un checkpoint i totali vanno ripristinati con
+    restore() da quelli salvati con state().
+    """
+
+    def __init__(self, operators):
+        self.registry = operator_registry(operators)
+        self.operator_totals = {}
+        for op_id, op in self.registry.items():
+            self.operator_totals[op_id] = {
+                "waiting": op["do"],
+                "road": op["road_time"],
+                "worked": op["wo"],
+                "overtime": 0,
+                "service": sum(req["duration"] for req, _ in op.get("Lo", [])),
+                "requests": len(op.get("Lo", [])),
+            }
+        self.week_totals = {field: sum(totals[field] for totals in self.operator_totals.values())
+                            for field in KPI_FIELDS}
+        self.session_totals = {}
+        self.session_operators = {}
+
+    def state(self):
+        """
+        Copia serializzabile dei totali, da salvare nei checkpoint.
+        """
+        return {
+            "operator_totals": {op_id: dict(totals) for op_id, totals in self.operator_totals.items()},
+            "week_totals": dict(self.week_totals),
+            "session_totals": {session: dict(totals) for session, totals in self.session_totals.items()},
+            "session_operators": {session: {op_id: dict(totals, ids=list(totals["ids"])) for op_id, totals in ops.items()}
+                                  for session, ops in self.session_operators.items()},
+        }
+
+    def restore(self, state):
+        """
+        Ripristina i totali salvati con state() (es. dopo restore_operators da un checkpoint).
+        """
+        self.operator_totals = {op_id: dict(totals) for op_id, totals in state["operator_totals"].items()}
+        self.week_totals = dict(state["week_totals"])
+        self.session_totals = {session: dict(totals) for session, totals in state["session_totals"].items()}
+        self.session_operators = {session: {op_id: dict(totals, ids=list(totals["ids"])) for op_id, totals in ops.items()}
+                                  for session, ops in state["session_operators"].items()}
+
+    def begin_session(self, session):
+        self.session_totals[session] = dict.fromkeys(KPI_FIELDS, 0)
+        self.session_operators[session] = {}
+
+    def commit(self, op, session, new_assignments, waiting, road, worked, overtime):
+        """
+        Registra le variazioni di un operatore consolidate nella sessione.
+
+        :param new_assignments: coppie (richiesta, b_i) aggiunte a Lo nella sessione.
+        :param waiting, road, worked: incrementi in minuti di do, road_time e wo.
+        :param overtime: overtime_minutes dell'operatore nella sessione.
+        """
+        if session not in self.session_totals:
+            self.begin_session(session)
+        delta = {
+            "waiting": waiting,
+            "road": road,
+            "worked": worked,
+            "overtime": overtime,
+            "service": sum(req["duration"] for req, _ in new_assignments),
+            "requests": len(new_assignments),
+        }
+        op_session = self.session_operators[session].setdefault(op["id"], dict.fromkeys(KPI_FIELDS, 0) | {"ids": []})
+        op_session["ids"].extend(req["id"] for req, _ in new_assignments)
+        for totals in (self.operator_totals[op["id"]], self.session_totals[session], self.week_totals, op_session):
+            for field, value in delta.items():
+                totals[field] += value
+
+    def session(self, session):
+        """
+        Totali della sessione (tutti zero se nessuna assegnazione è stata consolidata).
+        """
+        return self.session_totals.get(session, dict.fromkeys(KPI_FIELDS, 0))
+
+    def operator_session(self, session, op_id):
+        """
+        Variazioni dell'operatore nella sessione, con gli id delle richieste assegnate in "ids".
+        """
+        return self.session_operators.get(session, {}).get(op_id, dict.fromkeys(KPI_FIELDS, 0) | {"ids": []})
+
+    def __len__(self):
+        return len(self.registry)
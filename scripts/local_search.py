@@ -0,0 +1,388 @@
+# Post-ottimizzatore di ricerca locale per le route prodotte da grs_variants
+
+import time
+from utils import parse_time_to_minutes
+
+###############################################################################
+# Segmenti di route
+###############################################################################
+#
+# Ogni sotto-sequenza di richieste di una route viene riassunta da una tupla
+#   (D, E, L, T, first, last)
+# dove:
+#   - D: somma delle durate e dei tempi di viaggio interni (senza attese)
+#   - E: istante minimo di fine del segmento (attese comprese)
+#   - L: istante massimo di arrivo al primo nodo che rispetta tutte le finestre
+#   - T: tempo di viaggio interno al segmento
+#   - first, last: primo e ultimo nodo del segmento
+#
+# Arrivando al primo nodo all'istante a, il segmento termina in max(a + D, E)
+# ed è ammissibile se a <= L. La concatenazione di due segmenti costa O(1),
+# quindi ogni mossa si valuta in tempo costante combinando i segmenti
+# precalcolati della route (prefissi in avanti, suffissi all'indietro).
+
+INFEASIBLE = float("-inf")
+
+
+def route_node(req):
+    """
+    Nodo della route con i tempi della richiesta già convertiti in minuti.
+    """
+    return {
+        "req": req,
+        "pid": req["project_id"],
+        "alpha": parse_time_to_minutes(req["min_time_begin"]),
+        "beta": parse_time_to_minutes(req["max_time_begin"]),
+        "t": req["duration"],
+    }
+
+
+def node_segment(node):
+    """
+    Segmento formato da una singola richiesta.
+    """
+    return (node["t"], node["alpha"] + node["t"], node["beta"], 0, node, node)
+
+
+def concat_segments(tau, *segments):
+    """
+    Concatena i segmenti passati (ignorando quelli None) in O(1) per segmento.
+    Restituisce None se tutti i segmenti sono vuoti.
+    """
+    result = None
+    for seg in segments:
+        if seg is None:
+            continue
+        if result is None:
+            result = seg
+            continue
+        D_a, E_a, L_a, T_a, first_a, last_a = result
+        D_b, E_b, L_b, T_b, first_b, last_b = seg
+        c = tau[last_a["pid"], first_b["pid"]]
+        if L_a == INFEASIBLE or L_b == INFEASIBLE or E_a + c > L_b:
+            L = INFEASIBLE
+        else:
+            L = min(L_a, L_b - D_a - c)
+        result = (D_a + c + D_b, max(E_a + c + D_b, E_b), L, T_a + c + T_b, first_a, last_b)
+    return result
+
+
+def segment_table(tau, nodes):
+    """
+    Precalcola seg[i][j] per ogni sotto-sequenza i..j della route. Costa O(n^2),
+    ma le route di una sessione contengono poche richieste.
+    """
+    n = len(nodes)
+    seg = [[None] * n for _ in range(n)]
+    for i in range(n):
+        current = node_segment(nodes[i])
+        seg[i][i] = current
+        for j in range(i + 1, n):
+            current = concat_segments(tau, current, node_segment(nodes[j]))
+            seg[i][j] = current
+    return seg
+
+
+###############################################################################
+# Route e valutazione del costo
+###############################################################################
+
+class Route:
+    """
+    Route di un operatore nella sessione corrente, con la tabella dei segmenti
+    usata per valutare le mosse.
+    """
+
+    def __init__(self, op, nodes, start, wo_start, offset):
+        self.op = op
+        self.nodes = nodes
+        self.start = start          # e_o di inizio sessione
+        self.wo_start = wo_start    # w_o accumulato prima della sessione
+        self.offset = offset        # elementi di Lo_k[k] appartenenti a sessioni precedenti
+        self.seg = None
+
+    def refresh(self, tau):
+        self.seg = segment_table(tau, self.nodes)
+
+    def sub(self, i, j):
+        """
+        Segmento i..j (estremi inclusi), None se vuoto.
+        """
+        if i > j or i >= len(self.nodes) or j < 0:
+            return None
+        return self.seg[i][j]
+
+
+class CostModel:
+    """
+    Parametri di costo, gli stessi usati da compute_f_oi.
+    """
+
+    def __init__(self, shift_end, theta, op_cost_per_minute, down_time_true):
+        self.shift_end = shift_end
+        self.theta = theta
+        self.op_cost_per_minute = op_cost_per_minute
+        self.d_t_t = 1 if down_time_true else 0
+
+    def route_cost(self, segment, route):
+        """
+        Costo della route riassunta da segment, calcolato in O(1).
+
+        Il viaggio da casa al primo paziente ha tau = 0 e l'attesa prima della
+        prima richiesta non viene conteggiata, come in grs_variants.
+
+        :return: (costo, routing_cost, overtime_cost, waiting_time) oppure None
+                 se la route viola le finestre temporali o shift_end.
+        """
+        if segment is None:
+            return 0, 0, 0, 0
+
+        D, E, L, T, first, _ = segment
+        a = route.start
+        if L == INFEASIBLE or a > L:
+            return None
+
+        completion = max(a + D, E)
+        if completion > self.shift_end:
+            return None
+
+        b_first = max(a, first["alpha"])
+        waiting = completion - b_first - D
+        work = completion - b_first
+
+        Ho = route.op["Ho"]
+        overtime_cost = self.op_cost_per_minute * (max(route.wo_start + work - Ho, 0) - max(route.wo_start - Ho, 0))
+        routing_cost = self.theta * T
+        waiting_cost = (self.theta ** 2) * waiting * self.d_t_t
+
+        return routing_cost + overtime_cost + waiting_cost, routing_cost, overtime_cost, waiting
+
+
+###############################################################################
+# Mosse
+###############################################################################
+
+def _improve_two_opt(route, tau, model, current):
+    """
+    2-opt intra-route: inverte la sotto-sequenza i..j.
+    Il segmento invertito viene costruito incrementalmente al crescere di j.
+    """
+    n = len(route.nodes)
+    for i in range(n - 1):
+        reversed_seg = node_segment(route.nodes[i])
+        for j in range(i + 1, n):
+            reversed_seg = concat_segments(tau, node_segment(route.nodes[j]), reversed_seg)
+            candidate = model.route_cost(concat_segments(tau, route.sub(0, i - 1), reversed_seg, route.sub(j + 1, n - 1)), route)
+            if candidate is not None and candidate[0] < current[0] - 1e-9:
+                route.nodes[i:j + 1] = route.nodes[i:j + 1][::-1]
+                return True
+    return False
+
+
+def _improve_or_opt(route, tau, model, current, max_length=3):
+    """
+    Or-opt intra-route: sposta una sotto-sequenza di 1..max_length richieste
+    in un'altra posizione della stessa route.
+    """
+    n = len(route.nodes)
+    for length in range(1, max_length + 1):
+        for i in range(n - length + 1):
+            j = i + length - 1
+            moved = route.sub(i, j)
+            # Inserimento prima della sotto-sequenza
+            for p in range(i):
+                segment = concat_segments(tau, route.sub(0, p - 1), moved, route.sub(p, i - 1), route.sub(j + 1, n - 1))
+                candidate = model.route_cost(segment, route)
+                if candidate is not None and candidate[0] < current[0] - 1e-9:
+                    route.nodes[p:j + 1] = route.nodes[i:j + 1] + route.nodes[p:i]
+                    return True
+            # Inserimento dopo la sotto-sequenza
+            for p in range(j + 2, n + 1):
+                segment = concat_segments(tau, route.sub(0, i - 1), route.sub(j + 1, p - 1), moved, route.sub(p, n - 1))
+                candidate = model.route_cost(segment, route)
+                if candidate is not None and candidate[0] < current[0] - 1e-9:
+                    route.nodes[i:p] = route.nodes[j + 1:p] + route.nodes[i:j + 1]
+                    return True
+    return False
+
+
+def _improve_relocate(route_a, route_b, tau, model, costs):
+    """
+    Relocate inter-route: sposta una richiesta da route_a a route_b.
+    """
+    n, m = len(route_a.nodes), len(route_b.nodes)
+    before = costs[id(route_a)][0] + costs[id(route_b)][0]
+    for i in range(n):
+        removed = model.route_cost(concat_segments(tau, route_a.sub(0, i - 1), route_a.sub(i + 1, n - 1)), route_a)
+        if removed is None:
+            continue
+        node_seg = route_a.sub(i, i)
+        for p in range(m + 1):
+            inserted = model.route_cost(concat_segments(tau, route_b.sub(0, p - 1), node_seg, route_b.sub(p, m - 1)), route_b)
+            if inserted is not None and removed[0] + inserted[0] < before - 1e-9:
+                route_b.nodes.insert(p, route_a.nodes.pop(i))
+                return True
+    return False
+
+
+def _improve_swap(route_a, route_b, tau, model, costs):
+    """
+    Swap inter-route: scambia una richiesta di route_a con una di route_b.
+    """
+    n, m = len(route_a.nodes), len(route_b.nodes)
+    before = costs[id(route_a)][0] + costs[id(route_b)][0]
+    for i in range(n):
+        prefix_a, suffix_a = route_a.sub(0, i - 1), route_a.sub(i + 1, n - 1)
+        for j in range(m):
+            new_a = model.route_cost(concat_segments(tau, prefix_a, route_b.sub(j, j), suffix_a), route_a)
+            if new_a is None:
+                continue
+            new_b = model.route_cost(concat_segments(tau, route_b.sub(0, j - 1), route_a.sub(i, i), route_b.sub(j + 1, m - 1)), route_b)
+            if new_b is not None and new_a[0] + new_b[0] < before - 1e-9:
+                route_a.nodes[i], route_b.nodes[j] = route_b.nodes[j], route_a.nodes[i]
+                return True
+    return False
+
+
+###############################################################################
+# Aggiornamento dello stato dell'operatore
+###############################################################################
+
+def apply_route(route, tau, k, shift_end):
+    """
+    Riscrive Lo_k[k] e i campi *_k dell'operatore a partire dalla route migliorata,
+    ricalcolando b_i con la stessa logica di grs_variants.
+    """
+    op = route.op
+    eo = route.start
+    current = "h"
+    travel_total = 0
+    waiting_total = 0
+    worked_after = False
+    schedule = []
+
+    for position, node in enumerate(route.nodes):
+        travel_time = tau[current, node["pid"]] if current != "h" else 0
+        arrival_time = eo + travel_time
+        waiting_time = max(node["alpha"] - arrival_time, 0) if position > 0 else 0
+        b_i = max(arrival_time, node["alpha"])
+        eo = b_i + node["t"]
+
+        travel_total += travel_time
+        waiting_total += waiting_time
+        node["req"]["b_i"] = b_i
+        schedule.append((node["req"], b_i))
+        current = node["pid"]
+        if b_i >= 11*60 + 30 and node["alpha"] < 12*60 + 30:
+            worked_after = True
+
+    work = (eo - max(route.start, route.nodes[0]["alpha"])) if route.nodes else 0
+
+    op["Lo_k"][k] = op["Lo_k"][k][:route.offset] + schedule
+    op["wo_k"][k] = route.wo_start + work
+    op["road_time_k"][k] = travel_total
+    op["do_k"][k] = waiting_total
+    # come in grs_variants il flag viene solo impostato a True, mai azzerato
+    if worked_after:
+        op["worked_after_11:30am_k"][k] = True
+    if route.nodes:
+        op["eo"] = eo
+        op["ho"] = shift_end - eo
+        op["current_patient_id"] = current
+        op["overtime_minutes_k"][k] = max(30 - op["ho"], 0)
+    else:
+        op["eo"] = route.start
+        op["ho"] = shift_end - route.start
+        op["current_patient_id"] = "h"
+        op["overtime_minutes_k"][k] = 0
+
+
+###############################################################################
+# Funzione principale
+###############################################################################
+
+def local_search(operators, shift_end, tau, k, time_budget=None, down_time_true=False,
+                 theta=0.37, op_cost_per_minute=0.29):
+    """
+    Post-ottimizzatore di ricerca locale da eseguire dopo grs_variants sugli
+    operatori di un cluster.
+
+    Considera per ogni operatore solo le richieste aggiunte a Lo_k[k] nella
+    sessione corrente e applica, con strategia first-improvement:
+      - 2-opt e or-opt all'interno della route di ciascun operatore
+      - relocate e swap tra operatori dello stesso cluster
+
+    Ogni mossa viene valutata in O(1) (routing, attesa e overtime) tramite i
+    segmenti precalcolati della route; le mosse che violano le finestre
+    temporali o shift_end vengono scartate.
+
+    Lo stato di partenza della sessione viene letto da:
+      - op["eo_start_k"][k]: e_o all'inizio della sessione
+      - op["wo"], op["Lo"]: valori consolidati prima della sessione
+
+    :param operators: operatori del cluster (dizionari) già elaborati da grs_variants.
+    :param shift_end: orario di fine turno (in minuti).
+    :param tau: matrice (dizionario) dei tempi di viaggio.
+    :param k: configurazione di cluster corrente.
+    :param time_budget: tempo massimo in secondi, None per nessun limite.
+    :param down_time_true: se True il tempo di attesa entra nel costo, come in compute_f_oi.
+    :return: Tuple con le variazioni di costo (delta_routing_cost, delta_overtime_cost, delta_waiting_time).
+    """
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    model = CostModel(shift_end, theta, op_cost_per_minute, down_time_true)
+
+    routes = []
+    for op in operators:
+        offset = len(op["Lo"])
+        nodes = [route_node(req) for (req, _) in op["Lo_k"][k][offset:]]
+        route = Route(op, nodes, op["eo_start_k"][k], op["wo"], offset)
+        route.refresh(tau)
+        routes.append(route)
+
+    costs = {id(route): model.route_cost(route.sub(0, len(route.nodes) - 1), route) for route in routes}
+    if any(cost is None for cost in costs.values()):
+        # Route di partenza non ammissibile secondo il modello: non si modifica nulla
+        return 0, 0, 0
+    initial = {id(route): costs[id(route)] for route in routes}
+
+    def out_of_time():
+        return deadline is not None and time.perf_counter() > deadline
+
+    improved = True
+    while improved and not out_of_time():
+        improved = False
+        changed = []
+
+        for route in routes:
+            current = costs[id(route)]
+            if _improve_two_opt(route, tau, model, current) or _improve_or_opt(route, tau, model, current):
+                changed = [route]
+                break
+            if out_of_time():
+                break
+
+        if not changed:
+            for route_a in routes:
+                for route_b in routes:
+                    if route_a is route_b:
+                        continue
+                    if _improve_relocate(route_a, route_b, tau, model, costs) or \
+                            _improve_swap(route_a, route_b, tau, model, costs):
+                        changed = [route_a, route_b]
+                        break
+                if changed or out_of_time():
+                    break
+
+        for route in changed:
+            route.refresh(tau)
+            costs[id(route)] = model.route_cost(route.sub(0, len(route.nodes) - 1), route)
+        improved = bool(changed)
+
+    for route in routes:
+        apply_route(route, tau, k, shift_end)
+
+    delta_routing = sum(costs[id(r)][1] - initial[id(r)][1] for r in routes)
+    delta_overtime = sum(costs[id(r)][2] - initial[id(r)][2] for r in routes)
+    delta_waiting = sum(costs[id(r)][3] - initial[id(r)][3] for r in routes)
+
+    return delta_routing, delta_overtime, delta_waiting
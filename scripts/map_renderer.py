@@ -0,0 +1,69 @@
+# Rendering differito delle mappe dei cluster in un processo separato, con cache locale delle tile
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from diagnostics import log
+
+# Cache su disco delle tile della basemap (contextily): dopo il primo download le
+# mappe vengono generate senza accedere alla rete. Modificabile con TESI_TILE_CACHE.
+TILE_CACHE_DIR = os.environ.get(
+    "TESI_TILE_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "tile_cache"))
+
+# Mappe generate da method_overview: solo best_k, ogni k <= MAX_MAP_K oppure nessuna
+MAP_PLOTS = ("best", "all", "none")
+MAX_MAP_K = 6
+
+
+def _init_render_worker(tile_cache_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import contextily as ctx
+    os.makedirs(tile_cache_dir, exist_ok=True)
+    ctx.set_cache_dir(tile_cache_dir)
+
+
+def _render(points_latlon, clusters, k, variant_name, d_i, s, medoid_indices):
+    # geopandas e contextily vengono importati solo nel processo di rendering
+    from visualization_map import plot_clusters_with_map
+    plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, medoid_indices)
+    return k, d_i, s
+
+
+class MapRenderer:
+    """
+    Coda delle mappe dei cluster (plot_clusters_with_map) da generare in un processo
+    separato: submit() accoda il job e ritorna subito, così il ciclo su k non attende
+    GeoDataFrame, riproiezione, download delle tile e salvataggio del PNG.
+    Il processo viene avviato solo al primo job e usa la cache delle tile in tile_cache_dir.
+    """
+
+    def __init__(self, tile_cache_dir=TILE_CACHE_DIR):
+        self._tile_cache_dir = tile_cache_dir
+        self._executor = None
+        self._futures = []
+
+    def submit(self, points_latlon, clusters, k, variant_name, d_i, s, medoid_indices=None):
+        if self._executor is None:
+            # spawn: il processo non eredita i thread attivi (es. SchedulingWriter) né i loro lock
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_render_worker, initargs=(self._tile_cache_dir,))
+        clusters = {c_idx: list(indices) for c_idx, indices in clusters.items()}
+        self._futures.append(self._executor.submit(_render, points_latlon, clusters, k, variant_name, d_i, s,
+                                                   None if medoid_indices is None else list(medoid_indices)))
+
+    def close(self):
+        """
+        Attende le mappe in coda; gli errori di rendering vengono solo segnalati.
+        """
+        for future in self._futures:
+            try:
+                future.result()
+            except Exception as e:
+                log.warning("Errore nella generazione della mappa dei cluster: %s", e)
+        self._futures = []
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -2,19 +2,25 @@ from typing import List, Dict, Any
 import numpy as np
 import copy
 
-from grs_variants import grs_variants
-from mip_clustering import MIPClustering
-from data_loader import operators, requests, patients
-from MOST import MOST
-from visualization import plot_clusters
+from parallel_grs import create_cluster_pool, run_clusters
+from assignment_ledger import AssignmentLedger
+from kpi_accumulator import KPIAccumulator
+from shift_state import ShiftState
+from cluster_assignment import OPERATOR_ASSIGNMENTS, medoid_patient_ids
+from diagnostics import log, configure_logging, debug_enabled, diagnostic, diagnostics_enabled
+from MOST import patient_profiles, cluster_concurrency
+from scheduling_writer import SchedulingWriter
+from map_renderer import MapRenderer, MAP_PLOTS, MAX_MAP_K
+from schedule_store import ScheduleStore
+from checkpoint import (checkpoint_path, discard_checkpoints, latest_checkpoint, load_checkpoint, operator_state,
+                        previous_session, restore_operators, checkpoint_payload, session_key)
 from utils import *
 from copy import deepcopy
 from combine_results import combine_results
-from visualization_map import plot_clusters_with_map
 #from scheduling_mapper import create_hhc_map_session, create_map_from_txt_schedules
-
-
-import matplotlib.pyplot as plt
+# Moduli pesanti importati solo quando servono: solver (gurobipy) alla prima risoluzione,
+# dati (data_loader) nelle funzioni run_*, grafici (matplotlib, geopandas, sklearn) nelle
+# funzioni di report e nel processo di map_renderer
 
 
 def method_overview(
@@ -28,6 +34,17 @@ def method_overview(
     Kmax: int,
     multiplier: float,
     kfixed: int = None,
+    local_search_budget: float = None,
+    n_workers: int = None,
+    grs_variant: str = "f_oi",
+    grs_engine: str = "greedy",
+    operator_assignment: str = "optimal",
+    wait_for_input: bool = True,
+    checkpoint_dir: str = None,
+    resume: bool = False,
+    days: List[int] = None,
+    map_plots: str = "best",
+    clustering_cache: dict = None,
 ):
     """
     Implementazione dell'Algoritmo METHOD OVERVIEW
@@ -70,18 +87,53 @@ def method_overview(
       - Kmax: numero massimo di cluster da testare (in assenza di un k fisso, si itera da 1 fino a Kmax-1).
       - multiplier: fattore usato per determinare il numero di operatori necessari.
       - kfixed: se specificato, viene utilizzato esclusivamente questo valore di k, ignorando l'intervallo.
+      - local_search_budget: se specificato, tempo massimo in secondi per sessione dedicato al post-ottimizzatore
+        local_search sulle route prodotte da GRS, suddiviso equamente tra i valori di k testati.
+      - n_workers: se specificato, i cluster di ogni configurazione k vengono risolti in parallelo
+        da un pool di n_workers processi.
+      - grs_variant: variante di costo usata da grs_variants per scegliere l'operatore
+        ("f_oi", "Time", "MaxTimeUse", "MinResidualTime", "TradeOff").
+      - grs_engine: motore di assegnazione delle richieste nei cluster, "greedy" (grs_variants)
+        oppure "regret" (regret_insertion).
+      - operator_assignment: assegnazione degli operatori ai cluster, "optimal" (minimo tempo
+        totale operatore-medoide con linear_sum_assignment) oppure "greedy" (un cluster alla volta).
+      - wait_for_input: se True, al termine attende la conferma da tastiera; False per le esecuzioni
+        non interattive (es. run_configurations_parallel).
+      - checkpoint_dir: se specificato, dopo ogni (giorno, sessione) lo stato consolidato (operatori,
+        cost_ds, totali, piano, ledger, best_k, b_i delle richieste e totali dei KPI) viene salvato in un checkpoint
+        binario compresso in questa cartella (vedi checkpoint.py).
+      - resume: se True, riprende dall'ultimo checkpoint in checkpoint_dir, saltando le sessioni già completate.
+      - days: giorni da elaborare (default tutti, 0..6). Se il primo giorno non è 0, lo stato iniziale
+        viene letto dal checkpoint della sessione precedente, che deve esistere: così un singolo
+        giorno può essere rieseguito in isolamento (es. days=[3]). I checkpoint delle sessioni
+        successive vengono rimossi, perché non più coerenti con lo stato rielaborato.
+      - map_plots: mappe dei cluster (plot_clusters_with_map) da generare, in un processo separato
+        dopo la scelta di best_k (vedi map_renderer.py): "best" solo per best_k di ogni sessione,
+        "all" per ogni k <= 6 testato, "none" nessuna.
+      - clustering_cache: dizionario in cui conservare le soluzioni di MIPClustering (cluster e
+        medoidi, None se non ammissibile) per pazienti della sessione, pesi e k: con lo stesso
+        dizionario, le esecuzioni successive sulla stessa tau non risolvono di nuovo il modello
+        (vedi planning_service.py).
 
     L’algoritmo restituisce una struttura contenente i costi complessivi per giorno e sessione, 
     insieme a dettagliamenti relativi alle assegnazioni e ai costi specifici, utile per il reporting e 
-    l’analisi comparativa delle configurazioni.
+    l’analisi comparativa delle configurazioni. La chiave 'plan' contiene, per ogni (giorno, sessione),
+    il k scelto, i medoidi e i pazienti di ciascun cluster e gli id degli operatori assegnati,
+    come richiesto da online_replanning. La chiave 'ledger' contiene l'AssignmentLedger della
+    configurazione scelta per ogni sessione (stato, operatore, b_i e motivo di mancata assegnazione
+    di ogni richiesta). La chiave 'kpi' contiene il KPIAccumulator con i totali per operatore,
+    sessione e settimana.
     """
 
-    # Parametri di configurazione
-    morning_start: int = 420  # 7:00
-    morning_end:   int = 750  # 12:30 with 30 min ov
-    afternoon_start: int = 960   # 16:00
-    afternoon_end:   int = 1320  # 22:00 with 30 min ov
-    
+    # Solver MIP (gurobipy): importato qui e non all'import del modulo
+    from mip_clustering import MIPClustering
+
+    if operator_assignment not in OPERATOR_ASSIGNMENTS:
+        raise ValueError(f"Assegnazione operatori '{operator_assignment}' non riconosciuta. Usa 'optimal' oppure 'greedy'.")
+    if map_plots not in MAP_PLOTS:
+        raise ValueError(f"Valore di map_plots '{map_plots}' non riconosciuto. Usa 'best', 'all' oppure 'none'.")
+    assign_operators = OPERATOR_ASSIGNMENTS[operator_assignment]
+
     total_cost = 0
 
     for op in operators:
@@ -97,10 +149,8 @@ def method_overview(
         op["Lo"] = []
 
 
-    session_bounds = {
-        'm': (morning_start, morning_end),
-        'a': (afternoon_start, afternoon_end),
-    }
+    # Parametri di configurazione: inizio e fine (con 30 min di overtime) di ogni sessione
+    session_bounds = SESSION_BOUNDS
 
     sessions = ['m', 'a']
 
@@ -111,34 +161,108 @@ def method_overview(
     # Loop su tutti i giorni e su tutte le sessioni (morning, afternoon)
     # =======================================================================
     all_assignments = {}
+    # Piano consolidato per giorno/sessione, usato da online_replanning
+    plan = {}
+    # Stato delle richieste nelle configurazioni scelte
+    ledger = AssignmentLedger()
     total_overtime_cost = 0
     total_routing_cost = 0
-
-    for d_i in range(7):
-        print(f"[DEBUG] Inizio elaborazione giorno {d_i}")
+    # k scelto per ogni giorno/sessione
+    best_k_ds = {}
+
+    # Stato iniziale da checkpoint: giorni isolati (days) oppure ripresa (resume)
+    days = list(range(7)) if days is None else sorted(days)
+    start_checkpoint = None
+    first_session = previous_session(days[0], sessions[0]) if days else None
+    if first_session is not None:
+        if checkpoint_dir is None:
+            raise ValueError(f"Per elaborare i giorni {days} serve checkpoint_dir con il checkpoint della sessione {first_session}.")
+        start_checkpoint = checkpoint_path(checkpoint_dir, *first_session)
+        if not os.path.exists(start_checkpoint):
+            raise FileNotFoundError(f"Checkpoint {start_checkpoint} non trovato: eseguire prima i giorni precedenti.")
+    elif resume and checkpoint_dir is not None:
+        start_checkpoint = latest_checkpoint(checkpoint_dir)
+
+    # Ultima sessione completata (chiave di session_key), None se si parte da zero
+    completed = None
+    start_session = None
+    if start_checkpoint is not None:
+        state = load_checkpoint(start_checkpoint)
+        restore_operators(operators, state["operators"])
+        cost_ds = state["cost_ds"]
+        total_cost = state["total_cost"]
+        total_overtime_cost = state["total_overtime_cost"]
+        total_routing_cost = state["total_routing_cost"]
+        plan = state["plan"]
+        ledger = AssignmentLedger(state["ledger"])
+        best_k_ds = state["best_k"]
+        for r in requests:
+            if r["id"] in state["b_i"]:
+                r["b_i"] = state["b_i"][r["id"]]
+        start_session = (state["day"], state["session"])
+        completed = session_key(*start_session)
+        log.info("Ripresa dal checkpoint %s (giorno %s sessione %s completati)", start_checkpoint, state["day"], state["session"])
+
+    # I checkpoint successivi al punto di partenza (di un'esecuzione precedente) verrebbero
+    # presi da una ripresa anche se questa esecuzione si interrompe prima di riscriverli
+    if checkpoint_dir is not None:
+        for path in discard_checkpoints(checkpoint_dir, start_session):
+            log.debug("Checkpoint non più valido rimosso: %s", path)
+
+    # Totali dei KPI aggiornati al consolidamento di ogni sessione (dopo l'eventuale ripristino)
+    kpi = KPIAccumulator(operators)
+    if start_checkpoint is not None and "kpi" in state:
+        # overtime e totali delle sessioni già completate non si ricavano dagli operatori
+        kpi.restore(state["kpi"])
+    # Turni mattina/pomeriggio per operatore e giorno, per SSRo, DSRo e priority
+    shift_state = ShiftState(operators)
+
+    # Pool di processi per la risoluzione parallela dei cluster (None = sequenziale)
+    cluster_pool = create_cluster_pool(tau, n_workers)
+    # Scheduling per sessione salvato in background nello store della variante,
+    # svuotato se non si riprende da un checkpoint
+    if completed is None:
+        store = ScheduleStore(variant)
+        store.clear()
+        store.close()
+    scheduling_writer = SchedulingWriter(patients)
+    map_renderer = MapRenderer()
+
+    for d_i in days:
+        log.info("Inizio elaborazione giorno %s", d_i)
 
         #Reset each operator variable related to his shift
-        for op in operators:
-            op["worked_morning"] = False
-            op["worked_after_11:30am"] = False
-            op["single_shift_requests"] = 0
-            op["double_shift_requests"] = 0
+        # (non se la mattina è già stata ripristinata da un checkpoint)
+        if completed is None or session_key(d_i, sessions[0]) > completed:
+            for op in operators:
+                op["worked_morning"] = False
+                op["worked_after_11:30am"] = False
+                op["single_shift_requests"] = 0
+                op["double_shift_requests"] = 0
 
 
       
         for s in sessions:
-            print(f"[DEBUG] Elaborazione sessione: {s} per giorno {d_i}")
+            if completed is not None and session_key(d_i, s) <= completed:
+                log.info("Sessione %s del giorno %s già completata nel checkpoint", s, d_i)
+                continue
+            log.info("Elaborazione sessione: %s per giorno %s", s, d_i)
             
-            update_operator_shift_counts(operators)
-            update_operator_priority(operators, epsilon, d_i, s)
+            # Aggiorna contatori di turno, SSRo, DSRo e priority e ordina O in base a op['priority']
+            O_sorted = shift_state.update_operators(operators, epsilon, d_i, s)
 
             
-            for op in operators:
-                print("SSRo: ", np.round(op["SSRo"], 2), " - DSRo: ", np.round(op["DSRo"], 2), "operatore: ", op["id"], "priority: ", op["priority"])
+            # Stato SSRo/DSRo di ogni operatore: formattato solo se il livello è attivo
+            if debug_enabled():
+                for op in operators:
+                    log.debug("SSRo: %.2f - DSRo: %.2f operatore: %s priority: %s", op["SSRo"], op["DSRo"], op["id"], op["priority"])
+            if diagnostics_enabled():
+                for op in operators:
+                    diagnostic("operator_priority", day=d_i, session=s, operator=op["id"],
+                               SSRo=op["SSRo"], DSRo=op["DSRo"], priority=op["priority"])
 
-            # Ordiniamo O in base a op['priority']
-            O_sorted = sorted(operators, key=lambda x: x['priority'])
-            print([op["id"] for op in O_sorted])
+            if debug_enabled():
+                log.debug("Operatori ordinati per priorità: %s", [op["id"] for op in O_sorted])
             #input()
 
             # Estrazione della subset di richieste Rds per il giorno d_i e la sessione s
@@ -149,9 +273,10 @@ def method_overview(
             Rds = [
                 r for r in day_requests
                 if session_start <= parse_time_to_minutes(r["min_time_begin"]) < session_end]
-            print(f"[DEBUG] Giorno {d_i} sessione {s}: {len(Rds)} richieste filtrate")
+            log.debug("Giorno %s sessione %s: %s richieste filtrate", d_i, s, len(Rds))
 
             baseline_operators = deepcopy(operators)
+            kpi.begin_session((d_i, s))
             
             # Estrazione della subset di pazienti Pds effettivamente coinvolti (cioè
             # quei pazienti che hanno almeno una richiesta in Rds)
@@ -171,10 +296,19 @@ def method_overview(
             
             points = np.array([[p['lat'], p['lon']] for p in Pds])
 
+            # Profili di attività per paziente (richieste attive per slot e durata totale),
+            # calcolati una sola volta per sessione: µc di ogni cluster, per ogni k, è
+            # ottenuto sommando i profili dei pazienti del cluster
+            profiles, profile_durations = patient_profiles(Rds, [p['id'] for p in Pds], session_start, session_end)
+            patient_row = {p['id']: idx for idx, p in enumerate(Pds)}
+            request_rows = np.array([patient_row[r['project_id']] for r in Rds], dtype=int)
+
             
             best_cost_for_k = None
             best_k = None
             best_clusters = None
+            best_medoids = None
+            best_clusters_dict = None
             best_assignment = None
 
             w = wpds  # pesi per la funzione obiettivo
@@ -193,20 +327,23 @@ def method_overview(
                 op["worked_morning_k"] = {}
                 op["worked_after_11:30am_k"] = {}
                 op["overtime_minutes_k"] = {}
+                op["eo_start_k"] = {}
 
           
-            print(f"[DEBUG] Inizio test per diversi valori di K (1..{Kmax}) per giorno {d_i} sessione {s}")
+            log.debug("Inizio test per diversi valori di K (1..%s) per giorno %s sessione %s", Kmax, d_i, s)
             
             
             unassigned_requests_k = {}
+            ledger_k = {}
             k_values = range(1, Kmax) if kfixed is None else [kfixed]
             for k in k_values:
                 unassigned_requests_k[k] = False
+                ledger_k[k] = AssignmentLedger()
                 cost_k = 0
                 routing_cost = 0
                 overtime_cost = 0
                 d_ok = 0
-                print(f"[DEBUG] Test con k = {k}")
+                log.debug("Test con k = %s", k)
                 # Setto lo stato degli operatori in base alla sessione, mattina o pomeriggio
                 # e aggiorno i contatori di shift e priorità
                 if s == 'm':
@@ -226,6 +363,7 @@ def method_overview(
                     op["Lo_k"][k] = deepcopy(op["Lo"])
                     op["do_k"][k] = 0
                     op["overtime_minutes_k"][k] = 0
+                    op["eo_start_k"][k] = op["eo"]
                     
                     #Check operator params corecteness
                     #print("Operator ", op["id"], " - global_assignments: ", op["global_assignments"], " - Lo: ", op["Lo"], " - Lok: ", op["Lo_k"][k], " h_o: ", op["ho"], " hok: ", op["ho_k"][k], " e_o: ", op["eo"], " eok: ", op["eo_k"][k], " dok: ", op["do_k"][k], " w_o: ", op["wo"], " wok: ", op["wo_k"][k]) 
@@ -233,51 +371,56 @@ def method_overview(
 
 
 
-                P_indices = list(range(len(Pds))) # indici dei pazienti
-
-                # Costruzione del dizionario tau_indices: le chiavi sono coppie di indici (i, j)
-                tau_indices = {}
-                for i in range(len(Pds)):
-                    for j in range(len(Pds)):
-                        id_i = Pds[i]['id']
-                        id_j = Pds[j]['id']
-                        tau_indices[(i, j)] = tau.get((id_i, id_j), float('inf'))
-
-                # Costruzione del dizionario dei pesi indicizzati: le chiavi sono gli indici di Pds
-                w_indices = {}
-                for i in range(len(Pds)):
-                    p_id = Pds[i]['id']
-                    w_indices[i] = wpds[p_id]
-
-                clusterer = MIPClustering(
-                    P = P_indices,       # lista degli indici dei pazienti
-                    K = k,         # numero di cluster
-                    tau = tau_indices,     # la matrice delle distanze
-                    w = w_indices          # i pesi per paziente { i: wpds[i] }
-                )
+                # Il clustering dipende solo da pazienti, pesi e k (con tau fissata)
+                cache_key = (tuple(p['id'] for p in Pds), tuple(wpds[p['id']] for p in Pds), k)
+                if clustering_cache is not None and cache_key in clustering_cache:
+                    clustering = clustering_cache[cache_key]
+                    log.debug("Clustering con k=%s letto dalla cache.", k)
+                else:
+                    P_indices = list(range(len(Pds))) # indici dei pazienti
+
+                    # Costruzione del dizionario tau_indices: le chiavi sono coppie di indici (i, j)
+                    tau_indices = {}
+                    for i in range(len(Pds)):
+                        for j in range(len(Pds)):
+                            id_i = Pds[i]['id']
+                            id_j = Pds[j]['id']
+                            tau_indices[(i, j)] = tau.get((id_i, id_j), float('inf'))
+
+                    # Costruzione del dizionario dei pesi indicizzati: le chiavi sono gli indici di Pds
+                    w_indices = {}
+                    for i in range(len(Pds)):
+                        p_id = Pds[i]['id']
+                        w_indices[i] = wpds[p_id]
+
+                    clusterer = MIPClustering(
+                        P = P_indices,       # lista degli indici dei pazienti
+                        K = k,         # numero di cluster
+                        tau = tau_indices,     # la matrice delle distanze
+                        w = w_indices          # i pesi per paziente { i: wpds[i] }
+                    )
 
-                grb_status = clusterer.solve(time_limit=100)
+                    grb_status = clusterer.solve(time_limit=100)
+                    clustering = None if grb_status is False else (clusterer.get_clusters(), clusterer.get_medoids())
+                    if clustering_cache is not None:
+                        clustering_cache[cache_key] = clustering
 
-                if grb_status is False:
-                    print(f"[DEBUG] Clustering con k={k} non ammissibile.")
+                if clustering is None:
+                    log.debug("Clustering con k=%s non ammissibile.", k)
                     # input("Press Enter to continue...")
                     continue
 
 
-                clusters_dict = clusterer.get_clusters()
-                medoids_list = clusterer.get_medoids()
-
-                from visualization import plot_clusters
+                clusters_dict, medoids_list = clustering
 
-
-                
+                # from visualization import plot_clusters
                 # plot_clusters(np.array([[p['lat'], p['lon']] for p in Pds]), clusters_dict, k, variant, d_i, s, medoids_list, output_dir=RESULTS_DIR)
                 
-                if k <= 6:
-                    plot_clusters_with_map(np.array([[p['lat'], p['lon']] for p in Pds]), clusters_dict, k, variant, d_i, s, medoids_list)
+                if map_plots == "all" and k <= MAX_MAP_K:
+                    map_renderer.submit(np.array([[p['lat'], p['lon']] for p in Pds]), clusters_dict, k, variant, d_i, s, medoids_list)
                 # input("Press Enter to continue...")
                 
-                print(f"[DEBUG] Clustering con k={k} completato, {len(clusters_dict)} cluster creati.")
+                log.debug("Clustering con k=%s completato, %s cluster creati.", k, len(clusters_dict))
 
                 clusters = {}
                 for cluster_id, point_indices in clusters_dict.items():
@@ -294,23 +437,33 @@ def method_overview(
                 
                 session_start, session_end = session_bounds[s]
 
-                for c_idx, cluster in clusters.items():
-                    cluster_patients_ids = {p["id"] for p in cluster}
-                    Rdsc = [req for req in Rds if req['project_id'] in cluster_patients_ids]
+                # etichetta di cluster (riga) per ogni paziente di Pds
+                cluster_keys = list(clusters_dict)
+                labels = np.full(len(Pds), -1, dtype=int)
+                for row, c_idx in enumerate(cluster_keys):
+                    labels[clusters_dict[c_idx]] = row
 
-                    # calcolo mc
-                    mc = 0
-                    if len(Rdsc) > 0:
-                        mc = MOST(Rdsc, session_start, session_end)
+                # mc e somma delle durate per tutti i cluster della configurazione in una sola chiamata
+                mc_values, duration_values = cluster_concurrency(profiles, profile_durations, labels, len(cluster_keys))
+
+                # Rdsc di ogni cluster con un solo passaggio su Rds, mantenendone l'ordine
+                Rdsc_by_row = [[] for _ in cluster_keys]
+                for req, row in zip(Rds, labels[request_rows]):
+                    if row >= 0:
+                        Rdsc_by_row[row].append(req)
+
+                for row, c_idx in enumerate(cluster_keys):
+                    Rdsc = Rdsc_by_row[row]
+                    mc = int(mc_values[row])
                     
                     # somma durate di Rdsc
-                    sum_durations = sum(rq['duration'] for rq in Rdsc)
+                    sum_durations = duration_values[row]
                     five_hours_in_minutes = 300
                     exp_op = np.ceil(sum_durations / five_hours_in_minutes)
                     mu_c = max(exp_op, mc)
                     total_mu += mu_c
 
-                    print("Min same time: ", mc, " - Stima con somma tempi richieste: ", exp_op, " - Numero richieste: ", len(Rdsc))
+                    log.debug("Min same time: %s - Stima con somma tempi richieste: %s - Numero richieste: %s", mc, exp_op, len(Rdsc))
                 
                     cluster_info.append({
                         'cluster_idx': c_idx,
@@ -338,14 +491,12 @@ def method_overview(
 
 
 
-                print("------------------------------------------------------------")
-                print(f"Operatori assegnati per configurazione {k} con fattore moltiplicativo: {multiplier}", num_ops_needed)
-                print("------------------------------------------------------------")
+                log.info("Operatori assegnati per configurazione %s con fattore moltiplicativo %s: %s", k, multiplier, num_ops_needed)
                 
 
                 if num_ops_needed > len(operators):
-                    print(f"[DEBUG] Attenzione: numero di operatori necessari ({num_ops_needed}) maggiore del totale ({len(operators)})")
-                    print(f"[DEBUG] Salto la configurazione con k = {k}")
+                    log.warning("Numero di operatori necessari (%s) maggiore del totale (%s): salto la configurazione con k = %s",
+                                num_ops_needed, len(operators), k)
                     cost_k = float('inf')
                     continue
 
@@ -354,40 +505,13 @@ def method_overview(
                 # input("Press Enter to continue...")
                 Ods = O_sorted[:num_ops_needed]
 
-                cluster_ops = {}
-                start_index = 0
-                for info in cluster_info:
-
-                    #Get the mu_c operators from Ods closet to the cluster c
-                    #for each medoid in the cluster, compute tau[op_id, medoid_id] and sort the operators by this distance
-                    #take the first mu_c operators
-
-                    c_idx = info['cluster_idx'] # cluster index in clusters dict
-                    needed_for_c = int(np.round(info['mu_c']*multiplier, 0))
-
-                    # 1) Ottiengo l'ID del medoid corrispondente a questo cluster
-                    medoid_id = medoids_list[c_idx]
-
-                     # 2) Calcola la distanza di ogni operatore dal medoid e ordina
-                     #Shift of 249 in the distance matrix to get the correct index of the operator
-                    for op in Ods:
-                        op_id = op["id"]
-                        op["dist_to_medoid"] = tau[op_id + 249 , medoid_id]
-
-                    # 3) Ordino gli operatori per distanza crescente
-                    Ods_sorted_by_dist = sorted(Ods, key=lambda x: x["dist_to_medoid"])
-
-                    # 4) Prendo i primi needed_for_c operatori
-                    assigned_ops = Ods_sorted_by_dist[:int(needed_for_c)]
-                    print("---------------")
-                    print(f"NUmber of assigned operators in cluster {c_idx} of configuration {k}: ", len(assigned_ops))
-                    print("---------------")
-
-                    # 5) Rimuovo gli operatori assegnati da Ods (per non assegnarli a un altro cluster)
-                    for op_assigned in assigned_ops:
-                        Ods.remove(op_assigned)
-
-                    cluster_ops[c_idx] = assigned_ops
+                # Assegnazione degli operatori di Ods ai cluster: ogni cluster riceve
+                # round(µc * multiplier) operatori, scelti in base alla distanza
+                # (tau, con lo shift di 249 sugli id degli operatori) dal medoide; i medoidi
+                # di MIPClustering sono posizioni in Pds, tau è indicizzata per id del paziente
+                cluster_ops = assign_operators(Ods, cluster_info, medoid_patient_ids(medoids_list, Pds), tau, multiplier)
+                for c_idx, assigned_ops in cluster_ops.items():
+                    log.debug("Number of assigned operators in cluster %s of configuration %s: %s", c_idx, k, len(assigned_ops))
 
                     
                 # ------------------------------------------------------------
@@ -395,36 +519,35 @@ def method_overview(
                 # ------------------------------------------------------------
                 
                 
+                cluster_jobs = [
+                    (info['cluster_idx'], cluster_ops[info['cluster_idx']], info['Rdsc'], clusters[info['cluster_idx']])
+                    for info in cluster_info
+                ]
+
+                ls_budget = None
+                if local_search_budget is not None:
+                    ls_budget = local_search_budget / (len(k_values) * len(cluster_info))
+
+                # I cluster non condividono operatori né richieste: con cluster_pool vengono risolti in parallelo
+                cluster_results = run_clusters(
+                    cluster_jobs,
+                    shift_end=session_bounds[s][1],       # orario di fine turno in base alla sessione, [1] serve a selezionare la fine
+                    down_time_true=down_time_true,
+                    tau=tau, k=k,                         # matrice delle distanze
+                    local_search_budget=ls_budget,
+                    executor=cluster_pool,
+                    grs_variant=grs_variant,
+                    grs_engine=grs_engine,
+                    ledger=ledger_k[k], ledger_session=(d_i, s)
+                )
+
                 for info in cluster_info:
                     c_idx = info['cluster_idx']
-                    assigned_ops = cluster_ops[c_idx]
-                    
-                    print("Solving GRS for cluster ", c_idx)
-                    print(""*5)
-
-                    rc, ovc, doc, n_used_ops = grs_variants(
-                        operators=assigned_ops,               # operatori per il cluster
-                        requests=info['Rdsc'],                # richieste di quel cluster
-                        patients=clusters[c_idx],             # lista dei pazienti del cluster
-                        shift_end=session_bounds[s][1],       # orario di fine turno in base alla sessione, [1] serve a selezionare la fine
-                        down_time_true=down_time_true,                 # o True, a seconda della logica
-                        tau=tau, k=k                            # matrice delle distanze
-                    )
-                    
-
+                    rc, ovc, doc, n_used_ops = cluster_results[c_idx]
 
                     #Check operator params correcteness
                     if len(n_used_ops) > 0:
-                        print("Operatori non utilizzati: ", n_used_ops)
-                   
-                    
-                    # print("Lo_k per cluster ", c_idx, ": ")
-                    # for op in assigned_ops:
-                    #     for r in op["Lo_k"][k]:
-                    #         print(r[0]["id"])
-
-                    
-                    
+                        log.debug("Operatori non utilizzati: %s", n_used_ops)
 
                     cost_k += (rc + ovc)
                     routing_cost += rc
@@ -439,13 +562,14 @@ def method_overview(
                     for r in op["Lo_k"][k]:
                         assigned_requests.append(r[0])
 
-                unassigned_requests = [r for r in Rds if r["id"] not in [r_["id"] for r_ in assigned_requests]]
+                unassigned_requests = ledger_k[k].unassigned(Rds)
 
-                print(len(unassigned_requests), " richieste non assegnate nella configurazione ", k)
-                print(len(assigned_requests), " richieste assegnate nella configurazione ", k)
+                log.info("%s richieste non assegnate e %s assegnate nella configurazione %s",
+                         len(unassigned_requests), len(assigned_requests), k)
 
                 if len(unassigned_requests) > 0:
-                    print("Richieste non assegnate: ", unassigned_requests, "config k = ", k)
+                    if debug_enabled():
+                        log.debug("Richieste non assegnate: %s config k = %s", [r["id"] for r in unassigned_requests], k)
                     unassigned_requests_k[k] = True
 
                 for r in unassigned_requests:
@@ -460,6 +584,8 @@ def method_overview(
                     best_cost_for_k = cost_k
                     best_k = k
                     best_clusters = clusters
+                    best_medoids = medoids_list
+                    best_clusters_dict = clusters_dict
                     
                     best_assignment = {
                         'cluster_ops': cluster_ops,
@@ -468,16 +594,19 @@ def method_overview(
                    
                     overtime_cost_session = overtime_cost
                     routing_cost_session = routing_cost
-                    print(f"[DEBUG] Nuovo best_cost trovato: {best_cost_for_k} con k = {best_k} totale down time: {d_ok} totale operatori: ", mu_k)
+                    log.debug("Nuovo best_cost trovato: %s con k = %s totale down time: %s totale operatori: %s", best_cost_for_k, best_k, d_ok, mu_k)
                   
 
             if best_assignment is not None:
 
-                print(f"[DEBUG] Consolidamento dello stato per giorno {d_i} sessione {s} con best_k = {best_k}")
+                log.debug("Consolidamento dello stato per giorno %s sessione %s con best_k = %s", d_i, s, best_k)
+                ledger.merge(ledger_k[best_k])
+                if debug_enabled():
+                    log.debug("Riepilogo assegnazioni: %s", ledger.summary((d_i, s)))
                 #Verifica se in tutte le configurazioni di k ci sono richieste non assegnate
                 #Può preferire pagare il costo di non prendere una richiesta a volte
                 if all(unassigned_requests_k.values()):
-                    print(f"[DEBUG] Tutte le configurazioni di k hanno richieste non assegnate per giorno {d_i} sessione {s}.")
+                    log.debug("Tutte le configurazioni di k hanno richieste non assegnate per giorno %s sessione %s.", d_i, s)
 
                     
                     #input()
@@ -486,6 +615,13 @@ def method_overview(
                 for c_idx, assigned_ops in best_assignment['cluster_ops'].items():
                     # salvo i campi finali di interesse per ogni operatore
                     for op in assigned_ops:
+                        new_assignments = op["Lo_k"][best_k][len(op["Lo"]):]
+                        shift_state.commit(op, new_assignments)
+                        kpi.commit(op, (d_i, s), new_assignments,
+                                   waiting=op["do_k"][best_k],
+                                   road=op["road_time_k"][best_k],
+                                   worked=op["wo_k"][best_k] - op["wo"],
+                                   overtime=op["overtime_minutes_k"][best_k])
                         op["Lo"] = op["Lo_k"][best_k]
                         op["do"] += op["do_k"][best_k]
                         op["wo"] = op["wo_k"][best_k]
@@ -498,14 +634,13 @@ def method_overview(
 
             # Salviamo cost_ds[(d_i, s)] = best_cost_for_k
             cost_ds[(d_i, s)] = best_cost_for_k if best_cost_for_k is not None else 0
-            print(""*5)
-            print(f"[DEBUG] Giorno {d_i} sessione {s}: costo = {cost_ds[(d_i, s)]}")
-            print(""*5)
+            log.info("Giorno %s sessione %s: costo = %s", d_i, s, cost_ds[(d_i, s)])
 
 
 
             
-            save_operator_scheduling(operators, baseline_operators, tau, variant_name=variant, day=d_i, session=s, patients=patients)
+            if map_plots == "best" and best_assignment is not None:
+                map_renderer.submit(np.array([[p['lat'], p['lon']] for p in Pds]), best_clusters_dict, best_k, variant, d_i, s, best_medoids)
 
         
             
@@ -540,53 +675,95 @@ def method_overview(
             total_cost = sum(cost_ds.values())
             total_overtime_cost += overtime_cost_session
             total_routing_cost += routing_cost_session
-            print("[DEBUG] - len(Rds): ", len(Rds), " - assigned requests: ", sum(len(op["Lo"]) for op in operators))
+            if debug_enabled():
+                log.debug("len(Rds): %s - assigned requests: %s", len(Rds), sum(len(op["Lo"]) for op in operators))
             
-            session_stats_df = display_session_statistics(operators, baseline_operators, assigned_requests, unassigned_requests)
-            session_deltas_df = display_session_deltas(operators, baseline_operators)
+            session_stats_df = display_session_statistics(kpi, (d_i, s), assigned_requests, unassigned_requests)
+            session_deltas_df = display_session_deltas(kpi, (d_i, s))
             save_statistics(variant, d_i, s, best_k, cost_ds, total_cost=total_cost, global_stats_df=session_stats_df, assignments_df=session_deltas_df)
             all_assignments[(d_i, s)] = best_assignment
+
+            if best_assignment is not None:
+                plan[(d_i, s)] = {
+                    'k': best_k,
+                    'medoids': {c_idx: Pds[best_medoids[c_idx]]['id'] for c_idx in best_clusters},
+                    'clusters': {c_idx: [p['id'] for p in cluster] for c_idx, cluster in best_clusters.items()},
+                    'cluster_ops': {c_idx: [op['id'] for op in ops_c] for c_idx, ops_c in best_assignment['cluster_ops'].items()},
+                }
+            best_k_ds[(d_i, s)] = best_k
+
+            # Checkpoint dello stato consolidato dopo la sessione: viene serializzato ora e
+            # scritto dal thread di SchedulingWriter dopo lo scheduling della sessione, perché
+            # una ripresa salta le sessioni già completate senza risottometterle
+            checkpoint = None
+            if checkpoint_dir is not None:
+                checkpoint = (checkpoint_dir, checkpoint_payload(d_i, s, {
+                    'operators': operator_state(operators),
+                    'cost_ds': cost_ds,
+                    'total_cost': total_cost,
+                    'total_overtime_cost': total_overtime_cost,
+                    'total_routing_cost': total_routing_cost,
+                    'plan': plan,
+                    'ledger': ledger.entries,
+                    'best_k': best_k_ds,
+                    'b_i': {r["id"]: r["b_i"] for r in requests if "b_i" in r},
+                    'kpi': kpi.state(),
+                }))
+            scheduling_writer.submit(operators, baseline_operators, tau, variant_name=variant, day=d_i, session=s,
+                                     checkpoint=checkpoint)
             
 
 
     
     # scheduling settimanale, da reimplementare
     #save_operator_scheduling(operators, baseline_operators, tau, variant_name=variant)
+    scheduling_writer.close()
+    map_renderer.close()
     aggregate_weekly_schedule(operators, variant_name=variant)
 
-    print("[METHOD OVERVIEW] - Completed.")
+    if cluster_pool is not None:
+        cluster_pool.shutdown()
+
+    log.info("[METHOD OVERVIEW] - Completed.")
     if kfixed is None:
-        print(f"Parametri di configurazione: {variant}, lambda={epsilon}, down_time_true={down_time_true}, Kmax={Kmax}, multiplier={multiplier}\n")
+        log.info("Parametri di configurazione: %s, lambda=%s, down_time_true=%s, Kmax=%s, multiplier=%s", variant, epsilon, down_time_true, Kmax, multiplier)
     else:
-        print(f"Parametri di configurazione: {variant}, lambda={epsilon}, down_time_true={down_time_true}, kfixed={kfixed}, multiplier={multiplier}\n")
+        log.info("Parametri di configurazione: %s, lambda=%s, down_time_true=%s, kfixed=%s, multiplier=%s", variant, epsilon, down_time_true, kfixed, multiplier)
         
-    print(f"Total cost over all days/sessions: {total_cost}")
-    print(f"Total overtime cost: {total_overtime_cost}")
-    print(f"Total routing cost: {total_routing_cost}")
-    print(f"Total overtime cost sum operators: {sum(max(op['wo'] - op['Ho'], 0) for op in operators)*0.29}")
-    print(f"Average waiting time: {sum(op['do'] for op in operators) / len(operators)}")
-    print(f"Average SSRo: {sum(op['SSRo'] for op in operators) / len(operators)}")
-    print(f"Average DSRo: {sum(op['DSRo'] for op in operators) / len(operators)}")
+    log.info("Total cost over all days/sessions: %s", total_cost)
+    log.info("Total overtime cost: %s", total_overtime_cost)
+    log.info("Total routing cost: %s", total_routing_cost)
+    log.info("Total overtime cost sum operators: %s", sum(max(op['wo'] - op['Ho'], 0) for op in operators)*0.29)
+    log.info("Average waiting time: %s", sum(op['do'] for op in operators) / len(operators))
+    log.info("Average SSRo: %s", sum(op['SSRo'] for op in operators) / len(operators))
+    log.info("Average DSRo: %s", sum(op['DSRo'] for op in operators) / len(operators))
 
 
-    unserved_requests = [r for r in requests if r["id"] not in [rq[0]["id"] for op in operators for rq in op["Lo"]]]
-    print(f"Unserved requests: {unserved_requests}")
+    unserved_requests = ledger.unassigned(requests)
+    log.info("Unserved requests: %s", len(unserved_requests))
+    if debug_enabled():
+        log.debug("Unserved requests: %s", [r["id"] for r in unserved_requests])
 
     total_time_served = sum(sum(rq[0]["duration"] for rq in op["Lo"]) for op in operators)
     total_time = sum(rq["duration"] for rq in requests)
 
-    print(f"Total time served ratio: {total_time_served*100 / total_time:.2f}")
+    log.info("Total time served ratio: %.2f", total_time_served*100 / total_time)
 
 
 
-    input(f"Terminato il giorno {d_i} e la sessione {s}, premi invio per continuare...")
+    if wait_for_input:
+        input(f"Terminato il giorno {d_i} e la sessione {s}, premi invio per continuare...")
     # Ritorna i risultati finali
     return {
         'cost_ds': cost_ds,
         'total_cost': total_cost,
         'total_overtime_cost': total_overtime_cost,
         'total_routing_cost': total_routing_cost,
-        'details': None 
+        'details': None,
+        'plan': plan,
+        'ledger': ledger,
+        'best_k': best_k_ds,
+        'kpi': kpi
     }
     
 
@@ -595,78 +772,237 @@ import os
 import sys
 import itertools
 import string
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from shared_data import SharedTau, SharedObject
+from results_warehouse import ResultsWarehouse
 
-def run_all_configurations():
+def load_tau(sparse_k=None):
     """
-    Esegue tutte le configurazioni possibili, salvando i risultati in cartelle separate.
+    Carica la matrice delle distanze tau da mapping/distance_matrix_pane_rose.json.
+
+    Con sparse_k restituisce invece uno SparseTau (sparse_tau.py), con i tempi esatti
+    solo verso i sparse_k vicini più prossimi di ogni nodo e da/verso le case degli
+    operatori, e una stima calibrata per le altre coppie: se esiste
+    mapping/travel_times.csv (colonne i, j, tau) viene letto in streaming, altrimenti
+    viene ridotta la matrice completa.
     """
     current_dir = os.path.dirname(os.path.realpath(__file__))
     json_path = os.path.join(current_dir, "../mapping/distance_matrix_pane_rose.json")
+    if sparse_k is not None:
+        from sparse_tau import SparseTau, tau_coordinates
+        from data_loader import operators, patients
+        coords, hubs = tau_coordinates(patients, operators)
+        csv_path = os.path.join(current_dir, "../mapping/travel_times.csv")
+        if os.path.exists(csv_path):
+            return SparseTau.from_csv(csv_path, coords, sparse_k, hubs)
+        with open(json_path, "r") as f:
+            return SparseTau.from_tau(eval(f.read()), coords, sparse_k, hubs)
     with open(json_path, "r") as f:
-        tau = eval(f.read())
-    
-    # PARAMETRI DI CONFIGURAZIONE FISSI
-    Kmax = 37  # Numero max di cluster da testare (1..Kmax-1)
-    kfixed = None  # Se specificato, usa questo valore fisso per k
-    
-    # Valori da testare per le 3 variabili
+        return eval(f.read())
+
+
+def variant_configurations():
+    """
+    Configurazioni da testare, associate alle lettere delle varianti:
+    prodotto di epsilon (0.5, 0.4, 0.6), down_time_true (True, False) e multiplier (1.25, 1).
+
+    :return: lista di tuple (lettera, epsilon, down_time_true, multiplier).
+    """
     epsilons = [0.5, 0.4, 0.6]         # 3 valori per epsilon
     down_time_trues = [True, False]     # 2 valori per down_time_true
     multipliers = [1.25, 1]            # 2 valori per multiplier
-    
+
     configurazioni = list(itertools.product(epsilons, down_time_trues, multipliers))
     variant_letters = list(string.ascii_uppercase[:len(configurazioni)])  # ['A', 'B', ..., 'L']
-    
+    return [(letter, *config) for letter, config in zip(variant_letters, configurazioni)]
+
+
+def run_configuration(variant_name, epsilon, down_time_true, multiplier, requests, operators, patients, tau,
+                      Kmax, kfixed=None, wait_for_input=True, resume=False, days=None):
+    """
+    Esegue method_overview per una configurazione e salva i risultati nella cartella variant_<variant_name>.
+    requests e operators vengono modificati: passarne copie se devono essere riutilizzati.
+    I checkpoint di ogni sessione vengono salvati in variant_<variant_name>/checkpoints;
+    resume e days vengono passati a method_overview.
+    Parametri e statistiche globali dell'esecuzione vengono aggiunti al warehouse dei risultati
+    (results_warehouse.py).
+    """
+    log.info("Processing variant %s: epsilon=%s, down_time_true=%s, multiplier=%s", variant_name, epsilon, down_time_true, multiplier)
+
+    variant_dir = os.path.join(RESULTS_DIR, f"variant_{variant_name}")
+    results = method_overview(requests, operators, patients, tau,
+                              variant=variant_name,
+                              epsilon=epsilon,
+                              down_time_true=down_time_true,
+                              Kmax=Kmax,
+                              multiplier=multiplier,
+                              kfixed=kfixed,
+                              wait_for_input=wait_for_input,
+                              checkpoint_dir=os.path.join(variant_dir, "checkpoints"),
+                              resume=resume,
+                              days=days)
+    log.debug("Risultati: %s", results)
+
+    # Salva i parametri usati in un file nella cartella della variante
+    os.makedirs(variant_dir, exist_ok=True)
+    with open(os.path.join(variant_dir, "parameters.txt"), "w") as f:
+        f.write(f"epsilon: {epsilon}\n")
+        f.write(f"down_time_true: {down_time_true}\n")
+        f.write(f"multiplier: {multiplier}\n")
+
+    # Salva i risultati globali e le assegnazioni
+    save_global_statistics(operators,
+                           variant_name=variant_name,
+                           total_cost=results['total_cost'],
+                           total_overtime_cost=results['total_overtime_cost'],
+                           total_routing_cost=results['total_routing_cost'],
+                           requests=requests,
+                           kpi=results['kpi'])
+
+    # Tabella in memoria degli operatori: assignments, statistiche e grafici sono prodotti da questa
+    table = operator_table(operators)
+    save_global_assignments(operators, variant_name=variant_name, table=table)
+
+    # Calcola e salva le statistiche per ciascun operatore e le registra nel warehouse dei risultati
+    stats = calculate_and_save_stats(variant_name, requests, table)
+    with ResultsWarehouse() as warehouse:
+        warehouse.record_run(variant_name,
+                             {"epsilon": epsilon, "down_time_true": down_time_true, "multiplier": multiplier,
+                              "kmax": Kmax, "kfixed": kfixed, "days": days},
+                             stats, objective_cost=results['total_cost'])
+
+    # Genera i boxplot e gli istogrammi
+    plot_time_distributions(table, variant_name, output_dir=RESULTS_DIR, show_plot=False)
+
+    save_histograms(variant_name, table)
+    return results
+
+
+def run_all_configurations(n_processes=None, resume=False, sparse_k=None):
+    """
+    Esegue tutte le configurazioni possibili, salvando i risultati in cartelle separate.
+    Ogni configurazione parte da copie nuove di operatori e richieste, così lo stato
+    lasciato da una configurazione non influenza le successive.
+
+    :param n_processes: se specificato, le configurazioni vengono eseguite in parallelo
+                        da run_configurations_parallel con n_processes processi.
+    :param resume: se True, ogni variante riprende dal proprio ultimo checkpoint.
+    :param sparse_k: se specificato, tau viene caricata in forma sparsa (vedi load_tau).
+    """
+    if n_processes is not None:
+        run_configurations_parallel(n_processes, resume=resume, sparse_k=sparse_k)
+        return
+
+    from data_loader import operators, requests, patients
+    tau = load_tau(sparse_k)
+
+    # PARAMETRI DI CONFIGURAZIONE FISSI
+    Kmax = 37  # Numero max di cluster da testare (1..Kmax-1)
+    kfixed = None  # Se specificato, usa questo valore fisso per k
+
     # Esegue il metodo per tutte le configurazioni e salva i risultati
-    for letter, (epsilon, down_time_true, multiplier) in zip(variant_letters, configurazioni):
-        variant_name = letter  # Usa la lettera come nome variante
-        print(f"Processing variant {variant_name}: epsilon={epsilon}, down_time_true={down_time_true}, multiplier={multiplier}")
-        
-        results = method_overview(requests, operators, patients, tau,
-                                  variant=variant_name,
-                                  epsilon=epsilon,
-                                  down_time_true=down_time_true,
-                                  Kmax=Kmax,
-                                  multiplier=multiplier,
-                                  kfixed=kfixed)
-        print(results)
-
-        # Salva i parametri usati in un file nella cartella della variante
-        variant_dir = os.path.join(RESULTS_DIR, f"variant_{variant_name}")
-        os.makedirs(variant_dir, exist_ok=True)
-        with open(os.path.join(variant_dir, "parameters.txt"), "w") as f:
-            f.write(f"epsilon: {epsilon}\n")
-            f.write(f"down_time_true: {down_time_true}\n")
-            f.write(f"multiplier: {multiplier}\n")
-    
-        # Salva i risultati globali e le assegnazioni
-        save_global_statistics(operators,
-                               variant_name=variant_name,
-                               total_cost=results['total_cost'],
-                               total_overtime_cost=results['total_overtime_cost'],
-                               total_routing_cost=results['total_routing_cost'],
-                               requests=requests)
-    
-        save_global_assignments(operators, variant_name=variant_name)
-    
-        # Calcola e salva le statistiche per ciascun operatore
-        calculate_and_save_stats(variant_name)
-    
-        # Legge il file degli assignments e genera i boxplot
-        assignments_file = os.path.join(variant_dir, f"global_assignments_{variant_name}.csv")
-        df_assign = pd.read_csv(assignments_file)
-        plot_time_distributions(df_assign, variant_name, output_dir=RESULTS_DIR, show_plot=False)
+    for variant_name, epsilon, down_time_true, multiplier in variant_configurations():
+        run_configuration(variant_name, epsilon, down_time_true, multiplier,
+                          deepcopy(requests), deepcopy(operators), deepcopy(patients), tau,
+                          Kmax=Kmax, kfixed=kfixed, resume=resume)
 
-        save_histograms(variant_name)
+    combine_results()
+
+
+# Dati condivisi dei processi di configuration_pool, impostati da _init_configuration_worker
+_shared_tau = None
+_shared_data = None
+
+
+def _init_configuration_worker(shared_tau, shared_data, log_level):
+    global _shared_tau, _shared_data
+    _shared_tau = shared_tau
+    _shared_data = shared_data
+    configure_logging(log_level)
+
+
+def configuration_worker_data():
+    """
+    Da chiamare nei processi di configuration_pool.
+
+    :return: (tau condivisa, dizionario con una copia privata di requests, operators e patients).
+    """
+    return _shared_tau, _shared_data.load()
+
+
+def _run_configuration_job(job):
+    variant_name, epsilon, down_time_true, multiplier, Kmax, kfixed, resume, days = job
+    # Copia privata di richieste, operatori e pazienti: ogni configurazione parte da uno stato nuovo
+    tau, data = configuration_worker_data()
+    results = run_configuration(variant_name, epsilon, down_time_true, multiplier,
+                                data["requests"], data["operators"], data["patients"], tau,
+                                Kmax=Kmax, kfixed=kfixed, wait_for_input=False, resume=resume, days=days)
+    return variant_name, results['total_cost']
+
+
+@contextmanager
+def configuration_pool(n_processes, sparse_k=None):
+    """
+    Pool di processi per eseguire configurazioni in parallelo.
+
+    tau viene copiata una sola volta in memoria condivisa (SharedTau) e letta dai
+    processi senza copie; richieste, operatori e pazienti vengono serializzati una
+    sola volta in memoria condivisa (SharedObject) e ogni job ne carica una copia
+    privata con configuration_worker_data, perché method_overview li modifica. Con
+    sparse_k, lo SparseTau (già O(N·k)) viene passato direttamente ai processi.
+    La memoria condivisa viene rilasciata all'uscita dal blocco with.
+    """
+    from data_loader import operators, requests, patients
+    tau = load_tau(sparse_k)
+    shared_tau = tau if sparse_k is not None else SharedTau.create(tau)
+    del tau
+    shared_data = SharedObject.create({"requests": requests, "operators": operators, "patients": patients})
+    try:
+        with ProcessPoolExecutor(max_workers=n_processes, initializer=_init_configuration_worker,
+                                 initargs=(shared_tau, shared_data, log.level)) as pool:
+            yield pool
+    finally:
+        if sparse_k is None:
+            shared_tau.unlink()
+        shared_data.unlink()
+
+
+def run_configurations_parallel(n_processes, configurations=None, Kmax=37, kfixed=None, resume=False, sparse_k=None,
+                                days=None, pool=None):
+    """
+    Esegue le configurazioni in processi separati (configuration_pool), scrivendo i
+    risultati nelle stesse cartelle variant_<X> dell'esecuzione sequenziale.
+
+    :param n_processes: numero di processi.
+    :param configurations: lista di tuple (lettera, epsilon, down_time_true, multiplier),
+                           di default tutte quelle di variant_configurations().
+    :param resume: se True, ogni variante riprende dal proprio ultimo checkpoint.
+    :param sparse_k: se specificato, tau viene caricata in forma sparsa (vedi load_tau).
+    :param days: giorni da elaborare, passati a run_configuration (default: tutta la settimana).
+    :param pool: configuration_pool già aperto da riutilizzare (n_processes e sparse_k
+                 vengono allora ignorati).
+    :return: dizionario {lettera: costo totale}.
+    """
+    if configurations is None:
+        configurations = variant_configurations()
+
+    jobs = [(*config, Kmax, kfixed, resume, days) for config in configurations]
+    costs = {}
+    with (nullcontext(pool) if pool is not None else configuration_pool(n_processes, sparse_k)) as executor:
+        for variant_name, total_cost in executor.map(_run_configuration_job, jobs):
+            log.info("Variante %s completata: costo totale %s", variant_name, total_cost)
+            costs[variant_name] = total_cost
 
-        
     combine_results()
+    return costs
 
 def run_test_configuration():
     """
     Esegue una configurazione di test per verificare il funzionamento del metodo.
     """
+    from data_loader import operators, requests, patients
     current_dir = os.path.dirname(os.path.realpath(__file__))
     json_path = os.path.join(current_dir, "../mapping/distance_matrix_pane_rose.json")
     with open(json_path, "r") as f:
@@ -681,7 +1017,7 @@ def run_test_configuration():
     multiplier = 1.5
     variant_name = "Test2"  # Nome della variante per il test
 
-    print(f"Processing test variant {variant_name}: epsilon={epsilon}, down_time_true={down_time_true}, multiplier={multiplier}")
+    log.info("Processing test variant %s: epsilon=%s, down_time_true=%s, multiplier=%s", variant_name, epsilon, down_time_true, multiplier)
     
     results = method_overview(requests, operators, patients, tau,
                               variant=variant_name,
@@ -690,7 +1026,7 @@ def run_test_configuration():
                               Kmax=Kmax,
                               multiplier=multiplier,
                               kfixed=kfixed)
-    print(results)
+    log.debug("Risultati: %s", results)
 
     variant_dir = os.path.join(RESULTS_DIR, f"variant_{variant_name}")
     os.makedirs(variant_dir, exist_ok=True)
@@ -706,19 +1042,18 @@ def run_test_configuration():
                            total_routing_cost=results['total_routing_cost'],
                            requests=requests)
     
-    save_global_assignments(operators, variant_name=variant_name)
+    table = operator_table(operators)
+    save_global_assignments(operators, variant_name=variant_name, table=table)
     
-    # calculate_and_save_stats(variant_name)
+    # calculate_and_save_stats(variant_name, requests, table)
     
-    assignments_file = os.path.join(variant_dir, f"global_assignments_variant{variant_name}.csv")
-    df_assign = pd.read_csv(assignments_file)
-    plot_time_distributions(df_assign, variant_name, output_dir=RESULTS_DIR, show_plot=False)
+    plot_time_distributions(table, variant_name, output_dir=RESULTS_DIR, show_plot=False)
 
-    save_histograms(variant_name)
+    save_histograms(variant_name, table)
 
     
 
-def run_specific_configuration(variant_letter):
+def run_specific_configuration(variant_letter, resume=False, days=None, sparse_k=None):
     """
     Esegue la configurazione corrispondente alla lettera passata (es. "A", "B", ecc.)
     A = (0.5, True, 1.25)
@@ -733,83 +1068,64 @@ def run_specific_configuration(variant_letter):
     J = (0.6, True, 1)
     K = (0.6, False, 1.25)
     L = (0.6, False, 1)
+
+    Con resume=True riprende dall'ultimo checkpoint della variante; con days
+    (es. [3]) elabora solo quei giorni a partire dal checkpoint del giorno precedente.
+    Con sparse_k tau viene caricata in forma sparsa (vedi load_tau).
     """
-    current_dir = os.path.dirname(os.path.realpath(__file__))
-    json_path = os.path.join(current_dir, "../mapping/distance_matrix_pane_rose.json")
-    with open(json_path, "r") as f:
-        tau = eval(f.read())
-    
     Kmax = 37  # Numero max di cluster
     kfixed = None  # Se specificato, usa questo valore fisso per k
 
-    # Definisci i valori da testare
-    epsilons = [0.5, 0.4, 0.6]
-    down_time_trues = [True, False]
-    multipliers = [1.25, 1] 
-
-    configurazioni = list(itertools.product(epsilons, down_time_trues, multipliers))
-    variant_letters = list(string.ascii_uppercase[:len(configurazioni)])
-
-    if variant_letter.upper() not in variant_letters:
-        print(f"Errore: Variante {variant_letter} non valida. Scegli una delle seguenti: {', '.join(variant_letters)}")
-        return
-
-    index = variant_letters.index(variant_letter.upper())
-    epsilon, down_time_true, multiplier = configurazioni[index]
+    configurations = {letter: config for letter, *config in variant_configurations()}
     variant_name = variant_letter.upper()
+    if variant_name not in configurations:
+        log.error("Errore: Variante %s non valida. Scegli una delle seguenti: %s", variant_letter, ', '.join(configurations))
+        return
 
-    print(f"Processing variant {variant_name}: epsilon={epsilon}, down_time_true={down_time_true}, multiplier={multiplier}")
-    
-    results = method_overview(requests, operators, patients, tau,
-                              variant=variant_name,
-                              epsilon=epsilon,
-                              down_time_true=down_time_true,
-                              Kmax=Kmax,
-                              multiplier=multiplier,
-                              kfixed=kfixed)
-    print(results)
-
-    variant_dir = os.path.join(RESULTS_DIR, f"variant_{variant_name}")
-    os.makedirs(variant_dir, exist_ok=True)
-    with open(os.path.join(variant_dir, "parameters.txt"), "w") as f:
-        f.write(f"epsilon: {epsilon}\n")
-        f.write(f"down_time_true: {down_time_true}\n")
-        f.write(f"multiplier: {multiplier}\n")
-    
-    save_global_statistics(operators,
-                           variant_name=variant_name,
-                           total_cost=results['total_cost'],
-                           total_overtime_cost=results['total_overtime_cost'],
-                           total_routing_cost=results['total_routing_cost'],
-                           requests=requests)
-    
-    save_global_assignments(operators, variant_name=variant_name)
-    
-    calculate_and_save_stats(variant_name)
-    
-    assignments_file = os.path.join(variant_dir, f"global_assignments_{variant_name}.csv")
-    df_assign = pd.read_csv(assignments_file)
-    plot_time_distributions(df_assign, variant_name, output_dir=RESULTS_DIR, show_plot=False)
-
-    save_histograms(variant_name)
+    epsilon, down_time_true, multiplier = configurations[variant_name]
+    from data_loader import operators, requests, patients
+    run_configuration(variant_name, epsilon, down_time_true, multiplier, requests, operators, patients, load_tau(sparse_k),
+                      Kmax=Kmax, kfixed=kfixed, resume=resume, days=days)
 
 def main():
+    # Livello dei messaggi e file di diagnostica strutturata (JSON lines) da variabili d'ambiente
+    configure_logging(os.environ.get("TESI_LOG_LEVEL", "INFO"), os.environ.get("TESI_DIAGNOSTICS_FILE"))
+
     # Controlla i parametri da linea di comando:
     # - Se viene passato "test", esegue la configurazione di test.
     # - Se viene passato una lettera, esegue quella specifica configurazione.
     # - Se non vengono passati argomenti o viene passato "all", esegue tutte le configurazioni.
-    if len(sys.argv) > 1:
-        arg = sys.argv[1].lower()
+    # - "all N" esegue tutte le configurazioni in parallelo su N processi.
+    # - "--resume" riprende ogni variante dall'ultimo checkpoint salvato.
+    # - "--day D" (solo con una lettera) rielabora il solo giorno D dal checkpoint del giorno precedente.
+    # - "--sparse-tau K" usa tau sparsa con i tempi esatti dei K vicini più prossimi (vedi load_tau).
+    args = sys.argv[1:]
+    resume = "--resume" in args
+    if resume:
+        args.remove("--resume")
+    days = None
+    if "--day" in args:
+        pos = args.index("--day")
+        days = [int(args[pos + 1])]
+        del args[pos:pos + 2]
+    sparse_k = None
+    if "--sparse-tau" in args:
+        pos = args.index("--sparse-tau")
+        sparse_k = int(args[pos + 1])
+        del args[pos:pos + 2]
+
+    if len(args) > 0:
+        arg = args[0].lower()
         if arg == "test":
             run_test_configuration()
         elif len(arg) == 1 and arg.upper() in string.ascii_uppercase:
-            run_specific_configuration(arg)
+            run_specific_configuration(arg, resume=resume, days=days, sparse_k=sparse_k)
         elif arg == "all":
-            run_all_configurations()
+            run_all_configurations(int(args[1]) if len(args) > 1 else None, resume=resume, sparse_k=sparse_k)
         else:
-            print("Argomento non riconosciuto. Usa 'test' per il test, una lettera (A, B, ...) per una specifica configurazione, oppure 'all' per eseguire tutte le configurazioni.")
+            log.error("Argomento non riconosciuto. Usa 'test' per il test, una lettera (A, B, ...) per una specifica configurazione, oppure 'all' per eseguire tutte le configurazioni.")
     else:
-        run_all_configurations()
+        run_all_configurations(resume=resume, sparse_k=sparse_k)
 
 if __name__ == '__main__':
     main()
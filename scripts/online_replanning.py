@@ -0,0 +1,235 @@
+# Ripianificazione incrementale di una settimana già pianificata da method_overview
+
+from parallel_grs import solve_cluster
+from utils import SESSION_BOUNDS, parse_time_to_minutes, set_operator_state_morning, set_operator_state_afternoon
+
+# Chiave usata nei campi *_k dello stato operatore durante la ripianificazione
+ONLINE_K = "online"
+
+
+def session_of_request(req):
+    """
+    Restituisce la coppia (giorno, sessione) a cui appartiene la richiesta,
+    con lo stesso filtro su α_i usato in method_overview, oppure None.
+    """
+    alpha_i = parse_time_to_minutes(req["min_time_begin"])
+    for s, (session_start, session_end) in SESSION_BOUNDS.items():
+        if session_start <= alpha_i < session_end:
+            return req["day"], s
+    return None
+
+
+def _session_order(day, session):
+    return day, list(SESSION_BOUNDS).index(session)
+
+
+def _split_Lo(op, day, session):
+    """
+    Divide Lo in assegnazioni precedenti, della sessione (day, session) e successive,
+    mantenendo l'ordine cronologico.
+    """
+    target = _session_order(day, session)
+    before, current, after = [], [], []
+    for entry in op["Lo"]:
+        order = _session_order(*session_of_request(entry[0]))
+        if order < target:
+            before.append(entry)
+        elif order == target:
+            current.append(entry)
+        else:
+            after.append(entry)
+    return before, current, after
+
+
+def _worked_after_1130(entries, day):
+    """
+    True se l'operatore, nel giorno indicato, ha iniziato dopo le 11:30 una richiesta
+    che non poteva iniziare dopo le 12:30 (stessa regola di grs_variants).
+    """
+    return any(req["day"] == day and b_i >= 11*60 + 30 and parse_time_to_minutes(req["min_time_begin"]) < 12*60 + 30
+               for (req, b_i) in entries)
+
+
+def _session_totals(entries, tau):
+    """
+    Ricostruisce dalle assegnazioni di una sessione i contributi a w_o, road_time e d_o,
+    con le stesse regole di grs_variants (viaggio e attesa nulli verso la prima richiesta).
+    """
+    if not entries:
+        return 0, 0, 0
+    road = 0
+    waiting = 0
+    for (prev, prev_b), (req, b_i) in zip(entries, entries[1:]):
+        travel_time = tau[prev["project_id"], req["project_id"]]
+        road += travel_time
+        waiting += b_i - (prev_b + prev["duration"] + travel_time)
+    last, last_b = entries[-1]
+    work = last_b + last["duration"] - entries[0][1]
+    return work, road, waiting
+
+
+def _later_work(entries, tau):
+    """
+    Contributo a w_o delle assegnazioni delle sessioni successive, sommato sessione per sessione.
+    """
+    sessions = {}
+    for entry in entries:
+        sessions.setdefault(session_of_request(entry[0]), []).append(entry)
+    return sum(_session_totals(session_entries, tau)[0] for session_entries in sessions.values())
+
+
+def _replan_cluster(plan, operators, requests, patients, tau, day, session, c_idx,
+                    down_time_true, grs_variant, grs_engine, local_search_budget, ledger):
+    """
+    Riesegue l'assegnamento di un solo cluster di una sessione, con gli operatori
+    e i medoidi del piano consolidato. Le altre sessioni e gli altri cluster non
+    vengono toccati.
+    """
+    session_plan = plan[(day, session)]
+    ops_by_id = {op["id"]: op for op in operators}
+    cluster_ops = [ops_by_id[op_id] for op_id in session_plan["cluster_ops"][c_idx]]
+    cluster_pids = set(session_plan["clusters"][c_idx])
+    session_start, session_end = SESSION_BOUNDS[session]
+
+    Rdsc = [r for r in requests
+            if r["day"] == day and r["project_id"] in cluster_pids
+            and session_start <= parse_time_to_minutes(r["min_time_begin"]) < session_end]
+    cluster_patients = [p for p in patients if p["id"] in cluster_pids]
+
+    k = ONLINE_K
+    # Ultima sessione del piano: worked_after_11:30am e overtime_minutes degli operatori
+    # descrivono lo stato dopo questa sessione, come al consolidamento di method_overview
+    last_day, last_session = max(plan, key=lambda ds: _session_order(*ds))
+    after_sessions = {}
+    after_work = {}
+    previous_overtime = {}
+    for op in cluster_ops:
+        previous_overtime[op["id"]] = op.get("overtime_minutes", 0)
+        before, current, after = _split_Lo(op, day, session)
+
+        # Si tolgono dai totali settimanali i contributi della sessione da ripianificare
+        work, road, waiting = _session_totals(current, tau)
+        op["wo"] -= work
+        op["road_time"] -= road
+        op["do"] -= waiting
+        op["Lo"] = before
+        after_sessions[op["id"]] = after
+        # w_o all'inizio della sessione non comprende il lavoro delle sessioni successive
+        after_work[op["id"]] = _later_work(after, tau)
+
+        if session == 'm':
+            set_operator_state_morning(op)
+        else:
+            op["worked_after_11:30am"] = _worked_after_1130(before, day)
+            set_operator_state_afternoon(op)
+
+        op["Lo_k"] = {k: list(before)}
+        op["wo_k"] = {k: op["wo"] - after_work[op["id"]]}
+        op["road_time_k"] = {k: 0}
+        op["do_k"] = {k: 0}
+        op["overtime_minutes_k"] = {k: 0}
+        op["worked_after_11:30am_k"] = {}
+        op["eo_start_k"] = {k: op["eo"]}
+
+    rc, ovc, doc, not_used_ops = solve_cluster(cluster_ops, Rdsc, cluster_patients, session_end, down_time_true,
+                                               tau, k, local_search_budget, grs_variant, grs_engine,
+                                               ledger, (day, session))
+
+    # Consolidamento, come in method_overview
+    assigned_ids = set()
+    for op in cluster_ops:
+        session_entries = op["Lo_k"][k][len(op["Lo"]):]
+        assigned_ids.update(req["id"] for (req, _) in session_entries)
+        op["Lo"] = op["Lo_k"][k] + after_sessions[op["id"]]
+        op["wo"] = op["wo_k"][k] + after_work[op["id"]]
+        op["do"] += op["do_k"][k]
+        op["road_time"] += op["road_time_k"][k]
+        op["worked_after_11:30am"] = _worked_after_1130(op["Lo"], last_day)
+        if (day, session) == (last_day, last_session):
+            op["overtime_minutes"] = op["overtime_minutes_k"][k]
+        else:
+            op["overtime_minutes"] = previous_overtime[op["id"]]
+
+    return {
+        "day": day,
+        "session": session,
+        "cluster": c_idx,
+        "routing_cost": rc,
+        "overtime_cost": ovc,
+        "waiting_time": doc,
+        "not_used_ops": not_used_ops,
+        "unassigned_requests": [r for r in Rdsc if r["id"] not in assigned_ids],
+    }
+
+
+def insert_request(plan, operators, requests, patients, tau, new_request, down_time_true=False,
+                   grs_variant="f_oi", grs_engine="greedy", local_search_budget=None, ledger=None):
+    """
+    Inserisce una nuova richiesta in una settimana già pianificata.
+
+    La richiesta viene aggiunta a requests e assegnata al cluster della sua sessione
+    che contiene il paziente oppure, se il paziente non è in nessun cluster della
+    sessione, a quello con il medoide più vicino secondo tau. Il paziente deve essere
+    già in patients e in tau, altrimenti viene sollevato ValueError. Viene poi rieseguito
+    solo quel cluster (senza clustering MIP né ciclo su k), per cui una singola modifica
+    richiede tipicamente meno di un secondo.
+
+    Dopo la ripianificazione worked_after_11:30am e overtime_minutes degli operatori del
+    cluster descrivono di nuovo lo stato dopo l'ultima sessione del piano. Nota: ripianificare
+    una sessione mattutina può cambiare l'inizio del turno pomeridiano dello stesso giorno,
+    che non viene ripianificato.
+
+    :param plan: piano restituito da method_overview nella chiave 'plan'.
+    :param operators: operatori con lo stato consolidato a fine settimana (Lo, wo, do, road_time).
+    :param ledger: AssignmentLedger restituito da method_overview, aggiornato per il cluster rieseguito.
+    :return: dizionario con giorno, sessione, cluster, costi della ripianificazione e
+             richieste del cluster rimaste non assegnate.
+    """
+    ds = session_of_request(new_request)
+    if ds not in plan:
+        raise ValueError(f"Nessun piano per la sessione {ds} della richiesta {new_request['id']}: serve una ripianificazione completa.")
+    day, session = ds
+    session_plan = plan[ds]
+
+    pid = new_request["project_id"]
+    if not any(p["id"] == pid for p in patients):
+        raise ValueError(f"Paziente {pid} della richiesta {new_request['id']} non presente in patients: "
+                         f"aggiungerlo a patients e a tau prima dell'inserimento.")
+    if not any((medoid, pid) in tau for medoid in session_plan["medoids"].values()):
+        raise ValueError(f"Nessun tempo di viaggio in tau verso il paziente {pid} della richiesta {new_request['id']}.")
+    c_idx = next((c for c, pids in session_plan["clusters"].items() if pid in pids), None)
+    if c_idx is None:
+        c_idx = min(session_plan["medoids"], key=lambda c: tau.get((session_plan["medoids"][c], pid), float("inf")))
+        session_plan["clusters"][c_idx].append(pid)
+
+    requests.append(new_request)
+    return _replan_cluster(plan, operators, requests, patients, tau, day, session, c_idx,
+                           down_time_true, grs_variant, grs_engine, local_search_budget, ledger)
+
+
+def cancel_request(plan, operators, requests, patients, tau, request_id, down_time_true=False,
+                   grs_variant="f_oi", grs_engine="greedy", local_search_budget=None, ledger=None):
+    """
+    Cancella una richiesta da una settimana già pianificata: la richiesta viene rimossa
+    da requests e viene rieseguito solo il cluster della sua sessione.
+
+    :return: dizionario come insert_request, None se la richiesta non apparteneva
+             a nessun cluster pianificato.
+    """
+    req = next((r for r in requests if r["id"] == request_id), None)
+    if req is None:
+        raise ValueError(f"Richiesta {request_id} non trovata.")
+    requests.remove(req)
+    if ledger is not None:
+        ledger.remove(request_id)
+
+    ds = session_of_request(req)
+    if ds not in plan:
+        return None
+    day, session = ds
+    c_idx = next((c for c, pids in plan[ds]["clusters"].items() if req["project_id"] in pids), None)
+    if c_idx is None:
+        return None
+
+    return _replan_cluster(plan, operators, requests, patients, tau, day, session, c_idx,
+                           down_time_true, grs_variant, grs_engine, local_search_budget, ledger)
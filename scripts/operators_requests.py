@@ -2,11 +2,21 @@
 
 from typing import Optional, Tuple, List, Any
 
+import numpy as np
+
 class Node:
+    """
+    Classe Node
+
+    Ogni nodo conserva le proprie coordinate: gli array usati per i calcoli
+    vettoriali (node_coordinates, travel_times) vengono costruiti da chi li usa,
+    ad esempio una volta per chiamata di grs_time, e non restano in memoria
+    dopo la fine del calcolo.
+    """
+    __slots__ = ("id", "coordinates")
+
     def __init__(self, id: int, coordinates: Tuple[float, float]):
         """
-        Classe Node
-
         :param id: Identificativo univoco del nodo.
         :param coordinates: Coppia di coordinate
         """
@@ -17,15 +27,40 @@ class Node:
         return f"Node(id={self.id}, coordinates={self.coordinates})"
 
 
+def node_coordinates(nodes: List[Node]) -> np.ndarray:
+    """
+    Array (n, 2) con le coordinate dei nodi, nello stesso ordine.
+    """
+    coords = np.empty((len(nodes), 2))
+    for row, node in enumerate(nodes):
+        coords[row] = node.coordinates
+    return coords
+
+
+def travel_times(from_nodes, to_node: Node) -> np.ndarray:
+    """
+    Tempi di viaggio (distanza euclidea, 1 unità = 1 minuto) da ciascuno dei
+    nodi from_nodes verso to_node, calcolati in un'unica operazione vettoriale.
+
+    :param from_nodes: lista di Node oppure array (n, 2) già calcolato con node_coordinates.
+    :return: array con un tempo di viaggio per ogni nodo di partenza, nello stesso ordine.
+    """
+    coords = from_nodes if isinstance(from_nodes, np.ndarray) else node_coordinates(from_nodes)
+    diff = coords - to_node.coordinates
+    return np.sqrt(diff[:, 0] ** 2 + diff[:, 1] ** 2)
+
+
 class Operator:
-    def __init__(self, 
-                 id: int, 
-                 home: Node, 
-                 ho: int = 300, 
-                 current_patient: Optional[Node] = None, 
-                 eo: int = 420, 
-                 cluster_id: Optional[int] = None, 
-                 wo: int = 0, 
+    __slots__ = ("id", "home", "ho", "current_patient", "eo", "cluster_id", "wo", "Lo")
+
+    def __init__(self,
+                 id: int,
+                 home: Node,
+                 ho: int = 300,
+                 current_patient: Optional[Node] = None,
+                 eo: int = 420,
+                 cluster_id: Optional[int] = None,
+                 wo: int = 0,
                  Lo: Optional[List[Tuple[Any, Any]]] = None):
         """
         Classe Operatore
@@ -42,7 +77,7 @@ class Operator:
         self.id = id
         self.home = home
         self.ho = ho
-        
+
         # Se non viene specificato un current_patient, l'operatore inizia dal suo depot (home)
         self.current_patient = current_patient if current_patient is not None else home
         self.eo = eo
@@ -56,6 +91,8 @@ class Operator:
 
 
 class Request:
+    __slots__ = ("i", "patient", "duration", "temporal_window", "cluster_id")
+
     def __init__(self, i: int, patient: Node, duration: int, temporal_window: Tuple[int, int], cluster_id: int):
         """
         Classe Richiesta
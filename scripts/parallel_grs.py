@@ -0,0 +1,209 @@
+# Esecuzione di grs_variants sui cluster di una configurazione k, in sequenza o in parallelo
+
+from concurrent.futures import ProcessPoolExecutor
+
+from assignment_ledger import AssignmentLedger
+from diagnostics import log
+from grs_variants import grs_variants
+from local_search import local_search
+from regret_insertion import regret_insertion
+
+# Campi per-k dello stato operatore modificati da grs_variants e local_search
+K_FIELDS = ["wo_k", "road_time_k", "do_k", "overtime_minutes_k", "worked_after_11:30am_k"]
+
+# Matrice tau del processo worker, impostata una sola volta da _init_worker
+_worker_tau = None
+
+
+def solve_cluster(assigned_ops, Rdsc, patients, shift_end, down_time_true, tau, k, local_search_budget=None,
+                  grs_variant="f_oi", grs_engine="greedy", ledger=None, ledger_session=None):
+    """
+    Risolve un singolo cluster con il motore di assegnazione scelto, seguito, se
+    richiesto, da local_search.
+
+    Motori disponibili:
+      - "greedy": grs_variants, con la variante di costo grs_variant
+      - "regret": regret_insertion
+
+    Se è indicato un ledger, vi vengono registrati lo stato e il motivo di mancata
+    assegnazione delle richieste del cluster.
+
+    :return: Tuple (rc, ovc, doc, not_used_ops) come grs_variants, già corrette
+             con le variazioni prodotte dalla ricerca locale.
+    """
+    if grs_engine == "greedy":
+        rc, ovc, doc, not_used_ops = grs_variants(
+            operators=assigned_ops,
+            requests=Rdsc,
+            patients=patients,
+            shift_end=shift_end,
+            down_time_true=down_time_true,
+            tau=tau, k=k,
+            variant=grs_variant,
+            ledger=ledger, ledger_session=ledger_session
+        )
+    elif grs_engine == "regret":
+        rc, ovc, doc, not_used_ops = regret_insertion(
+            operators=assigned_ops,
+            requests=Rdsc,
+            patients=patients,
+            shift_end=shift_end,
+            down_time_true=down_time_true,
+            tau=tau, k=k,
+            ledger=ledger, ledger_session=ledger_session
+        )
+    else:
+        raise ValueError(f"Motore di assegnazione '{grs_engine}' non riconosciuto. Usa 'greedy' oppure 'regret'.")
+
+    if local_search_budget is not None:
+        d_rc, d_ovc, d_doc = local_search(
+            operators=assigned_ops,
+            shift_end=shift_end,
+            tau=tau, k=k,
+            time_budget=local_search_budget,
+            down_time_true=down_time_true
+        )
+        rc += d_rc
+        ovc += d_ovc
+        doc += d_doc
+        # la ricerca locale può spostare le richieste tra operatori e cambiarne b_i
+        if ledger is not None:
+            ledger.record_routes(assigned_ops, k, ledger_session)
+
+    return rc, ovc, doc, not_used_ops
+
+
+def _slim_operator(op, k):
+    """
+    Copia ridotta dell'operatore con i soli campi letti da grs_variants e
+    local_search. Lo delle sessioni precedenti non viene inviato al worker:
+    Lo_k[k] contiene solo la parte relativa alla sessione corrente.
+    """
+    slim = {
+        "id": op["id"],
+        "Ho": op["Ho"],
+        "wo": op["wo"],
+        "eo": op["eo"],
+        "ho": op["ho"],
+        "current_patient_id": op["current_patient_id"],
+        "Lo": [],
+        "Lo_k": {k: list(op["Lo_k"][k][len(op["Lo"]):])},
+        "eo_start_k": {k: op["eo_start_k"][k]},
+    }
+    for field in K_FIELDS:
+        slim[field] = {k: op[field][k]} if k in op[field] else {}
+    return slim
+
+
+def _operator_updates(op, k):
+    """
+    Estrae dal worker gli aggiornamenti di stato dell'operatore per la
+    configurazione k. Le richieste assegnate sono riportate come (id, b_i).
+    """
+    return {
+        "eo": op["eo"],
+        "ho": op["ho"],
+        "current_patient_id": op["current_patient_id"],
+        "session_Lo": [(req["id"], b_i) for (req, b_i) in op["Lo_k"][k]],
+        "k_fields": {field: op[field][k] for field in K_FIELDS if k in op[field]},
+    }
+
+
+def _merge_operator_updates(op, updates, requests_by_id, k):
+    """
+    Applica all'operatore originale gli aggiornamenti ricevuti dal worker,
+    ricollegando le richieste assegnate ai dizionari originali.
+    """
+    op["eo"] = updates["eo"]
+    op["ho"] = updates["ho"]
+    op["current_patient_id"] = updates["current_patient_id"]
+    for field, value in updates["k_fields"].items():
+        op[field][k] = value
+
+    session_Lo = []
+    for req_id, b_i in updates["session_Lo"]:
+        req = requests_by_id[req_id]
+        req["b_i"] = b_i
+        session_Lo.append((req, b_i))
+    op["Lo_k"][k] = op["Lo_k"][k][:len(op["Lo"])] + session_Lo
+
+
+def _init_worker(tau):
+    """
+    Inizializzatore del pool: la matrice tau viene trasferita una sola volta per processo.
+    """
+    global _worker_tau
+    _worker_tau = tau
+
+
+def _solve_cluster_worker(job):
+    """
+    Eseguito nel processo worker su copie ridotte degli operatori del cluster.
+    """
+    ops, Rdsc, patients, shift_end, down_time_true, k, local_search_budget, grs_variant, grs_engine, use_ledger, ledger_session = job
+    ledger = AssignmentLedger() if use_ledger else None
+    rc, ovc, doc, not_used_ops = solve_cluster(ops, Rdsc, patients, shift_end, down_time_true,
+                                               _worker_tau, k, local_search_budget, grs_variant, grs_engine,
+                                               ledger, ledger_session)
+    updates = {op["id"]: _operator_updates(op, k) for op in ops}
+    return rc, ovc, doc, not_used_ops, updates, ledger.entries if use_ledger else None
+
+
+def create_cluster_pool(tau, n_workers):
+    """
+    Crea il pool di processi da usare con run_clusters, None se n_workers è None.
+    """
+    if n_workers is None:
+        return None
+    return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(tau,))
+
+
+def run_clusters(cluster_jobs, shift_end, down_time_true, tau, k, local_search_budget=None, executor=None,
+                 grs_variant="f_oi", grs_engine="greedy", ledger=None, ledger_session=None):
+    """
+    Esegue solve_cluster su tutti i cluster della configurazione k.
+
+    I cluster non condividono operatori né richieste, quindi con un executor
+    vengono risolti in parallelo: i cluster con più richieste vengono inviati
+    per primi e gli aggiornamenti di stato restituiti dai worker vengono
+    applicati agli operatori originali.
+
+    :param cluster_jobs: lista di tuple (c_idx, assigned_ops, Rdsc, patients).
+    :param executor: pool creato con create_cluster_pool, None per l'esecuzione sequenziale.
+    :param grs_variant: variante di costo GRS (chiave di GRS_COST_VARIANTS).
+    :param grs_engine: motore di assegnazione, "greedy" oppure "regret".
+    :param ledger: AssignmentLedger da aggiornare; con l'executor ogni worker restituisce
+                   le proprie voci, che vengono unite a questo registro.
+    :param ledger_session: chiave (giorno, s) associata alle voci del ledger.
+    :return: dizionario {c_idx: (rc, ovc, doc, not_used_ops)}.
+    """
+    results = {}
+
+    if executor is None:
+        for c_idx, assigned_ops, Rdsc, patients in cluster_jobs:
+            log.debug("Solving GRS for cluster %s", c_idx)
+            results[c_idx] = solve_cluster(assigned_ops, Rdsc, patients, shift_end, down_time_true,
+                                           tau, k, local_search_budget, grs_variant, grs_engine,
+                                           ledger, ledger_session)
+        return results
+
+    futures = {}
+    for c_idx, assigned_ops, Rdsc, patients in sorted(cluster_jobs, key=lambda job: len(job[2]), reverse=True):
+        job = ([_slim_operator(op, k) for op in assigned_ops], Rdsc, patients,
+               shift_end, down_time_true, k, local_search_budget, grs_variant, grs_engine,
+               ledger is not None, ledger_session)
+        futures[c_idx] = executor.submit(_solve_cluster_worker, job)
+
+    for c_idx, assigned_ops, Rdsc, patients in cluster_jobs:
+        rc, ovc, doc, not_used_ops, updates, ledger_entries = futures[c_idx].result()
+        requests_by_id = {req["id"]: req for req in Rdsc}
+        for op in assigned_ops:
+            _merge_operator_updates(op, updates[op["id"]], requests_by_id, k)
+        if ledger is not None:
+            ledger.merge(ledger_entries)
+        # come in grs_variants, il rientro a casa ha costo nullo anche nel processo principale
+        for p in patients:
+            tau['h', p["id"]] = 0
+        results[c_idx] = (rc, ovc, doc, not_used_ops)
+
+    return results
@@ -0,0 +1,321 @@
+# Servizio locale di pianificazione: tau, tabelle e cache del clustering restano in memoria tra le richieste
+
+import asyncio
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+
+from diagnostics import log, configure_logging
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Dimensione massima del corpo JSON di una richiesta HTTP
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Soluzioni di MIPClustering conservate da ogni processo (le più vecchie vengono scartate)
+CLUSTERING_CACHE_SIZE = 2048
+
+# Parametri di method_overview accettati da /plan, con i valori usati se mancano
+PLAN_DEFAULTS = {
+    "epsilon": 0.5,
+    "down_time_true": True,
+    "multiplier": 1.25,
+    "Kmax": 37,
+    "kfixed": None,
+    "days": None,
+    "local_search_budget": None,
+    "grs_variant": "f_oi",
+    "grs_engine": "greedy",
+    "operator_assignment": "optimal",
+}
+
+# Nomi di variante accettati: diventano la cartella variant_<variant> dei risultati
+VARIANT_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+# Campi di una richiesta inviata in un batch (come in data_loader.read_requests)
+REQUEST_FIELDS = ("id", "project_id", "day", "n_operators_required", "duration", "min_time_begin", "max_time_begin")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# Stato caldo di ogni processo del pool, impostato da _init_planning_worker
+_tau = None
+_data = None
+_clustering_cache = {}
+
+
+class PlanRequestError(ValueError):
+    """
+    Corpo di una richiesta HTTP non valido (risposta 400), distinto dagli errori
+    della pianificazione stessa (risposta 500).
+    """
+
+
+def _init_planning_worker(sparse_k, log_level):
+    global _tau, _data
+    configure_logging(log_level)
+    from method_overview import load_tau
+    from data_loader import load_data
+    _data = load_data()
+    _tau = load_tau(sparse_k)
+
+
+def _worker_status():
+    return {"pid": os.getpid(), "tau": type(_tau).__name__, "operators": len(_data["operators"]),
+            "requests": len(_data["requests"]), "patients": len(_data["patients"]),
+            "clustering_cache": len(_clustering_cache)}
+
+
+def _plan_job(variant, parameters, batch):
+    """
+    Esegue method_overview nel processo del pool su copie nuove degli operatori e delle
+    richieste (quelle del batch, se presente), con la tau e la cache del processo.
+    """
+    from method_overview import method_overview
+    requests = deepcopy(batch if batch is not None else _data["requests"])
+    operators = deepcopy(_data["operators"])
+    start = time.perf_counter()
+    results = method_overview(requests, operators, _data["patients"], _tau, variant=variant,
+                              wait_for_input=False, map_plots="none", clustering_cache=_clustering_cache,
+                              **parameters)
+    while len(_clustering_cache) > CLUSTERING_CACHE_SIZE:
+        del _clustering_cache[next(iter(_clustering_cache))]
+    response = plan_response(results, operators, requests)
+    response["variant"] = variant
+    response["elapsed"] = round(time.perf_counter() - start, 3)
+    return response
+
+
+def _session_key(ds):
+    d_i, s = ds
+    return f"{d_i}{s}"
+
+
+def plan_response(results, operators, requests):
+    """
+    Risultato di method_overview in forma JSON: costi, k scelto e KPI per sessione,
+    KPI della settimana, schedule di ogni operatore (richiesta, giorno, b_i) e
+    richieste non assegnate.
+    """
+    kpi = results["kpi"]
+    return {
+        "total_cost": results["total_cost"],
+        "total_overtime_cost": results["total_overtime_cost"],
+        "total_routing_cost": results["total_routing_cost"],
+        "cost": {_session_key(ds): cost for ds, cost in results["cost_ds"].items()},
+        "best_k": {_session_key(ds): k for ds, k in results["best_k"].items()},
+        "kpi": {"week": kpi.week_totals,
+                "sessions": {_session_key(ds): totals for ds, totals in kpi.session_totals.items()}},
+        "schedules": {op["id"]: [{"request": req["id"], "day": req["day"], "b_i": b_i} for req, b_i in op["Lo"]]
+                      for op in operators if op["Lo"]},
+        "unassigned": [req["id"] for req in results["ledger"].unassigned(requests)],
+    }
+
+
+def _json_default(value):
+    # Scalari numpy e altri valori non serializzabili
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def parse_plan(payload):
+    """
+    Valida il JSON di una pianificazione: i parametri di PLAN_DEFAULTS, "variant"
+    (nome della cartella dei risultati, solo lettere, cifre, "_" e "-") e "requests"
+    (batch di richieste da pianificare al posto di quelle di requests.csv).
+
+    :return: (variant, parametri, batch o None).
+    :raises PlanRequestError: se il corpo non è valido.
+    """
+    if not isinstance(payload, dict):
+        raise PlanRequestError("Il corpo della richiesta deve essere un oggetto JSON.")
+    unknown = set(payload) - set(PLAN_DEFAULTS) - {"variant", "requests"}
+    if unknown:
+        raise PlanRequestError(f"Parametri non riconosciuti: {', '.join(sorted(unknown))}.")
+    parameters = {name: payload.get(name, default) for name, default in PLAN_DEFAULTS.items()}
+
+    variant = payload.get("variant")
+    if variant is not None and not (isinstance(variant, str) and VARIANT_NAME.fullmatch(variant)):
+        raise PlanRequestError(f"'variant' non valida: {variant!r} (ammessi lettere, cifre, '_' e '-').")
+
+    batch = payload.get("requests")
+    if batch is not None:
+        if not isinstance(batch, list) or not batch:
+            raise PlanRequestError("'requests' deve essere una lista non vuota di richieste.")
+        for req in batch:
+            if not isinstance(req, dict):
+                raise PlanRequestError("Ogni richiesta di 'requests' deve essere un oggetto JSON.")
+            missing = [field for field in REQUEST_FIELDS if field not in req]
+            if missing:
+                raise PlanRequestError(f"Richiesta {req.get('id')}: campi mancanti {', '.join(missing)}.")
+    return variant, parameters, batch
+
+
+class PlanningService:
+    """
+    Servizio HTTP locale (TCP o socket Unix) che risponde alle richieste di pianificazione
+    senza ripartire da zero: i processi del pool leggono tau e i CSV una sola volta
+    all'avvio e conservano tra le richieste la cache delle soluzioni di MIPClustering.
+
+    Endpoint (JSON):
+      - GET  /status: stato del servizio e dei dati caricati;
+      - POST /plan: una pianificazione (parametri di PLAN_DEFAULTS, "variant", "requests");
+      - POST /configurations: {"configurations": [...], "requests": [...]}, più
+        pianificazioni eseguite in parallelo nel pool, risultati nello stesso ordine.
+    """
+
+    def __init__(self, n_workers=1, sparse_k=None):
+        self.n_workers = n_workers
+        self.sparse_k = sparse_k
+        self.pool = None
+        self.started_at = None
+        self.completed = 0
+        self._variant_ids = itertools.count(1)
+        # PID e istante di avvio: i nomi di default non si ripetono tra un riavvio e l'altro
+        self._variant_prefix = f"service{os.getpid()}_{time.strftime('%Y%m%d%H%M%S')}"
+
+    def start(self):
+        """
+        Avvia il pool e attende che ogni processo abbia caricato i dati.
+        """
+        self.pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_planning_worker,
+                                        initargs=(self.sparse_k, log.level))
+        for future in [self.pool.submit(_worker_status) for _ in range(self.n_workers)]:
+            future.result()
+        self.started_at = time.time()
+        log.info("Servizio di pianificazione pronto con %s processi.", self.n_workers)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    async def plan(self, payload):
+        variant, parameters, batch = parse_plan(payload)
+        if variant is None:
+            # Nomi distinti: pianificazioni concorrenti non scrivono nella stessa cartella
+            variant = f"{self._variant_prefix}_{next(self._variant_ids)}"
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.pool, _plan_job, variant, parameters, batch)
+        self.completed += 1
+        return response
+
+    async def configurations(self, payload):
+        if not isinstance(payload, dict) or not isinstance(payload.get("configurations"), list):
+            raise PlanRequestError("Il corpo della richiesta deve contenere la lista 'configurations'.")
+        plans = []
+        for config in payload["configurations"]:
+            if not isinstance(config, dict):
+                raise PlanRequestError("Ogni configurazione deve essere un oggetto JSON.")
+            plans.append({**config, "requests": payload["requests"]} if "requests" in payload else config)
+        for config in plans:
+            parse_plan(config)
+        return {"results": await asyncio.gather(*(self.plan(config) for config in plans))}
+
+    async def status(self):
+        loop = asyncio.get_running_loop()
+        return {"uptime": round(time.time() - self.started_at, 1), "workers": self.n_workers,
+                "completed": self.completed, "sparse_k": self.sparse_k,
+                "worker": await loop.run_in_executor(self.pool, _worker_status)}
+
+    async def dispatch(self, method, path, body):
+        """
+        Corpo JSON illeggibile o non valido (PlanRequestError): 400; errori durante la
+        pianificazione, anche ValueError di method_overview: 500.
+
+        :return: (codice HTTP, corpo della risposta).
+        """
+        routes = {"/status": ("GET", self.status), "/plan": ("POST", self.plan),
+                  "/configurations": ("POST", self.configurations)}
+        if path not in routes:
+            return 404, {"error": f"Percorso {path} non trovato."}
+        expected, handler = routes[path]
+        if method != expected:
+            return 405, {"error": f"{path} accetta solo {expected}."}
+        try:
+            if method == "GET":
+                return 200, await handler()
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError as e:  # JSONDecodeError e UnicodeDecodeError
+                return 400, {"error": f"JSON non valido: {e}"}
+            return 200, await handler(payload)
+        except PlanRequestError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            log.exception("Errore nella richiesta %s %s", method, path)
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                status, payload = 413, {"error": f"Corpo oltre {MAX_BODY_BYTES} byte."}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, path.split("?", 1)[0], body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "Richiesta HTTP non valida."}
+
+        data = json.dumps(payload, default=_json_default).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """
+        Accetta connessioni finché il processo non viene interrotto.
+        """
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)  # socket lasciato da un'esecuzione precedente
+            server = await asyncio.start_unix_server(self._handle, path=unix_path)
+            log.info("In ascolto sul socket %s", unix_path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+            log.info("In ascolto su http://%s:%s", host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    # Uso: python planning_service.py [--host H] [--port P] [--unix PATH] [--workers N] [--sparse-tau K]
+    configure_logging(os.environ.get("TESI_LOG_LEVEL", "INFO"), os.environ.get("TESI_DIAGNOSTICS_FILE"))
+    args = sys.argv[1:]
+    options = {"--host": DEFAULT_HOST, "--port": DEFAULT_PORT, "--unix": None, "--workers": 1, "--sparse-tau": None}
+    while args:
+        name = args.pop(0)
+        if name not in options or not args:
+            log.error("Argomento non riconosciuto: %s. Opzioni: %s seguite da un valore.", name, ', '.join(options))
+            return
+        options[name] = args.pop(0)
+
+    sparse_k = options["--sparse-tau"]
+    service = PlanningService(int(options["--workers"]), int(sparse_k) if sparse_k is not None else None)
+    service.start()
+    try:
+        asyncio.run(service.serve(options["--host"], int(options["--port"]), options["--unix"]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
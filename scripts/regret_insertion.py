@@ -0,0 +1,219 @@
+# Motore di assegnazione alternativo a grs_variants basato su regret-k insertion
+
+from local_search import route_node, node_segment, concat_segments, Route, CostModel, apply_route
+from grs_variants import grs_variants
+from assignment_ledger import unassignment_reason
+from diagnostics import log
+
+
+def _completion(segment, route):
+    """
+    Istante di fine della route riassunta da segment.
+    """
+    if segment is None:
+        return route.start
+    return max(route.start + segment[0], segment[1])
+
+
+def _best_insertion(node, route, route_cost, tau, model, time_weight):
+    """
+    Miglior posizione di inserimento della richiesta nella route dell'operatore.
+    Ogni posizione viene valutata in O(1) concatenando i segmenti precalcolati.
+
+    Al costo di inserimento si aggiunge time_weight * (tempo di turno consumato
+    oltre la durata della richiesta), cioè viaggio e attese indotte che non
+    saranno più disponibili per le altre richieste.
+
+    :return: (costo_inserimento, posizione) oppure None se nessun inserimento è ammissibile.
+    """
+    n = len(route.nodes)
+    single = node_segment(node)
+    completion = _completion(route.sub(0, n - 1), route)
+    best = None
+    for p in range(n + 1):
+        segment = concat_segments(tau, route.sub(0, p - 1), single, route.sub(p, n - 1))
+        cost = model.route_cost(segment, route)
+        if cost is None:
+            continue
+        consumed = _completion(segment, route) - completion - node["t"]
+        delta = cost[0] - route_cost[0] + time_weight * consumed
+        if best is None or delta < best[0]:
+            best = (delta, p)
+    return best
+
+
+def _priority(row, node, regret_k):
+    """
+    Chiave di selezione della richiesta (da minimizzare).
+
+    Il regret è la somma delle differenze tra i regret_k migliori costi di
+    inserimento e il migliore. Gli operatori mancanti (meno di regret_k
+    alternative ammissibili) valgono come la penalità per richiesta non
+    assegnata usata in method_overview, cioè la durata della richiesta: così
+    le richieste con poche alternative vengono inserite per prime.
+    A parità di regret si preferisce il costo migliore e poi α_i più piccolo.
+
+    :return: tupla (-regret, costo migliore, α_i) oppure None se la richiesta
+             non è inseribile in nessuna route.
+    """
+    costs = sorted(entry[0] for entry in row.values() if entry is not None)
+    if not costs:
+        return None
+    costs += [node["t"]] * (regret_k - len(costs))
+    regret = sum(c - costs[0] for c in costs[1:regret_k])
+    return (-regret, costs[0], node["alpha"])
+
+
+# Campi dell'operatore modificati da grs_variants in una sessione
+GREEDY_FIELDS = ("Lo_k", "wo_k", "do_k", "road_time_k", "overtime_minutes_k", "worked_after_11:30am_k",
+                 "eo", "ho", "current_patient_id")
+
+
+def _greedy_solution(operators, requests, patients, shift_end, down_time_true, tau, k):
+    """
+    Esegue grs_variants su copie dello stato di sessione degli operatori (GREEDY_FIELDS)
+    e delle richieste, lasciando invariati gli originali.
+
+    :return: (costo come in method_overview, cioè routing + overtime + durata delle
+             richieste non assegnate, stato degli operatori {op_id: campi},
+             assegnazioni {req_id: b_i}, risultato di grs_variants).
+    """
+    ops = []
+    for op in operators:
+        copy = dict(op)
+        for field in GREEDY_FIELDS:
+            if isinstance(op[field], dict):
+                copy[field] = dict(op[field])
+        copy["Lo_k"][k] = list(op["Lo_k"][k])
+        ops.append(copy)
+    copies = [dict(req) for req in requests]
+    originals = {id(copy): req for copy, req in zip(copies, requests)}
+
+    result = grs_variants(ops, copies, patients, shift_end, down_time_true, tau, k)
+    b_i = {}
+    for op, original in zip(ops, operators):
+        new = op["Lo_k"][k][len(original["Lo_k"][k]):]
+        b_i.update((req["id"], start) for req, start in new)
+        op["Lo_k"][k] = original["Lo_k"][k] + [(originals[id(req)], start) for req, start in new]
+    cost = result[0] + result[1] + sum(req["duration"] for req in requests if req["id"] not in b_i)
+    state = {op["id"]: {field: op[field] for field in GREEDY_FIELDS} for op in ops}
+    return cost, state, b_i, result
+
+
+def regret_insertion(operators, requests, patients, shift_end, down_time_true, tau, k, regret_k=2,
+                     time_weight=0.5, theta=0.37, op_cost_per_minute=0.29, ledger=None, ledger_session=None):
+    """
+    Assegna le richieste del cluster agli operatori con l'euristica regret-k insertion.
+
+    A differenza del greedy di grs_variants, che elabora le richieste in ordine di α_i,
+    a ogni passo viene inserita la richiesta con il regret più alto, così le richieste
+    con pochi operatori ammissibili vengono piazzate prima. Le richieste possono
+    essere inserite in qualsiasi posizione della route.
+
+    I costi di inserimento migliori (richiesta × operatore) sono mantenuti in una
+    matrice: dopo ogni inserimento viene rimossa la riga della richiesta inserita e
+    ricalcolata solo la colonna dell'operatore la cui route è cambiata; la priorità
+    (regret) di una richiesta viene ricalcolata solo se il suo costo in quella colonna cambia.
+
+    Il costo di inserimento è la variazione del costo della route (routing, overtime
+    e, se down_time_true, attesa) calcolato come in compute_f_oi, più time_weight per
+    ogni minuto di turno consumato oltre la durata della richiesta.
+
+    Lo stato dell'operatore viene aggiornato negli stessi campi usati da grs_variants
+    (Lo_k, wo_k, do_k, road_time_k, overtime_minutes_k, worked_after_11:30am_k, eo, ho,
+    current_patient_id).
+
+    Il regret non garantisce di fare meglio del greedy (può lasciare più richieste non
+    assegnate): sulle stesse richieste viene eseguito anche grs_variants ("f_oi") e si
+    tiene la soluzione con il costo minore secondo method_overview (routing + overtime
+    + durata delle richieste non assegnate), quindi il risultato non è mai peggiore.
+
+    :param regret_k: numero di alternative considerate nel calcolo del regret.
+    :param time_weight: peso del tempo di turno consumato da ciascun inserimento.
+    :param ledger: AssignmentLedger da aggiornare, come in grs_variants (opzionale).
+    :return: Tuple con total_routing_cost, total_overtime_cost, total_waiting_time e
+             not_used_ops, come grs_variants.
+    """
+    for p in patients:
+        tau['h', p["id"]] = 0
+
+    model = CostModel(shift_end, theta, op_cost_per_minute, down_time_true)
+
+    routes = {}
+    route_costs = {}
+    for op in operators:
+        route = Route(op, [], op["eo"], op["wo_k"][k], len(op["Lo_k"][k]))
+        route.refresh(tau)
+        routes[op["id"]] = route
+        route_costs[op["id"]] = model.route_cost(None, route)
+
+    nodes = {req["id"]: route_node(req) for req in requests}
+
+    # Matrice dei costi di inserimento: insertion[req_id][op_id] = (delta, posizione) oppure None
+    insertion = {
+        req_id: {op_id: _best_insertion(node, routes[op_id], route_costs[op_id], tau, model, time_weight) for op_id in routes}
+        for req_id, node in nodes.items()
+    }
+
+    # Chiavi di selezione delle richieste da inserire (None: non inseribile)
+    priorities = {req_id: _priority(row, nodes[req_id], regret_k) for req_id, row in insertion.items()}
+
+    while insertion:
+        candidates = [req_id for req_id, key in priorities.items() if key is not None]
+        if not candidates:
+            break
+
+        req_id = min(candidates, key=lambda r: priorities[r])
+        row = insertion.pop(req_id)
+        del priorities[req_id]
+        op_id = min((o for o in row if row[o] is not None), key=lambda o: row[o][0])
+        _, position = row[op_id]
+
+        route = routes[op_id]
+        route.nodes.insert(position, nodes[req_id])
+        route.refresh(tau)
+        route_costs[op_id] = model.route_cost(route.sub(0, len(route.nodes) - 1), route)
+
+        # Aggiornamento incrementale: cambia solo la colonna dell'operatore modificato e
+        # il regret viene ricalcolato solo per le righe in cui quel costo è cambiato
+        for other_id, other_row in insertion.items():
+            updated = _best_insertion(nodes[other_id], route, route_costs[op_id], tau, model, time_weight)
+            if updated != other_row[op_id]:
+                other_row[op_id] = updated
+                priorities[other_id] = _priority(other_row, nodes[other_id], regret_k)
+
+    total_routing_cost = sum(cost[1] for cost in route_costs.values())
+    total_overtime_cost = sum(cost[2] for cost in route_costs.values())
+    not_used_ops = [op_id for op_id, route in routes.items() if not route.nodes]
+    unassigned = list(insertion)
+
+    regret_cost = total_routing_cost + total_overtime_cost + sum(nodes[req_id]["t"] for req_id in unassigned)
+    greedy_cost, greedy_state, greedy_b_i, greedy_result = _greedy_solution(operators, requests, patients, shift_end,
+                                                                           down_time_true, tau, k)
+    if greedy_cost < regret_cost:
+        log.debug("regret_insertion: soluzione greedy migliore (%s < %s)", greedy_cost, regret_cost)
+        for op in operators:
+            op.update(greedy_state[op["id"]])
+        for req in requests:
+            if req["id"] in greedy_b_i:
+                req["b_i"] = greedy_b_i[req["id"]]
+        unassigned = [req_id for req_id in nodes if req_id not in greedy_b_i]
+        total_routing_cost, total_overtime_cost, _, not_used_ops = greedy_result
+    else:
+        for route in routes.values():
+            if route.nodes:
+                apply_route(route, tau, k, shift_end)
+
+    for req_id in unassigned:
+        req = nodes[req_id]["req"]
+        log.debug("Richiesta %s non assegnata: nessun operatore disponibile. Beta_i: %s Alpha_i: %s Duration: %s",
+                  req["id"], nodes[req_id]["beta"], nodes[req_id]["alpha"], req["duration"])
+
+    if ledger is not None:
+        ledger.record_routes(operators, k, ledger_session)
+        for req_id in unassigned:
+            req = nodes[req_id]["req"]
+            tau_row = {op["current_patient_id"]: tau[op["current_patient_id"], req["project_id"]] for op in operators}
+            ledger.unassign(req, unassignment_reason(nodes[req_id]["beta"], operators, tau_row), ledger_session)
+
+    return total_routing_cost, total_overtime_cost, sum(op["do_k"][k] for op in operators), not_used_ops
@@ -0,0 +1,231 @@
+# Tabella unica (SQLite) dei parametri e dei KPI globali di ogni esecuzione delle varianti
+
+import os
+import sqlite3
+from datetime import datetime
+
+from utils import RESULTS_DIR, time_str_to_minutes
+
+WAREHOUSE_FILE = "results.sqlite"
+
+# Parametri della configurazione: colonna -> tipo SQLite
+PARAMETER_COLUMNS = {
+    "epsilon": "REAL",
+    "down_time_true": "INTEGER",
+    "multiplier": "REAL",
+    "kmax": "INTEGER",
+    "kfixed": "INTEGER",
+    "days": "TEXT",
+}
+
+# KPI di calculate_and_save_stats: chiave delle statistiche -> colonna; i tempi "H:MM" sono salvati in minuti
+STAT_COLUMNS = {
+    "Assigned Requests": "assigned_requests",
+    "Total Waiting Time": "total_waiting_time",
+    "Total Road Time": "total_road_time",
+    "Average Waiting Time": "average_waiting_time",
+    "Average Road Time": "average_road_time",
+    "Total Cost": "total_cost",
+    "Routing Cost": "routing_cost",
+    "Overtime Cost": "overtime_cost",
+    "Total Overtime": "total_overtime",
+    "Total Hours Worked": "total_hours_worked",
+    "Occupation Ratio": "occupation_ratio",
+}
+TIME_STATS = ("Total Waiting Time", "Total Road Time", "Average Waiting Time", "Average Road Time",
+              "Total Overtime", "Total Hours Worked")
+
+# Colonne di combined_results.csv, nell'ordine di combine_results
+COMBINED_PARAMETERS = ("epsilon", "down_time_true", "multiplier")
+COMBINED_STATS = ("Total Waiting Time", "Average Waiting Time", "Total Cost", "Routing Cost", "Overtime Cost",
+                  "Occupation Ratio")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    variant TEXT NOT NULL,
+    recorded_at TEXT,
+    {', '.join(f'{column} {sql_type}' for column, sql_type in PARAMETER_COLUMNS.items())},
+    objective_cost REAL,
+    {', '.join(f'{column} REAL' for column in STAT_COLUMNS.values())}
+);
+CREATE INDEX IF NOT EXISTS runs_variant ON runs (variant, run_id);
+CREATE INDEX IF NOT EXISTS runs_total_cost ON runs (total_cost);
+CREATE TABLE IF NOT EXISTS exports (
+    path TEXT PRIMARY KEY,
+    last_run_id INTEGER
+);
+"""
+
+# Colonne di runs ammesse in ORDER BY: query() non inserisce nell'SQL altri valori del chiamante
+ORDER_COLUMNS = ("run_id", "variant", "recorded_at", *PARAMETER_COLUMNS, "objective_cost", *STAT_COLUMNS.values())
+
+_LATEST = "run_id IN (SELECT MAX(run_id) FROM runs GROUP BY variant)"
+
+
+def warehouse_path():
+    return os.path.join(RESULTS_DIR, WAREHOUSE_FILE)
+
+
+def minutes_to_hours(minutes):
+    """
+    Minuti nel formato "H:MM" usato dai CSV delle statistiche.
+    """
+    total = int(round(minutes))
+    return f"{total // 60}:{total % 60:02d}"
+
+
+class ResultsWarehouse:
+    """
+    Risultati di tutte le esecuzioni in un'unica tabella SQLite (RESULTS_DIR/results.sqlite),
+    una riga per esecuzione con una colonna per ogni parametro (PARAMETER_COLUMNS) e
+    per ogni KPI globale (STAT_COLUMNS), indicizzata per variante e costo totale.
+    Le esecuzioni ripetute di una variante si aggiungono come nuove righe: le query
+    "latest" considerano solo l'ultima esecuzione di ogni variante.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or warehouse_path()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # timeout: più processi di run_configurations_parallel possono scrivere insieme
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def record_run(self, variant_name, parameters, stats, objective_cost=None):
+        """
+        Aggiunge un'esecuzione della variante.
+
+        :param parameters: dizionario con le chiavi di PARAMETER_COLUMNS (le mancanti restano NULL);
+                           days può essere una lista di giorni.
+        :param stats: statistiche globali restituite da calculate_and_save_stats.
+        :param objective_cost: costo totale restituito da method_overview.
+        :return: run_id dell'esecuzione.
+        """
+        row = {"variant": str(variant_name), "recorded_at": datetime.now().isoformat(timespec="seconds"),
+               "objective_cost": objective_cost}
+        for column in PARAMETER_COLUMNS:
+            value = parameters.get(column)
+            if column == "days" and value is not None:
+                value = ",".join(str(d) for d in value)
+            row[column] = value
+        for key, column in STAT_COLUMNS.items():
+            value = (stats or {}).get(key)
+            if value is not None:
+                value = time_str_to_minutes(value) if key in TIME_STATS else float(value)
+            row[column] = value
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", list(row.values()))
+        return cursor.lastrowid
+
+    def query(self, variant_name=None, latest=False, after_run_id=None, order_by="run_id", limit=None):
+        """
+        Righe di runs come DataFrame.
+
+        :param variant_name: solo le esecuzioni della variante indicata.
+        :param latest: solo l'ultima esecuzione di ogni variante.
+        :param after_run_id: solo le esecuzioni con run_id maggiore.
+        :param order_by: colonna di ordinamento (una di ORDER_COLUMNS), crescente con i NULL in fondo.
+        :param limit: numero massimo di righe.
+        """
+        import pandas as pd
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Colonna '{order_by}' non riconosciuta.")
+        conditions, params = [], []
+        if variant_name is not None:
+            conditions.append("variant = ?")
+            params.append(str(variant_name))
+        if latest:
+            conditions.append(_LATEST)
+        if after_run_id is not None:
+            conditions.append("run_id > ?")
+            params.append(int(after_run_id))
+        sql = f"SELECT * FROM runs WHERE {' AND '.join(conditions) or '1'} ORDER BY {order_by} IS NULL, {order_by}, run_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def runs(self, variant_name=None):
+        """
+        Tutte le esecuzioni, oppure solo quelle della variante indicata, in ordine di registrazione.
+        """
+        return self.query(variant_name)
+
+    def latest(self):
+        """
+        Ultima esecuzione di ogni variante, ordinata per variante.
+        """
+        return self.query(latest=True, order_by="variant")
+
+    def best(self, column="total_cost", n=10):
+        """
+        Le n varianti migliori (valore minimo di column) considerando l'ultima esecuzione di ciascuna.
+        """
+        if column not in STAT_COLUMNS.values() and column != "objective_cost":
+            raise ValueError(f"Colonna '{column}' non riconosciuta.")
+        return self.query(latest=True, order_by=column, limit=n)
+
+    def export_combined(self, path=None):
+        """
+        Scrive combined_results.csv (stesse colonne di combine_results) con l'ultima esecuzione
+        di ogni variante. L'esportazione è incrementale: se il file esiste già vengono lette
+        solo le esecuzioni registrate dopo l'ultima esportazione e sostituite le righe delle
+        rispettive varianti.
+
+        :return: percorso del file, oppure None se non ci sono esecuzioni.
+        """
+        import pandas as pd
+        path = path or os.path.join(RESULTS_DIR, "combined_results.csv")
+        last_run_id = 0
+        if os.path.exists(path):
+            row = self.conn.execute("SELECT last_run_id FROM exports WHERE path = ?", (path,)).fetchone()
+            last_run_id = row[0] if row else 0
+
+        new_runs = self.query(latest=True, after_run_id=last_run_id, order_by="variant")
+        if new_runs.empty:
+            return path if last_run_id else None
+
+        combined = pd.DataFrame(combined_rows(new_runs))
+        if last_run_id:
+            previous = pd.read_csv(path, dtype={"Variant": str})
+            previous = previous[~previous["Variant"].isin(combined["Variant"])]
+            combined = pd.concat([previous, combined], ignore_index=True).sort_values("Variant")
+        combined.to_csv(path, index=False)
+
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO exports VALUES (?, ?)", (path, int(new_runs["run_id"].max())))
+        return path
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def combined_rows(runs_df):
+    """
+    Righe nel formato di combined_results.csv a partire dalle righe di runs.
+    """
+    import pandas as pd
+    rows = []
+    for run in runs_df.to_dict("records"):
+        row = {"Variant": run["variant"]}
+        for column in COMBINED_PARAMETERS:
+            value = run[column]
+            if column == "down_time_true" and pd.notna(value):
+                value = bool(value)
+            row[column] = "" if pd.isna(value) else value
+        for key in COMBINED_STATS:
+            value = run[STAT_COLUMNS[key]]
+            if pd.isna(value):
+                value = ""
+            elif key in TIME_STATS:
+                value = minutes_to_hours(value)
+            row[key] = value
+        rows.append(row)
+    return rows
@@ -0,0 +1,143 @@
+# Pianificazione a orizzonte mobile su più settimane con memoria limitata
+
+import json
+import os
+
+from diagnostics import log
+from method_overview import method_overview
+from utils import RESULTS_DIR
+
+# Campi settimanali degli operatori azzerati dopo il flush di ogni settimana
+WEEK_FIELDS = ("Lo", "morning_requests", "afternoon_requests")
+
+# Contatori cumulativi portati da una settimana all'altra: campo cumulativo -> campo settimanale.
+# Servono solo per i riepiloghi: method_overview non li legge
+CARRIED_COUNTERS = {
+    "total_single_shift_requests": "single_shift_requests",
+    "total_double_shift_requests": "double_shift_requests",
+    "total_worked_minutes": "wo",
+    "total_road_time": "road_time",
+    "total_waiting_time": "do",
+}
+
+# Campo cumulativo dell'overtime: overtime_minutes vale solo per l'ultima sessione,
+# per cui il totale della settimana si legge dal KPIAccumulator
+OVERTIME_TOTAL = "total_overtime_minutes"
+
+
+def iter_weeks(request_stream):
+    """
+    Raggruppa un flusso di richieste ordinate per giorno assoluto (0, 1, ..., 7, 8, ...)
+    in settimane, senza leggere tutto il flusso in memoria.
+
+    Ogni richiesta viene copiata con "day" riportato a 0..6 e il giorno assoluto in "abs_day".
+
+    :return: generatore di coppie (indice della settimana, richieste della settimana).
+    """
+    week, current = None, []
+    for req in request_stream:
+        req_week = req["day"] // 7
+        if week is not None and req_week != week:
+            if req_week < week:
+                raise ValueError(f"Richiesta {req['id']} della settimana {req_week} dopo la settimana {week}: il flusso deve essere ordinato per giorno.")
+            yield week, current
+            current = []
+        week = req_week
+        current.append(dict(req, day=req["day"] % 7, abs_day=req["day"]))
+    if current:
+        yield week, current
+
+
+def carry_forward(operators, kpi):
+    """
+    Aggiorna i contatori cumulativi di ogni operatore con quelli della settimana
+    appena pianificata (CARRIED_COUNTERS, e l'overtime di tutte le sessioni dai totali
+    per operatore di kpi) e azzera i campi settimanali (contatori, overtime_minutes,
+    Lo, richieste di mattina e pomeriggio, campi temporanei *_k). I contatori vanno
+    azzerati qui perché method_overview non reimposta "do" all'inizio della settimana.
+
+    I totali cumulativi sono solo di riepilogo e non vengono riportati nella
+    pianificazione della settimana successiva: Ho, SSRo e DSRo sono per definizione
+    settimanali (ore massime della settimana, turni singoli e doppi della settimana
+    rispetto a Ho), quindi ShiftState, priority e KPI di ogni settimana partono da
+    zero, come se fosse la prima.
+
+    :param kpi: KPIAccumulator della settimana, restituito da method_overview nella chiave 'kpi'.
+    """
+    for op in operators:
+        op["weeks_planned"] = op.get("weeks_planned", 0) + 1
+        for total_field, week_field in CARRIED_COUNTERS.items():
+            op[total_field] = op.get(total_field, 0) + op.get(week_field, 0)
+            op[week_field] = 0
+        op[OVERTIME_TOTAL] = op.get(OVERTIME_TOTAL, 0) + kpi.operator_totals[op["id"]]["overtime"]
+        op["overtime_minutes"] = 0
+        for field in WEEK_FIELDS:
+            op[field] = []
+        for field in [key for key in op if key.endswith("_k")]:
+            del op[field]
+
+
+def flush_week(path, week, results, operators, n_requests):
+    """
+    Aggiunge al file JSON lines path il riepilogo della settimana: costi, k scelti,
+    riepilogo del ledger, ore lavorate e overtime della settimana di ogni operatore.
+    """
+    record = {
+        "week": week,
+        "requests": n_requests,
+        "total_cost": results["total_cost"],
+        "total_overtime_cost": results["total_overtime_cost"],
+        "total_routing_cost": results["total_routing_cost"],
+        "best_k": {f"{d}{s}": k for (d, s), k in results["best_k"].items()},
+        "assignments": results["ledger"].summary(),
+        "operators": [
+            {"id": op["id"], "wo": op["wo"], "overtime_minutes": results["kpi"].operator_totals[op["id"]]["overtime"],
+             "single_shift_requests": op.get("single_shift_requests", 0),
+             "double_shift_requests": op.get("double_shift_requests", 0)}
+            for op in operators
+        ],
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def plan_rolling_horizon(request_stream, operators, patients, tau, variant, epsilon, down_time_true, Kmax,
+                         multiplier, **method_kwargs):
+    """
+    Pianifica un flusso di più settimane una settimana alla volta con method_overview.
+
+    Dopo ogni settimana il riepilogo viene scritto (flush) in
+    RESULTS_DIR/rolling_<variant>.jsonl, i file di dettaglio restano nelle cartelle
+    variant_<variant>_W<settimana> e agli operatori restano solo i contatori
+    cumulativi (carry_forward): in memoria ci sono al più le richieste e le
+    assegnazioni di una settimana, quindi memoria e stato iniziale di ogni settimana
+    (ShiftState e KPIAccumulator sono costruiti da Lo) non crescono con il numero di settimane.
+
+    :param request_stream: richieste ordinate per giorno assoluto (anche un generatore).
+    :param method_kwargs: parametri aggiuntivi per method_overview (kfixed, n_workers, ...).
+    :return: totali dei costi su tutte le settimane e numero di settimane pianificate.
+    """
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"rolling_{variant}.jsonl")
+    open(path, "w").close()
+
+    totals = {"weeks": 0, "total_cost": 0, "total_overtime_cost": 0, "total_routing_cost": 0}
+    for week, week_requests in iter_weeks(request_stream):
+        log.info("Settimana %s: %s richieste", week, len(week_requests))
+        results = method_overview(week_requests, operators, patients, tau,
+                                  variant=f"{variant}_W{week}",
+                                  epsilon=epsilon,
+                                  down_time_true=down_time_true,
+                                  Kmax=Kmax,
+                                  multiplier=multiplier,
+                                  wait_for_input=False,
+                                  **method_kwargs)
+        flush_week(path, week, results, operators, len(week_requests))
+        carry_forward(operators, results["kpi"])
+
+        totals["weeks"] += 1
+        for key in ("total_cost", "total_overtime_cost", "total_routing_cost"):
+            totals[key] += results[key]
+
+    log.info("Orizzonte mobile completato: %s settimane, costo totale %s", totals["weeks"], totals["total_cost"])
+    return totals
@@ -0,0 +1,155 @@
+# Store strutturato (SQLite) dello scheduling per variante, giorno, sessione e operatore
+
+import os
+import sqlite3
+
+from diagnostics import log
+from scheduling_writer import format_operator_session
+from utils import RESULTS_DIR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    variant TEXT, day INTEGER, session TEXT, operator,
+    op_lat, op_lon,
+    PRIMARY KEY (variant, day, session, operator)
+);
+CREATE TABLE IF NOT EXISTS schedule (
+    variant TEXT, day INTEGER, session TEXT, operator, position INTEGER,
+    request, project_id, alpha INTEGER, beta INTEGER, duration, b_i, tau, waiting,
+    patient_lat REAL, patient_lon REAL,
+    PRIMARY KEY (variant, day, session, operator, position)
+);
+"""
+
+# Colonne di schedule nell'ordine delle righe di session_rows (scheduling_writer.py)
+ROW_COLUMNS = ("position", "request", "project_id", "alpha", "beta", "duration", "b_i", "tau", "waiting",
+               "patient_lat", "patient_lon")
+
+DAY_NAMES = {
+    0: "LUNEDI", 1: "MARTEDI", 2: "MERCOLEDI", 3: "GIOVEDI", 4: "VENERDI",
+    5: "SABATO", 6: "DOMENICA"
+}
+SESSION_NAMES = {'m': "Mattina", 'a': "Pomeriggio"}
+
+
+def store_path(variant_name):
+    return os.path.join(RESULTS_DIR, f"variant_{variant_name}", "schedule.sqlite")
+
+
+class ScheduleStore:
+    """
+    Scheduling di una variante in un file SQLite (variant_<X>/schedule.sqlite):
+      - sessions: un record per (giorno, sessione, operatore) salvato, con le coordinate dell'operatore;
+      - schedule: un record per richiesta assegnata, con (variant, day, session, operator,
+        request, b_i, tau, waiting, ...), nell'ordine della route (position).
+
+    Le colonne duration, b_i e tau mantengono il tipo del valore salvato (es. "N/A"
+    se tau non contiene lo spostamento). I file settimanali (render_weekly) sono
+    generati interrogando queste tabelle.
+    """
+
+    def __init__(self, variant_name, path=None):
+        self.variant = variant_name
+        self.path = path or store_path(variant_name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+
+    def write_session(self, day, session, operator_rows):
+        """
+        Salva (sostituendo eventuali dati precedenti) lo scheduling della sessione.
+
+        :param operator_rows: righe per operatore prodotte da scheduling_writer.session_rows.
+        """
+        key = (self.variant, day, session)
+        with self.conn:
+            self.conn.execute("DELETE FROM sessions WHERE variant = ? AND day = ? AND session = ?", key)
+            self.conn.execute("DELETE FROM schedule WHERE variant = ? AND day = ? AND session = ?", key)
+            self.conn.executemany("INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(*key, op_id, op_lat, op_lon) for op_id, op_lat, op_lon, _ in operator_rows])
+            self.conn.executemany(f"INSERT INTO schedule VALUES ({', '.join('?' * (4 + len(ROW_COLUMNS)))})",
+                                  [(*key, op_id, *row) for op_id, _, _, rows in operator_rows for row in rows])
+
+    def clear(self):
+        """
+        Elimina tutto lo scheduling della variante (es. all'inizio di un'esecuzione non ripresa da checkpoint).
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM sessions WHERE variant = ?", (self.variant,))
+            self.conn.execute("DELETE FROM schedule WHERE variant = ?", (self.variant,))
+
+    def days(self):
+        return [day for (day,) in self.conn.execute(
+            "SELECT DISTINCT day FROM sessions WHERE variant = ? ORDER BY day", (self.variant,))]
+
+    def operator_rows(self, day, session, operator=None):
+        """
+        Righe della sessione raggruppate per operatore, nello stesso formato di session_rows.
+        """
+        query = "SELECT operator, op_lat, op_lon FROM sessions WHERE variant = ? AND day = ? AND session = ?"
+        params = [self.variant, day, session]
+        if operator is not None:
+            query += " AND operator = ?"
+            params.append(operator)
+        result = []
+        for op_id, op_lat, op_lon in self.conn.execute(query + " ORDER BY rowid", params).fetchall():
+            rows = self.conn.execute(
+                f"SELECT {', '.join(ROW_COLUMNS)} FROM schedule WHERE variant = ? AND day = ? AND session = ? AND operator = ? ORDER BY position",
+                (self.variant, day, session, op_id)).fetchall()
+            result.append((op_id, op_lat, op_lon, rows))
+        return result
+
+    def render_weekly(self, operators):
+        """
+        Genera i file settimanali RESULT_DIR/variant_<X>/scheduling/week/weekly_schedule_Op<id>.txt
+        (vedi aggregate_weekly_schedule) interrogando lo store.
+
+        :return: percorsi dei file scritti.
+        """
+        days = self.days()
+        if not days:
+            log.warning("Nessuna sessione salvata in %s. Impossibile aggregare.", self.path)
+            return []
+
+        weekly_output_dir = os.path.join(RESULTS_DIR, f"variant_{self.variant}", "scheduling", "week")
+        os.makedirs(weekly_output_dir, exist_ok=True)
+
+        # Corpo di ogni (giorno, sessione, operatore) salvato, con una sola passata per sessione
+        bodies = {}
+        for day in days:
+            for session in SESSION_NAMES:
+                for op_id, op_lat, op_lon, rows in self.operator_rows(day, session):
+                    bodies[(day, session, op_id)] = format_operator_session(op_id, op_lat, op_lon, rows)[1]
+
+        paths = []
+        for op in operators:
+            op_id = op.get('id')
+            if op_id is None:
+                log.warning("Attenzione: Trovato operatore senza ID, verrà saltato.")
+                continue
+
+            lines = [f"=== Pianificazione Settimanale Operatore ID: {op_id} ===\n",
+                     f"=== Coordinate Operatore: {op.get('lat', 'N/A')}, {op.get('lon', 'N/A')} ===\n",
+                     f"=== Variante: {self.variant} ===\n\n"]
+            found_any_schedule_for_op = False
+            for day in days:
+                for session, session_name in SESSION_NAMES.items():
+                    lines.append(f"--- {DAY_NAMES.get(day, f'Giorno {day}')} - Sessione {session_name} ---\n")
+                    body = bodies.get((day, session, op_id))
+                    if body is None:
+                        lines.append("(Nessuna assegnazione registrata per questa sessione)\n\n")
+                    else:
+                        # Il corpo termina con "\n": uno spazio dopo il contenuto della sessione
+                        lines.append(body + "\n")
+                        found_any_schedule_for_op = True
+            if not found_any_schedule_for_op:
+                lines.append("\n=== Nessuna assegnazione trovata per l'intera settimana ===\n")
+
+            weekly_filepath = os.path.join(weekly_output_dir, f"weekly_schedule_Op{op_id}.txt")
+            with open(weekly_filepath, "w", encoding='utf-8') as f_weekly:
+                f_weekly.write("".join(lines))
+            paths.append(weekly_filepath)
+        return paths
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,272 @@
+# Scrittura dei file di scheduling per sessione in un thread separato, alimentato da una coda limitata
+
+import os
+import queue
+import threading
+
+import numpy as np
+
+from checkpoint import write_checkpoint
+from diagnostics import log
+from utils import RESULTS_DIR, parse_time_to_minutes
+
+
+def patient_coordinates(patients):
+    """
+    Coordinate dei pazienti indicizzate per id: coords[id] = (lat, lon), known[id]
+    indica se l'id corrisponde a un paziente. Sostituisce la ricerca lineare in patients.
+    """
+    size = max((p["id"] for p in patients), default=-1) + 1
+    coords = np.zeros((size, 2))
+    known = np.zeros(size, dtype=bool)
+    for p in patients:
+        coords[p["id"]] = (p.get("lat", np.nan), p.get("lon", np.nan))
+        known[p["id"]] = True
+    return coords, known
+
+
+def snapshot_scheduling(operators, baseline_operators, tau):
+    """
+    Estrae dallo stato corrente degli operatori solo i valori necessari per i file di
+    scheduling della sessione (le assegnazioni nuove rispetto a baseline_operators e il
+    tau di ogni spostamento), come tuple immutabili: gli operatori possono essere
+    modificati dalle sessioni successive mentre i file vengono ancora scritti.
+
+    :return: lista di tuple (op_id, lat, lon, assegnazioni), con assegnazioni
+             lista di (req_id, project_id, min_time_begin, max_time_begin, duration, b_i, tau).
+    """
+    snapshot = []
+    for op, base_op in zip(operators, baseline_operators):
+        # ID delle richieste nel baseline per un confronto rapido
+        base_ids = {assignment[0].get("id") for assignment in base_op.get("Lo", []) if assignment and assignment[0]}
+        op_id = op.get('id', 'N/A')
+
+        # La posizione di partenza è quella attuale dell'operatore all'inizio della sessione
+        previous_location_id = op.get("current_patient_id")
+        if previous_location_id is None:
+            previous_location_id = f"op_{op_id}_start"
+
+        assignments = []
+        for assignment in op.get("Lo", []):
+            if not (assignment and assignment[0] and assignment[0].get("id") not in base_ids):
+                continue
+            if len(assignment) < 2:
+                log.warning("Attenzione: Assegnazione malformata per Op %s: %s", op['id'], assignment)
+                continue
+            req, b_i = assignment[0], assignment[1]
+            project_id = req.get("project_id", "N/A")
+            # Tau per arrivare a questa richiesta dalla posizione precedente
+            tau_value = tau.get((previous_location_id, project_id), "N/A")
+            assignments.append((req.get("id", "N/A"), project_id, req.get("min_time_begin", ""),
+                                req.get("max_time_begin", ""), req.get("duration", "N/A"), b_i, tau_value))
+            previous_location_id = project_id
+
+        snapshot.append((op_id, op.get('lat', 'N/A'), op.get('lon', 'N/A'), assignments))
+    return snapshot
+
+
+def waiting_time(b_i, previous_b_i, previous_t_i):
+    """
+    Waiting_time = b_i corrente - (b_i precedente + t_i precedente).
+
+    :return: (valore intero o None, testo da stampare nei file di scheduling).
+    """
+    if previous_b_i is None or previous_t_i is None:
+        return None, "N/A"
+    try:
+        value = int(b_i) - (int(previous_b_i) + int(previous_t_i))
+    except (ValueError, TypeError):
+        return None, "Calc Error"
+    return value, (f"ERR({value})" if value < 0 else value)
+
+
+def session_rows(snapshot, coords, known):
+    """
+    Righe della sessione per lo store strutturato (schedule_store.py): per ogni
+    operatore (op_id, lat, lon, righe), con righe lista di
+    (posizione, req_id, project_id, alpha, beta, t_i, b_i, tau, waiting, lat_paziente, lon_paziente).
+    Gli orari sono convertiti in minuti; waiting è None per la prima richiesta o se non calcolabile,
+    le coordinate sono None se il paziente non è stato trovato.
+    """
+    result = []
+    for op_id, op_lat, op_lon, assignments in snapshot:
+        rows = []
+        previous = None
+        for position, (req_id, project_id, alpha_str, beta_str, t_i_val, b_i, tau_value) in enumerate(assignments):
+            waiting = None
+            if previous is not None:
+                prev_req_id, previous_b_i, previous_t_i = previous
+                waiting, text = waiting_time(b_i, previous_b_i, previous_t_i)
+                if waiting is not None and waiting < 0:
+                    # Questo potrebbe indicare un problema di scheduling o nel calcolo tau
+                    log.warning("Attenzione: Waiting time negativo (%s) per Op %s, Req %s dopo Req %s", waiting, op_id, req_id, prev_req_id)
+                elif text == "Calc Error":
+                    log.warning("Errore nel calcolo del waiting time per Op %s, Req %s", op_id, req_id)
+
+            if isinstance(project_id, (int, np.integer)) and 0 <= project_id < len(known) and known[project_id]:
+                lat, lon = coords[project_id].tolist()
+            else:
+                lat, lon = None, None
+
+            rows.append((position, req_id, project_id, parse_time_to_minutes(alpha_str), parse_time_to_minutes(beta_str),
+                         t_i_val, b_i, tau_value, waiting, lat, lon))
+            previous = (req_id, b_i, t_i_val)
+        result.append((op_id, op_lat, op_lon, rows))
+    return result
+
+
+def format_operator_session(op_id, op_lat, op_lon, rows):
+    """
+    Testo del file di scheduling di un operatore per una sessione, a partire dalle
+    righe di session_rows.
+
+    :return: (intestazione, corpo): il riepilogo settimanale riporta solo il corpo.
+    """
+    header = f"Operatore ID: {op_id}, Coordinate Operatore: {op_lat}, {op_lon}\n\n"
+    lines = []
+    if not rows:
+        lines.append("Nessuna nuova richiesta assegnata in questa sessione\n")
+
+    previous = None
+    for position, req_id, project_id, alpha_min, beta_min, t_i_val, b_i, tau_value, _, lat, lon in rows:
+        if previous is None:
+            lines.append(f"↓ Viaggio iniziale Tau: {tau_value}\n")
+        else:
+            lines.append(f"↓ Tau: {tau_value} - Waiting_time: {waiting_time(b_i, *previous)[1]}\n")
+
+        lines.append(f"Richiesta (id: {req_id}, project_id: {project_id}, Alpha: {alpha_min}, Beta: {beta_min}, b_i: {b_i}, t_i: {t_i_val})\n")
+        if lat is None:
+            lines.append(f"Coordinate paziente: (non trovate per id {project_id})\n\n")
+        else:
+            lat = "N/A" if lat != lat else lat
+            lon = "N/A" if lon != lon else lon
+            lines.append(f"Coordinate paziente: ({lat}, {lon})\n\n")
+        previous = (b_i, t_i_val)
+
+    lines.append("-- Fine scheduling sessione --\n")
+    return header, "".join(lines)
+
+
+def session_dir(variant_name, day, session):
+    return os.path.join(RESULTS_DIR, f"variant_{variant_name}", "scheduling", f"day_{day}", f"session_{session}")
+
+
+def write_scheduling(operator_rows, variant_name, day, session):
+    """
+    Scrive un file di testo per operatore in
+    RESULTS_DIR/variant_<variant_name>/scheduling/day_<day>/session_<session>/scheduling_S<session>_Op<id>.txt,
+    nel formato descritto in save_operator_scheduling.
+
+    :param operator_rows: righe per operatore prodotte da session_rows (o lette da ScheduleStore).
+    :return: percorsi dei file scritti.
+    """
+    base_sched_dir = session_dir(variant_name, day, session)
+    os.makedirs(base_sched_dir, exist_ok=True)
+
+    paths = []
+    for op_id, op_lat, op_lon, rows in operator_rows:
+        header, body = format_operator_session(op_id, op_lat, op_lon, rows)
+        file_path = os.path.join(base_sched_dir, f"scheduling_S{session}_Op{op_id}.txt")
+        with open(file_path, "w") as f_out:
+            f_out.write(header + body)
+        log.debug("Scheduling salvato in: %s", file_path)
+        paths.append(file_path)
+    return paths
+
+
+class SchedulingWriter:
+    """
+    Salva lo scheduling di ogni sessione in un thread in background: submit() prende
+    solo un'istantanea dei valori necessari (snapshot_scheduling) e la mette in una
+    coda limitata; conversione degli orari, coordinate e scrittura avvengono nel thread.
+    Se la coda è piena submit() attende, così la memoria occupata dalle sessioni in
+    attesa resta limitata.
+
+    Le righe vengono scritte nello store strutturato (ScheduleStore, un file SQLite
+    per variante); con text_files=True vengono scritti anche i file di testo per sessione.
+
+    Con checkpoint, il thread scrive il checkpoint della sessione (checkpoint.py) solo
+    dopo averne salvato le righe nello store: una ripresa non salta mai sessioni che
+    non sono nello store, senza che il ciclo di pianificazione debba attendere la coda.
+
+    Gli errori del thread vengono rilanciati dalla submit() successiva, da flush() o da
+    close(), che va chiamata prima di leggere lo store (es. aggregate_weekly_schedule).
+    Dopo un errore il thread non scrive più né righe né checkpoint.
+    """
+
+    def __init__(self, patients, max_pending=4, text_files=False):
+        self._coords, self._known = patient_coordinates(patients)
+        self._text_files = text_files
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        # daemon: un'eccezione nel ciclo di pianificazione non lascia il processo in attesa del thread
+        self._thread = threading.Thread(target=self._run, name="scheduling-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # Le connessioni SQLite appartengono al thread che le apre: vengono aperte e chiuse qui
+        from schedule_store import ScheduleStore
+        stores = {}
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    self._queue.task_done()
+                    break
+                try:
+                    if self._error is None:
+                        snapshot, variant_name, day, session, checkpoint = job
+                        operator_rows = session_rows(snapshot, self._coords, self._known)
+                        if variant_name not in stores:
+                            stores[variant_name] = ScheduleStore(variant_name)
+                        stores[variant_name].write_session(day, session, operator_rows)
+                        if self._text_files:
+                            write_scheduling(operator_rows, variant_name, day, session)
+                        if checkpoint is not None:
+                            checkpoint_dir, payload = checkpoint
+                            path = write_checkpoint(checkpoint_dir, day, session, payload)
+                            log.debug("Checkpoint salvato in %s", path)
+                except Exception as e:
+                    self._error = e
+                finally:
+                    self._queue.task_done()
+        finally:
+            for store in stores.values():
+                store.close()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, operators, baseline_operators, tau, variant_name, day, session, checkpoint=None):
+        """
+        :param checkpoint: coppia (checkpoint_dir, checkpoint_payload(day, session, stato)) da
+                           scrivere dopo le righe della sessione, oppure None.
+        """
+        self._raise_error()
+        self._queue.put((snapshot_scheduling(operators, baseline_operators, tau), variant_name, day, session, checkpoint))
+
+    def flush(self):
+        """
+        Attende che tutte le sessioni in coda (e i loro checkpoint) siano salvate,
+        senza fermare il thread.
+        """
+        if self._thread.is_alive():
+            self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Attende il salvataggio di tutte le sessioni in coda e termina il thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
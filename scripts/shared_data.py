@@ -0,0 +1,141 @@
+# Dati in sola lettura condivisi tra processi tramite multiprocessing.shared_memory
+
+import pickle
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _attach(name):
+    """
+    Collega un blocco di memoria condivisa creato dal processo principale.
+    I processi figli usano lo stesso resource_tracker del padre, che resta
+    l'unico a rimuovere il blocco (unlink) al termine.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedTau:
+    """
+    Matrice delle distanze tau in memoria condivisa, con la stessa interfaccia di
+    lettura del dizionario {(i, j): tempo} usato nel resto del codice.
+
+    I tempi sono memorizzati in una matrice N × N (NaN per le coppie assenti)
+    letta direttamente dal blocco condiviso, senza copie. Le scritture (es. le
+    chiavi ('h', id_paziente) aggiunte da GRS) restano locali al processo che le fa.
+    """
+
+    def __init__(self, shm, index, local=None):
+        self._shm = shm
+        self._index = index
+        n = len(index)
+        self._matrix = np.ndarray((n, n), dtype=np.float64, buffer=shm.buf)
+        self._local = dict(local) if local else {}
+
+    @classmethod
+    def create(cls, tau):
+        """
+        Copia tau in un nuovo blocco di memoria condivisa.
+        Le chiavi che non sono coppie di id numerici restano nel dizionario locale.
+
+        :return: SharedTau proprietario del blocco (da rilasciare con unlink()).
+        """
+        pairs = {key: value for key, value in tau.items()
+                 if isinstance(key, tuple) and len(key) == 2
+                 and all(isinstance(node, (int, np.integer)) for node in key)}
+        nodes = sorted({node for key in pairs for node in key})
+        index = {node: idx for idx, node in enumerate(nodes)}
+
+        n = len(nodes)
+        shm = shared_memory.SharedMemory(create=True, size=max(n * n * 8, 1))
+        shared = cls(shm, index, {key: value for key, value in tau.items() if key not in pairs})
+        shared._matrix.fill(np.nan)
+        if pairs:
+            rows = np.fromiter((index[i] for i, _ in pairs), dtype=np.intp, count=len(pairs))
+            cols = np.fromiter((index[j] for _, j in pairs), dtype=np.intp, count=len(pairs))
+            shared._matrix[rows, cols] = np.fromiter(pairs.values(), dtype=np.float64, count=len(pairs))
+        return shared
+
+    def _lookup(self, key):
+        if key in self._local:
+            return self._local[key]
+        try:
+            i, j = key
+            value = self._matrix[self._index[i], self._index[j]]
+        except (KeyError, TypeError, ValueError):
+            raise KeyError(key) from None
+        if value != value:  # NaN: coppia assente
+            raise KeyError(key)
+        return float(value)
+
+    def __getitem__(self, key):
+        return self._lookup(key)
+
+    def get(self, key, default=None):
+        try:
+            return self._lookup(key)
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self._lookup(key)
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, key, value):
+        self._local[key] = value
+
+    def __reduce__(self):
+        # Nei processi figli viaggiano solo il nome del blocco e la mappa degli indici
+        return _attach_tau, (self._shm.name, self._index, self._local)
+
+    def close(self):
+        self._matrix = None
+        self._shm.close()
+
+    def unlink(self):
+        self.close()
+        self._shm.unlink()
+
+
+def _attach_tau(name, index, local):
+    return SharedTau(_attach(name), index, local)
+
+
+class SharedObject:
+    """
+    Oggetto Python serializzato una sola volta in un blocco di memoria condivisa.
+    Ogni chiamata a load() ne restituisce una copia privata e indipendente: è il
+    modo per dare a ogni configurazione uno stato nuovo (operatori, richieste, ...)
+    senza rileggere i file e senza che le modifiche passino da un processo all'altro.
+    """
+
+    def __init__(self, shm, size):
+        self._shm = shm
+        self._size = size
+
+    @classmethod
+    def create(cls, obj):
+        payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        shm = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+        shm.buf[:len(payload)] = payload
+        return cls(shm, len(payload))
+
+    def load(self):
+        return pickle.loads(self._shm.buf[:self._size])
+
+    def __reduce__(self):
+        return _attach_object, (self._shm.name, self._size)
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _attach_object(name, size):
+    return SharedObject(_attach(name), size)
@@ -0,0 +1,87 @@
+# Turni lavorati da ogni operatore per giorno e priorità degli operatori, in forma vettoriale
+
+import numpy as np
+
+from utils import parse_time_to_minutes
+
+# Una richiesta appartiene al turno di mattina se inizia prima delle 12:30,
+# al pomeriggio se inizia dalle 16:00 (come in update_operator_shift_counts)
+MORNING_END = 12 * 60 + 30
+AFTERNOON_START = 16 * 60
+DAYS = 7
+
+
+class ShiftState:
+    """
+    Flag mattina/pomeriggio di ogni operatore per ciascuno dei 7 giorni, in due array
+    booleani (operatori x giorni) aggiornati con commit() quando le assegnazioni di
+    una sessione vengono consolidate. Da questi flag single_shift_requests,
+    double_shift_requests, SSRo, DSRo e priority di tutti gli operatori si ottengono
+    con poche operazioni vettoriali, senza scorrere Lo e rileggere gli orari.
+    """
+
+    def __init__(self, operators):
+        self.index = {op["id"]: i for i, op in enumerate(operators)}
+        self.Ho = np.array([op["Ho"] for op in operators], dtype=float)
+        self.morning = np.zeros((len(operators), DAYS), dtype=bool)
+        self.afternoon = np.zeros((len(operators), DAYS), dtype=bool)
+        for op in operators:
+            self.commit(op, op.get("Lo", []))
+
+    def commit(self, op, new_assignments):
+        """
+        Registra le coppie (richiesta, b_i) aggiunte a Lo dell'operatore.
+        """
+        i = self.index[op["id"]]
+        for req, _ in new_assignments:
+            begin = parse_time_to_minutes(req["min_time_begin"])
+            if begin < MORNING_END:
+                self.morning[i, req["day"]] = True
+            if begin >= AFTERNOON_START:
+                self.afternoon[i, req["day"]] = True
+
+    def shift_counts(self):
+        """
+        :return: (single_shift_requests, double_shift_requests): giorni con un solo turno
+                 e giorni con entrambi i turni di ogni operatore.
+        """
+        single = np.count_nonzero(self.morning ^ self.afternoon, axis=1)
+        double = np.count_nonzero(self.morning & self.afternoon, axis=1)
+        return single, double
+
+    def priorities(self, epsilon, day, session):
+        """
+        SSRo, DSRo e priority di ogni operatore, come update_operator_priority: nella
+        sessione pomeridiana gli operatori che hanno lavorato la mattina dello stesso
+        giorno passerebbero da un turno singolo a un turno doppio.
+
+        :return: (single, double, SSRo, DSRo, priority), array allineati agli operatori.
+        """
+        single, double = self.shift_counts()
+        active = self.Ho != 0
+        Ho = np.where(active, self.Ho, 1)
+        ssro = single * 60 * 5 / Ho
+        dsro = double * 60 * 7.5 / Ho
+        ssro_guess = (single + 1) * 60 * 5 / Ho
+        priority = epsilon * ssro_guess + (1 - epsilon) * dsro
+        if session != "m":
+            worked_morning = self.morning[:, day]
+            dsro_guess = (double + 1) * 60 * 7.5 / Ho
+            ssro_back = (single - 1) * 60 * 5 / Ho
+            priority = np.where(worked_morning, epsilon * ssro_back + (1 - epsilon) * dsro_guess, priority)
+        return (single, double, np.where(active, ssro, 0), np.where(active, dsro, 0),
+                np.where(active, priority, 0))
+
+    def update_operators(self, operators, epsilon, day, session):
+        """
+        Scrive single_shift_requests, double_shift_requests, SSRo, DSRo e priority negli
+        operatori e li restituisce ordinati per priority crescente (ordinamento stabile).
+        """
+        single, double, ssro, dsro, priority = self.priorities(epsilon, day, session)
+        for i, op in enumerate(operators):
+            op["single_shift_requests"] = int(single[i])
+            op["double_shift_requests"] = int(double[i])
+            op["SSRo"] = float(ssro[i])
+            op["DSRo"] = float(dsro[i])
+            op["priority"] = float(priority[i])
+        return [operators[i] for i in np.argsort(priority, kind="stable")]
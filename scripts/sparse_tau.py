@@ -0,0 +1,262 @@
+# Tempi di viaggio sparsi: esatti per i k vicini più prossimi e per le case degli operatori, stimati per le altre coppie
+
+import csv
+import math
+
+import numpy as np
+
+from cluster_assignment import OPERATOR_TAU_OFFSET
+
+EARTH_RADIUS_KM = 6371.0
+
+# Vicini più prossimi di default per nodo
+DEFAULT_K = 20
+
+
+def tau_coordinates(patients, operators):
+    """
+    Coordinate dei nodi di tau: i pazienti con il proprio id, le case degli operatori
+    con id + OPERATOR_TAU_OFFSET (come in cluster_assignment).
+
+    :return: (coordinate {nodo: (lat, lon)}, lista dei nodi delle case degli operatori).
+    """
+    coords = {p["id"]: (p["lat"], p["lon"]) for p in patients}
+    hubs = []
+    for op in operators:
+        node = op["id"] + OPERATOR_TAU_OFFSET
+        coords[node] = (op["lat"], op["lon"])
+        hubs.append(node)
+    return coords, hubs
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Distanza in linea d'aria in km (anche su array numpy).
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class SparseTau:
+    """
+    Tempi di viaggio per istanze con troppi nodi per la matrice completa, con la stessa
+    interfaccia di lettura del dizionario {(i, j): tempo} (come SharedTau):
+      - tempi esatti da ogni nodo verso i suoi k vicini più prossimi (in linea d'aria),
+        in forma CSR (indptr, indices ordinati per riga, data);
+      - tempi esatti da e verso le case degli operatori (hub) per tutti i nodi;
+      - per le altre coppie (o se il tempo esatto non è disponibile) una stima
+        a + b * distanza_km, con a e b calibrati ai minimi quadrati sulle coppie esatte.
+
+    La memoria è O(N·k + N·H), con H il numero di hub. Le scritture (es. le chiavi
+    ('h', id_paziente) aggiunte da GRS) restano in un dizionario locale.
+    """
+
+    def __init__(self, nodes, lat, lon, indptr, indices, data, hubs, hub_out, hub_in, calibration=(0.0, 0.0),
+                 local=None):
+        self.nodes = np.asarray(nodes)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.hubs = np.asarray(hubs)
+        self.hub_out = hub_out
+        self.hub_in = hub_in
+        self.calibration = tuple(float(c) for c in calibration)
+        self._index = {node: idx for idx, node in enumerate(self.nodes.tolist())}
+        self._hub_pos = {node: pos for pos, node in enumerate(self.hubs.tolist())}
+        self._local = dict(local) if local else {}
+
+    @classmethod
+    def _structure(cls, coords, k, hubs):
+        """
+        Struttura vuota (tempi NaN): vicini più prossimi di ogni nodo con un KD-tree
+        sulle coordinate proiettate (equirettangolare, in km).
+        """
+        from scipy.spatial import cKDTree
+
+        nodes = np.array(sorted(coords))
+        lat = np.array([coords[node][0] for node in nodes.tolist()], dtype=np.float64)
+        lon = np.array([coords[node][1] for node in nodes.tolist()], dtype=np.float64)
+        n = len(nodes)
+        k = min(k, n)
+
+        lat0 = np.radians(lat.mean()) if n else 0.0
+        points = np.column_stack((np.radians(lon) * np.cos(lat0), np.radians(lat))) * EARTH_RADIUS_KM
+        # k + 1: il nodo stesso è il primo vicino
+        _, neighbours = cKDTree(points).query(points, k=min(k + 1, n))
+        neighbours = np.sort(np.asarray(neighbours, dtype=np.int32).reshape(n, -1), axis=1)
+
+        indptr = np.arange(0, neighbours.size + 1, neighbours.shape[1], dtype=np.int64)
+        indices = neighbours.ravel()
+        data = np.full(indices.size, np.nan, dtype=np.float32)
+        hub_out = np.full((len(hubs), n), np.nan, dtype=np.float32)
+        hub_in = np.full((n, len(hubs)), np.nan, dtype=np.float32)
+        return cls(nodes, lat, lon, indptr, indices, data, list(hubs), hub_out, hub_in)
+
+    @classmethod
+    def build(cls, coords, travel_time, k=DEFAULT_K, hubs=()):
+        """
+        Costruisce il grafo chiedendo a travel_time(i, j) solo i tempi delle coppie
+        conservate: O(N·k + N·H) chiamate invece di N². travel_time può essere ad
+        esempio un servizio di routing; se solleva KeyError la coppia viene stimata.
+        """
+        sparse = cls._structure(coords, k, hubs)
+        nodes = sparse.nodes.tolist()
+        for a, i in enumerate(nodes):
+            for pos in range(sparse.indptr[a], sparse.indptr[a + 1]):
+                sparse.data[pos] = _try(travel_time, i, nodes[sparse.indices[pos]])
+        for h, hub in enumerate(sparse.hubs.tolist()):
+            for b, j in enumerate(nodes):
+                sparse.hub_out[h, b] = _try(travel_time, hub, j)
+                sparse.hub_in[b, h] = _try(travel_time, j, hub)
+        sparse.calibrate()
+        return sparse
+
+    @classmethod
+    def from_tau(cls, tau, coords, k=DEFAULT_K, hubs=()):
+        """
+        Versione sparsa di un tau esistente ({(i, j): tempo}), es. per confrontare le stime.
+        """
+        return cls.build(coords, lambda i, j: tau[i, j], k, hubs)
+
+    @classmethod
+    def from_csv(cls, path, coords, k=DEFAULT_K, hubs=()):
+        """
+        Costruisce il grafo leggendo in streaming un CSV con colonne i, j, tau: in
+        memoria restano solo le coppie conservate, non il file completo.
+        """
+        sparse = cls._structure(coords, k, hubs)
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                sparse._store(int(row["i"]), int(row["j"]), float(row["tau"]))
+        sparse.calibrate()
+        return sparse
+
+    def _store(self, i, j, value):
+        a, b = self._index.get(i), self._index.get(j)
+        if a is None or b is None:
+            return
+        if i in self._hub_pos:
+            self.hub_out[self._hub_pos[i], b] = value
+        if j in self._hub_pos:
+            self.hub_in[a, self._hub_pos[j]] = value
+        pos = self._position(a, b)
+        if pos is not None:
+            self.data[pos] = value
+
+    def _position(self, a, b):
+        lo, hi = self.indptr[a], self.indptr[a + 1]
+        pos = lo + int(np.searchsorted(self.indices[lo:hi], b))
+        return pos if pos < hi and self.indices[pos] == b else None
+
+    def calibrate(self):
+        """
+        Stima a + b * distanza_km ai minimi quadrati su tutte le coppie con tempo esatto
+        (vicini e hub), usata per le coppie non conservate.
+        """
+        rows = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+        hub_idx = np.array([self._index[hub] for hub in self.hubs.tolist()], dtype=np.int64)
+        n = len(self.nodes)
+        src = np.concatenate((rows, np.repeat(hub_idx, n), np.tile(np.arange(n), len(hub_idx))))
+        dst = np.concatenate((self.indices, np.tile(np.arange(n), len(hub_idx)), np.repeat(hub_idx, n)))
+        times = np.concatenate((self.data, self.hub_out.ravel(), self.hub_in.T.ravel())).astype(np.float64)
+
+        known = ~np.isnan(times) & (src != dst)
+        dist = haversine_km(self.lat[src[known]], self.lon[src[known]], self.lat[dst[known]], self.lon[dst[known]])
+        if known.sum() >= 2 and np.ptp(dist) > 0:
+            slope, intercept = np.polyfit(dist, times[known], 1)
+        elif known.any() and dist.sum() > 0:
+            intercept, slope = 0.0, times[known].sum() / dist.sum()
+        else:
+            intercept, slope = 0.0, 0.0
+        self.calibration = (float(intercept), float(slope))
+        return self.calibration
+
+    def estimate(self, i, j):
+        """
+        Stima geometrica calibrata del tempo da i a j.
+        """
+        a, b = self._index[i], self._index[j]
+        return self._estimate(a, b)
+
+    def _estimate(self, a, b):
+        if a == b:
+            return 0.0
+        intercept, slope = self.calibration
+        lat1, lon1, lat2, lon2 = map(math.radians, (self.lat[a], self.lon[a], self.lat[b], self.lon[b]))
+        h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return max(0.0, intercept + slope * 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h)))
+
+    def _exact(self, i, j, a, b):
+        if i in self._hub_pos:
+            return self.hub_out[self._hub_pos[i], b]
+        if j in self._hub_pos:
+            return self.hub_in[a, self._hub_pos[j]]
+        pos = self._position(a, b)
+        return np.nan if pos is None else self.data[pos]
+
+    def is_exact(self, key):
+        i, j = key
+        a, b = self._index[i], self._index[j]
+        value = self._exact(i, j, a, b)
+        return value == value
+
+    def _lookup(self, key):
+        if key in self._local:
+            return self._local[key]
+        try:
+            i, j = key
+            a, b = self._index[i], self._index[j]
+        except (KeyError, TypeError, ValueError):
+            raise KeyError(key) from None
+        value = self._exact(i, j, a, b)
+        if value != value:  # NaN: coppia non conservata
+            return self._estimate(a, b)
+        return float(value)
+
+    def __getitem__(self, key):
+        return self._lookup(key)
+
+    def get(self, key, default=None):
+        try:
+            return self._lookup(key)
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self._lookup(key)
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, key, value):
+        self._local[key] = value
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.nodes, self.lat, self.lon, self.indptr, self.indices, self.data,
+                                              self.hub_out, self.hub_in))
+
+    def save(self, path):
+        """
+        Salva il grafo in un file .npz (le chiavi locali non vengono salvate).
+        """
+        np.savez_compressed(path, nodes=self.nodes, lat=self.lat, lon=self.lon, indptr=self.indptr,
+                            indices=self.indices, data=self.data, hubs=self.hubs, hub_out=self.hub_out,
+                            hub_in=self.hub_in, calibration=np.array(self.calibration))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f["nodes"], f["lat"], f["lon"], f["indptr"], f["indices"], f["data"], f["hubs"],
+                       f["hub_out"], f["hub_in"], tuple(f["calibration"]))
+
+
+def _try(travel_time, i, j):
+    try:
+        return travel_time(i, j)
+    except KeyError:
+        return np.nan
@@ -1,9 +1,18 @@
 # file con funzioni di utilità per la tesi
 
+from diagnostics import log
+
 ###############################################################################
 # Funzioni di setup dei turni
 ###############################################################################
 
+# Inizio e fine di ciascuna sessione in minuti: mattina 7:00-12:30, pomeriggio 16:00-22:00
+# (la fine include i 30 minuti di overtime ammessi)
+SESSION_BOUNDS = {
+    'm': (420, 750),
+    'a': (960, 1320),
+}
+
 # POMERIGGIO
 def set_operator_state_afternoon(operator):
     """
@@ -42,51 +51,24 @@ def set_operator_state_morning(operator):
 def update_operator_shift_counts(operators):
     """
     Calcola o aggiorna single_shift_requests e double_shift_requests
-    per ogni operatore in base alle informazioni correnti
-    (e.g. operator['worked_morning'], operator['worked_after_11:30am'], ecc.).
-    """
-    for op in operators:
-        op['single_shift_requests'] = 0
-        op['double_shift_requests'] = 0
-        for d in range(7):
-            req_o = [req  for (req, _) in op['Lo'] if req['day'] == d]
-            o_worked_morning = any(parse_time_to_minutes(req['min_time_begin']) < 12*60 + 30 for req in req_o)
-            o_worked_afternoon = any(parse_time_to_minutes(req['min_time_begin']) >= 16*60 for req in req_o)
-            if o_worked_morning or o_worked_afternoon:
-                if o_worked_morning and o_worked_afternoon:
-                    op['double_shift_requests'] += 1
-                else:
-                    op['single_shift_requests'] += 1
+    per ogni operatore in base alle richieste in Lo: per ogni giorno, un turno singolo
+    se l'operatore ha lavorato solo di mattina (inizio prima delle 12:30) o solo di
+    pomeriggio (inizio dalle 16:00), un turno doppio se ha lavorato in entrambi.
+    method_overview mantiene gli stessi flag in modo incrementale con ShiftState.
+    """
+    from shift_state import ShiftState
+    single, double = ShiftState(operators).shift_counts()
+    for i, op in enumerate(operators):
+        op['single_shift_requests'] = int(single[i])
+        op['double_shift_requests'] = int(double[i])
             
 
 def update_operator_priority(operators, epsilon, day, session):
     """
-    Aggiorna SSRo, DSRo e priority in base ai campi single_shift_requests e double_shift_requests.
-    """
-    for op in operators:
-        if op["Ho"] == 0:
-            op['SSRo'] = 0
-            op['DSRo'] = 0
-            op['priority'] = 0
-            continue
-        
-        op['SSRo'] = (op['single_shift_requests'] * 60 * 5) / op["Ho"]
-        op['DSRo'] = (op.get('double_shift_requests', 0) * 60 *7.5) / op["Ho"]
-
-        if session == "m":
-            ssro_guess = ((op['single_shift_requests'] + 1) * 60 * 5) / op["Ho"]
-            op['priority'] = epsilon * ssro_guess + (1 - epsilon) * op['DSRo']  
-        else:
-            #Check if op has worked in the morning
-            req_o = [req  for (req, _) in op['Lo'] if req['day'] == day]
-            o_worked_morning = any(parse_time_to_minutes(req['min_time_begin']) < 12*60 + 30 for req in req_o)
-            if o_worked_morning:
-                dsro_guess = ((op['double_shift_requests'] + 1) * 60 * 7.5) / op["Ho"]
-                ssro_guess = ((op['single_shift_requests'] - 1) * 60 * 5) / op["Ho"]
-                op['priority'] = epsilon * ssro_guess + (1 - epsilon) * dsro_guess 
-            else:
-                ssro_guess = ((op['single_shift_requests'] + 1) * 60 * 5) / op["Ho"]
-                op['priority'] = epsilon * ssro_guess + (1 - epsilon) * op['DSRo']
+    Aggiorna SSRo, DSRo e priority in base ai turni lavorati in Lo (vedi ShiftState.priorities).
+    """
+    from shift_state import ShiftState
+    ShiftState(operators).update_operators(operators, epsilon, day, session)
 
     
 
@@ -142,66 +124,109 @@ def display_assignments(assignments, operators):
     Mostra i risultati dell'assegnazione delle richieste agli operatori."
     """
     import pandas as pd
+    from kpi_accumulator import operator_registry
+    registry = operator_registry(operators)
     data = []
     for op_id, req_list in assignments.items():
         data.append({
             "Operator ID": op_id,
-            "Name": next(op["name"] for op in operators if op["id"] == op_id),
-            "Surname": next(op["surname"] for op in operators if op["id"] == op_id),
+            "Name": registry[op_id]["name"],
+            "Surname": registry[op_id]["surname"],
             "Num Requests": len(req_list),
             "Request IDs": ", ".join(req_list)
         })
     df = pd.DataFrame(data)
     return df
 
-def display_assignments_with_shifts(operators):
+# Colonne in minuti di operator_table e corrispondenti colonne "H:MM" di display_assignments_with_shifts
+TIME_COLUMNS = {
+    "Total Hours Worked_minutes": "Total Hours Worked",
+    "Max Weekly Hours_minutes": "Max Weekly Hours",
+    "Road Time_minutes": "Road Time",
+    "Waiting Time_minutes": "Waiting Time",
+    "Overtime_minutes": "Overtime",
+}
+
+
+def operator_table(operators):
+    """
+    Tabella in memoria dello stato finale degli operatori, da cui vengono prodotti
+    global_assignments, le statistiche globali e i grafici senza rileggere i CSV.
+
+    Colonne: Operator ID, Name, Surname, Assigned Requests (id separati da virgola),
+    Num Requests, Assigned Service_minutes (somma delle durate delle richieste in Lo)
+    e le colonne in minuti di TIME_COLUMNS (wo, Ho, road_time, do e overtime
+    max(0, wo - Ho)), arrotondate al minuto come nei valori "H:MM" dei CSV.
+    """
+    import numpy as np
+    import pandas as pd
+
+    n_requests = np.fromiter((len(op["Lo"]) for op in operators), dtype=int, count=len(operators))
+    durations = np.fromiter((req["duration"] for op in operators for req, _ in op["Lo"]), dtype=float,
+                            count=int(n_requests.sum()))
+    assigned_service = np.bincount(np.repeat(np.arange(len(operators)), n_requests), weights=durations,
+                                   minlength=len(operators))
+
+    def minutes(field):
+        return np.array([op[field] for op in operators], dtype=float)
+
+    worked, max_hours = minutes("wo"), minutes("Ho")
+    return pd.DataFrame({
+        "Operator ID": [op["id"] for op in operators],
+        "Name": [op["name"] for op in operators],
+        "Surname": [op["surname"] for op in operators],
+        "Assigned Requests": [", ".join(str(x[0]["id"]) for x in op["Lo"]) for op in operators],
+        "Num Requests": n_requests,
+        "Assigned Service_minutes": assigned_service,
+        "Total Hours Worked_minutes": np.rint(worked).astype(int),
+        "Max Weekly Hours_minutes": np.rint(max_hours).astype(int),
+        "Road Time_minutes": np.rint(minutes("road_time")).astype(int),
+        "Waiting Time_minutes": np.rint(minutes("do")).astype(int),
+        "Overtime_minutes": np.rint(np.maximum(0, worked - max_hours)).astype(int),
+    })
+
+
+def display_assignments_with_shifts(operators, table=None):
     """
     Costruisce un DataFrame che mostra, per ciascun operatore:
     - Quante richieste ha fatto al mattino
     - Quante richieste ha fatto al pomeriggio
     - Il totale di minuti (o ore) lavorati in settimana
     - L'elenco di ID richieste mattina/pomeriggio
-    """
 
-    import pandas as pd
-    data = []
-    for op in operators:
-        overtime = max(0, op["wo"] - op["Ho"])
-        data.append({
-            "Operator ID": op["id"],
-            "Name": op["name"],
-            "Surname": op["surname"],
-            "Assigned Requests": ", ".join(str(x[0]["id"]) for x in op["Lo"]),
-            "Num Requests": len(op["Lo"]),
-            "Total Hours Worked": parse_minutes_to_hours(op["wo"]),
-            "Max Weekly Hours": parse_minutes_to_hours(op["Ho"]),
-            "Road Time": parse_minutes_to_hours(op["road_time"]),
-            "Waiting Time": parse_minutes_to_hours(op["do"]),
-            "Overtime": parse_minutes_to_hours(overtime) if overtime else "No overtime",
-        })
-    return pd.DataFrame(data)
+    :param table: operator_table(operators), se già calcolata.
+    """
+    if table is None:
+        table = operator_table(operators)
+    df = table[["Operator ID", "Name", "Surname", "Assigned Requests", "Num Requests"]].copy()
+    for minutes_column, column in TIME_COLUMNS.items():
+        df[column] = table[minutes_column].map(parse_minutes_to_hours)
+    df["Overtime"] = df["Overtime"].where(table["Overtime_minutes"] > 0, "No overtime")
+    return df
 
-def display_session_statistics(operators, baseline_operators, assigned_requests, unassigned_requests):
+def display_session_statistics(kpi, session, assigned_requests, unassigned_requests):
     """
-    Calcola le statistiche globali dai dati dei singoli operatori:
+    Calcola le statistiche della sessione dai totali del KPIAccumulator:
       - Assigned Requests Session: somma delle richieste assegnate nella sessione (lunghezza di op["Lo"])
       - Unsatisfied Requests: differenza tra il totale delle richieste in ingresso e quelle assegnate
       - Total Waiting Time: somma totale del waiting time (in formato H:MM)
       - Total Road Time: somma dei tempi di spostamento
       - Average Waiting Time: media dei waiting time degli operatori
       - Average Road Time: media dei road time degli operatori
+      - Total Overtime: somma di overtime_minutes degli operatori nella sessione
     """
     import pandas as pd
 
-    total_waiting = sum(op["do"] for op in operators) - sum(op["do"] for op in baseline_operators)
-    total_road = sum(op["road_time"] for op in operators) - sum(op["road_time"] for op in baseline_operators)
-    avg_waiting = total_waiting / len(operators) if operators else 0
-    avg_road = total_road / len(operators) if operators else 0
-    overtime_minutes = sum(op["overtime_minutes"] for op in operators)
+    totals = kpi.session(session)
+    total_waiting = totals["waiting"]
+    total_road = totals["road"]
+    avg_waiting = total_waiting / len(kpi) if len(kpi) else 0
+    avg_road = total_road / len(kpi) if len(kpi) else 0
+    overtime_minutes = totals["overtime"]
 
     
     # Calcola il totale delle ore lavorate
-    total_hours_worked = sum(op["wo"] for op in operators) - sum(op["wo"] for op in baseline_operators)
+    total_hours_worked = totals["worked"]
 
     stats = {
         "Assigned Requests": len(assigned_requests),
@@ -216,9 +241,10 @@ def display_session_statistics(operators, baseline_operators, assigned_requests,
     return pd.DataFrame([stats])
 
 
-def display_global_statistics(operators, total_cost, total_overtime_cost, total_routing_cost, requests):
+def display_global_statistics(operators, total_cost, total_overtime_cost, total_routing_cost, requests, kpi=None):
     """
-    Calcola le statistiche globali dai dati dei singoli operatori:
+    Calcola le statistiche globali dai dati dei singoli operatori, oppure dai totali
+    del KPIAccumulator kpi della pianificazione se specificato:
       - Assigned Requests: somma delle richieste assegnate (lunghezza di op["Lo"])
       - Unsatisfied Requests: differenza tra il totale delle richieste in ingresso e quelle assegnate
       - Total Waiting Time: somma totale del waiting time (in formato H:MM)
@@ -227,25 +253,24 @@ def display_global_statistics(operators, total_cost, total_overtime_cost, total_
       - Average Road Time: media dei road time degli operatori
     """
     import pandas as pd
-    assigned_requests = sum(len(op["Lo"]) for op in operators)
-    total_waiting = sum(op["do"] for op in operators)
-    total_road = sum(op["road_time"] for op in operators)
-    avg_waiting = total_waiting / len(operators) if operators else 0
-    avg_road = total_road / len(operators) if operators else 0
+    if kpi is None:
+        from kpi_accumulator import KPIAccumulator
+        kpi = KPIAccumulator(operators)
+    totals = kpi.week_totals
+    assigned_requests = totals["requests"]
+    total_waiting = totals["waiting"]
+    total_road = totals["road"]
+    avg_waiting = total_waiting / len(kpi) if len(kpi) else 0
+    avg_road = total_road / len(kpi) if len(kpi) else 0
 
     
-    total_overtime = sum(max(0, op["wo"] - op["Ho"]) for op in operators)
-    total_hours_worked = sum(op["wo"] for op in operators)
+    total_overtime = sum(max(0, op_totals["worked"] - kpi.registry[op_id]["Ho"])
+                         for op_id, op_totals in kpi.operator_totals.items())
+    total_hours_worked = totals["worked"]
 
     # Calcolo del rapporto di occupazione
-    requests_map = { str(r["id"]): r["duration"] for r in requests }
     total_service_time = sum(r["duration"] for r in requests)
-    assigned_service_time = 0
-    for op in operators:
-        for (req, _) in op.get("Lo", []):
-            req_id = str(req.get("id", ""))
-            if req_id in requests_map:
-                assigned_service_time += requests_map[req_id]
+    assigned_service_time = totals["service"]
     
     occupation_ratio = (assigned_service_time / total_service_time * 100) if total_service_time > 0 else 0
 
@@ -306,25 +331,25 @@ def save_statistics(variant_name, day, session, k, cost_ds, total_cost, global_s
     assignments_df.to_csv(assignments_csv, index=False)
 
 
-def save_global_statistics(operators, variant_name, total_cost, total_overtime_cost, total_routing_cost, requests, output_dir=RESULTS_DIR):
+def save_global_statistics(operators, variant_name, total_cost, total_overtime_cost, total_routing_cost, requests, output_dir=RESULTS_DIR, kpi=None):
     os.makedirs(output_dir, exist_ok=True)
-    global_stats_df = display_global_statistics(operators, total_cost, total_overtime_cost, total_routing_cost, requests)
+    global_stats_df = display_global_statistics(operators, total_cost, total_overtime_cost, total_routing_cost, requests, kpi)
     save_path = os.path.join(output_dir, f"variant_{variant_name}", f"global_statistics_variant{variant_name}.csv")
     global_stats_df.to_csv(save_path, index=False)
-    print(f"Global statistics saved to {save_path}")
+    log.info("Global statistics saved to %s", save_path)
 
-def save_global_assignments(operators, variant_name, output_dir=RESULTS_DIR):
+def save_global_assignments(operators, variant_name, output_dir=RESULTS_DIR, table=None):
     os.makedirs(output_dir, exist_ok=True)
-    assignments_df = display_assignments_with_shifts(operators)
+    assignments_df = display_assignments_with_shifts(operators, table)
     save_path = os.path.join(output_dir, f"variant_{variant_name}", f"global_assignments_variant{variant_name}.csv")
     assignments_df.to_csv(save_path, index=False)
-    print(f"Global assignments saved to {save_path}")
+    log.info("Global assignments saved to %s", save_path)
 
 
-def display_session_deltas(operators, baseline_operators):
+def display_session_deltas(kpi, session):
     """
-    Costruisce un DataFrame che mostra, per ciascun operatore, i delta ottenuti dalla
-    differenza tra lo stato attuale e quello di baseline della sessione.
+    Costruisce un DataFrame che mostra, per ciascun operatore, i delta della sessione
+    registrati nel KPIAccumulator.
     
     Le colonne sono:
       - Operator ID
@@ -335,18 +360,17 @@ def display_session_deltas(operators, baseline_operators):
     """
     import pandas as pd
     session_deltas = []
-    for op_current, op_baseline in zip(operators, baseline_operators):
-        baseline_ids = {req[0]["id"] for req in op_baseline["Lo"]}
-        new_assigned = [req for req in op_current["Lo"] if req[0]["id"] not in baseline_ids]
+    for op_id, op in kpi.registry.items():
+        op_delta = kpi.operator_session(session, op_id)
         delta = {
-            "Operator ID": op_current["id"],
-            "Name": op_current["name"],
-            "Surname": op_current["surname"],
-            "Assigned Requests": ", ".join(str(req[0]["id"]) for req in new_assigned),
-            "Num Requests": len(new_assigned),
-            "Working Time": parse_minutes_to_hours(op_current["wo"] - op_baseline["wo"]),
-            "Waiting Time": parse_minutes_to_hours(op_current["do"] - op_baseline["do"]),
-            "Road Time": parse_minutes_to_hours(op_current["road_time"] - op_baseline["road_time"])
+            "Operator ID": op_id,
+            "Name": op["name"],
+            "Surname": op["surname"],
+            "Assigned Requests": ", ".join(str(req_id) for req_id in op_delta["ids"]),
+            "Num Requests": op_delta["requests"],
+            "Working Time": parse_minutes_to_hours(op_delta["worked"]),
+            "Waiting Time": parse_minutes_to_hours(op_delta["waiting"]),
+            "Road Time": parse_minutes_to_hours(op_delta["road"])
         }
         session_deltas.append(delta)
     return pd.DataFrame(session_deltas)
@@ -395,6 +419,7 @@ def plot_time_distributions(df, variant_name, output_dir=RESULTS_DIR, show_plot=
     Ogni grafico viene salvato nella cartella della variante con l'asse x etichettato rispettivamente:
       "Overtime", "Waiting Time" e "Road Time"
     Se show_plot è True, il grafico viene mostrato a schermo.
+    df è normalmente operator_table, che contiene già le colonne in minuti.
     """
     import matplotlib.pyplot as plt
     import os
@@ -435,7 +460,7 @@ def plot_time_distributions(df, variant_name, output_dir=RESULTS_DIR, show_plot=
 
             save_path = os.path.join(variant_dir, filename)
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
-            print(f"{filename} salvato in {save_path}")
+            log.info("%s salvato in %s", filename, save_path)
             
             if show_plot:
                 plt.show()
@@ -444,14 +469,14 @@ def plot_time_distributions(df, variant_name, output_dir=RESULTS_DIR, show_plot=
 
             saved_paths.append(save_path)
         else:
-            print(f"ATTENZIONE: la colonna '{col_name}' non è presente nel DataFrame.")
+            log.warning("ATTENZIONE: la colonna '%s' non è presente nel DataFrame.", col_name)
 
     return saved_paths
 
 
-def calculate_and_save_stats(variant_name, requests):
+def calculate_and_save_stats(variant_name, requests, table):
     """
-    Legge il file CSV contenente gli assignments degli operatori e calcola le statistiche globali:
+    Calcola le statistiche globali dalla tabella degli operatori (operator_table):
       - Assigned Requests: somma dei Num Requests
       - Total Waiting Time: somma dei Waiting Time
       - Total Road Time: somma dei Road Time
@@ -462,45 +487,27 @@ def calculate_and_save_stats(variant_name, requests):
       - Overtime Cost: Total Overtime in minuti * 0.29
       - Total Overtime: somma degli Overtime
       - Total Hours Worked: somma dei Total Hours Worked
-      - Occupation Ratio: (Total Hours Worked / Max Weekly Hours_totali) * 100
-     
-    I tempi sono espressi nel formato "HH:MM" (oppure "No overtime", interpretato come 0).
-    Il file CSV viene letto da:
-      RESULTS_DIR/variant_{variant_name}/global_assignments_{variant_name}.csv
+      - Occupation Ratio: durata delle richieste assegnate / durata di tutte le richieste * 100
+
+    I tempi sono riportati nel formato "H:MM".
     La statistica risultante viene salvata come file CSV
-      RESULTS_DIR/variant_{variant_name}/stats_{variant_name}.csv
+      RESULTS_DIR/variant_{variant_name}/global_statistics_{variant_name}.csv
+
+    :param table: operator_table degli operatori al termine della pianificazione.
+    :return: dizionario delle statistiche.
     """
-    import os
+    import numpy as np
     import pandas as pd
 
-    csv_path = os.path.join(RESULTS_DIR,
-                            f"variant_{variant_name}",
-                            f"global_assignments_{variant_name}.csv")
-    
-    if not os.path.exists(csv_path):
-        print(f"Il file {csv_path} non esiste.")
-        return
-
-    df = pd.read_csv(csv_path)
-
-    # Calcolo delle statistiche
-    total_assigned = df["Num Requests"].sum()
-
-    waiting_minutes = df["Waiting Time"].apply(time_str_to_minutes)
-    road_minutes    = df["Road Time"].apply(time_str_to_minutes)
-    overtime_minutes= df["Overtime"].apply(time_str_to_minutes)
-    worked_minutes  = df["Total Hours Worked"].apply(time_str_to_minutes)
-    max_minutes     = df["Max Weekly Hours"].apply(time_str_to_minutes)
-    
-    total_waiting = waiting_minutes.sum()
-    total_road    = road_minutes.sum()
-    total_overtime= overtime_minutes.sum()
-    total_worked  = worked_minutes.sum()
-    total_max     = max_minutes.sum()
+    totals = table[["Num Requests", "Waiting Time_minutes", "Road Time_minutes", "Overtime_minutes",
+                    "Total Hours Worked_minutes", "Assigned Service_minutes"]].sum()
+    total_waiting = totals["Waiting Time_minutes"]
+    total_road = totals["Road Time_minutes"]
+    total_overtime = totals["Overtime_minutes"]
 
-    n_ops = len(df)
+    n_ops = len(table)
     avg_waiting = total_waiting / n_ops if n_ops else 0
-    avg_road    = total_road / n_ops if n_ops else 0
+    avg_road = total_road / n_ops if n_ops else 0
 
     # Calcolo dei costi
     routing_cost  = total_road * 0.37
@@ -508,40 +515,21 @@ def calculate_and_save_stats(variant_name, requests):
     total_cost    = routing_cost + overtime_cost
 
     # Calcolo del rapporto di occupazione
-
-    requests_map = { str(r["id"]): r["duration"] for r in requests }
-    total_service_time = sum(r["duration"] for r in requests)
-    assigned_service_time = 0
-    for idx, row in df.iterrows():
-        assigned_ids = row["Assigned Requests"]
-        if pd.isna(assigned_ids) or not assigned_ids.strip():
-            continue
-        for rid in assigned_ids.split(","):
-            rid = rid.strip()
-            if rid in requests_map:
-                assigned_service_time += requests_map[rid]
-    
-    occupation_ratio = (assigned_service_time / total_service_time * 100) if total_service_time > 0 else 0
-
-    # Funzione per convertire i minuti in formato "H:MM"
-    def parse_minutes_to_hours(time_value):
-        total = int(round(time_value))
-        hours = total // 60
-        minutes = total % 60
-        return f"{hours}:{minutes:02d}"
+    total_service_time = np.fromiter((r["duration"] for r in requests), dtype=float, count=len(requests)).sum()
+    occupation_ratio = (totals["Assigned Service_minutes"] / total_service_time * 100) if total_service_time > 0 else 0
 
     stats = {
-        "Assigned Requests": total_assigned,
+        "Assigned Requests": int(totals["Num Requests"]),
         "Total Waiting Time": parse_minutes_to_hours(total_waiting),
         "Total Road Time": parse_minutes_to_hours(total_road),
         "Average Waiting Time": parse_minutes_to_hours(avg_waiting),
         "Average Road Time": parse_minutes_to_hours(avg_road),
-        "Total Cost": round(total_cost, 2),
-        "Routing Cost": round(routing_cost, 2),
-        "Overtime Cost": round(overtime_cost, 2),
+        "Total Cost": round(float(total_cost), 2),
+        "Routing Cost": round(float(routing_cost), 2),
+        "Overtime Cost": round(float(overtime_cost), 2),
         "Total Overtime": parse_minutes_to_hours(total_overtime),
-        "Total Hours Worked": parse_minutes_to_hours(total_worked),
-        "Occupation Ratio": round(occupation_ratio, 2)
+        "Total Hours Worked": parse_minutes_to_hours(totals["Total Hours Worked_minutes"]),
+        "Occupation Ratio": round(float(occupation_ratio), 2)
     }
 
     # Salva le statistiche in un CSV
@@ -551,7 +539,8 @@ def calculate_and_save_stats(variant_name, requests):
                                f"global_statistics_{variant_name}.csv")
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     stats_df.to_csv(output_file, index=False)
-    print(f"Statistiche salvate in {output_file}")
+    log.info("Statistiche salvate in %s", output_file)
+    return stats
 
 
 def save_operator_scheduling(operators, baseline_operators, tau, variant_name, day, session, patients):
@@ -577,145 +566,28 @@ def save_operator_scheduling(operators, baseline_operators, tau, variant_name, d
       - Tau viene letto dal dizionario tau, utilizzando come chiave la coppia
           (previous_location_id, current_request_project_id)
       - Waiting_time si calcola come: current_b_i - (previous_b_i + previous_t_i)
+
+    Versione sincrona: le righe vengono salvate nello store della variante (ScheduleStore)
+    e i file di testo scritti subito. method_overview usa invece SchedulingWriter
+    (scheduling_writer.py), che salva nello store in un thread in background.
     """
-    import os
-    # from utils import RESULTS_DIR # Se definito in utils
-
-    base_sched_dir = os.path.join(RESULTS_DIR, f"variant_{variant_name}", "scheduling", f"day_{day}", f"session_{session}")
-    os.makedirs(base_sched_dir, exist_ok=True)
-
-    for op, base_op in zip(operators, baseline_operators):
-        # Ottieni gli ID delle richieste nel baseline per un confronto rapido
-        base_ids = {assignment[0].get("id") for assignment in base_op.get("Lo", []) if assignment and assignment[0]}
-        
-        # Filtra le nuove assegnazioni, assicurandosi che siano valide
-        new_assignments = []
-        for assignment in op.get("Lo", []):
-            if assignment and assignment[0] and assignment[0].get("id") not in base_ids:
-                 # Assicurati che ci siano anche b_i (secondo elemento della tupla)
-                if len(assignment) > 1:
-                    new_assignments.append(assignment)
-                else:
-                    print(f"Attenzione: Assegnazione malformata per Op {op['id']}: {assignment}")
-
-
-        # Costruisce il nome del file per l'operatore: es. scheduling_Sm_Op0.txt
-        filename = f"scheduling_S{session}_Op{op['id']}.txt"
-        file_path = os.path.join(base_sched_dir, filename)
-
-        with open(file_path, "w") as f_out:
-            op_id = op.get('id', 'N/A')
-            op_lat = op.get('lat', 'N/A')
-            op_lon = op.get('lon', 'N/A')
-            header = f"Operatore ID: {op_id}, Coordinate Operatore: {op_lat}, {op_lon}\n\n"
-            f_out.write(header)
-
-            if not new_assignments:
-                f_out.write("Nessuna nuova richiesta assegnata in questa sessione\n")
-            else:
-                # La posizione di partenza è quella attuale dell'operatore all'inizio della sessione
-                # Se non c'è 'current_patient_id', potresti dover usare un ID speciale per la base/deposito
-                # o gestire diversamente il primo tau. Qui assumiamo che sia presente o sia una stringa vuota/None
-                # gestita correttamente nella matrice tau.
-                # Usiamo l'ID dell'operatore o un ID di deposito se non c'è current_patient_id?
-                # Decidiamo di usare l'ID del progetto dell'ultima richiesta servita PRIMA di questa sessione,
-                # che dovrebbe essere in op['current_patient_id']. Se non c'è, significa che parte da "casa"
-                # o che è la primissima assegnazione in assoluto. La matrice tau dovrebbe gestire la chiave
-                # (id_partenza_operatore, id_prima_richiesta).
-                previous_location_id = op.get("current_patient_id") # Potrebbe essere None o un ID
-                # Se non c'è una locazione precedente, potremmo usare un ID speciale tipo 'depot' o l'ID operatore
-                if previous_location_id is None:
-                    # Questo dipende da come è costruita la tua matrice tau
-                    # Potrebbe essere l'ID dell'operatore o un ID fisso per il deposito/partenza
-                     previous_location_id = f"op_{op_id}_start" # Esempio, ADATTA ALLA TUA MATRICE TAU
-                     # O più semplicemente, potresti voler stampare Tau=0 per il primo spostamento
-                     # senza cercarlo nella matrice.
-
-                previous_req_data = None
-                previous_b_i = None
-                previous_t_i = None
-
-                for i, (req, b_i) in enumerate(new_assignments):
-                    req_id = req.get("id", "N/A")
-                    project_id = req.get("project_id", "N/A") # Questo è l'ID della destinazione attuale
-
-                    # Calcola Tau per arrivare a QUESTA richiesta dalla posizione PRECEDENTE
-                    # Assicurati che gli ID usati (previous_location_id, project_id) siano chiavi valide per tau
-                    tau_key = (previous_location_id, project_id)
-                    tau_value = tau.get(tau_key, "N/A") # Metti un valore di default se la chiave non esiste
-
-                    # Calcola Waiting Time (solo se non è la prima richiesta)
-                    waiting_time = "N/A" # Default
-                    if i > 0 and previous_b_i is not None and previous_t_i is not None:
-                        try:
-                            # Assicurati che b_i, previous_b_i, previous_t_i siano numerici
-                            current_b_i_int = int(b_i)
-                            prev_finish_time = int(previous_b_i) + int(previous_t_i)
-                            waiting_time = current_b_i_int - prev_finish_time
-                            if waiting_time < 0:
-                                # Questo potrebbe indicare un problema di scheduling o nel calcolo tau
-                                print(f"Attenzione: Waiting time negativo ({waiting_time}) per Op {op_id}, Req {req_id} dopo Req {previous_req_data.get('id', 'N/A')}")
-                                waiting_time = f"ERR({waiting_time})" # Segnala l'errore nell'output
-                        except (ValueError, TypeError) as e:
-                            print(f"Errore nel calcolo del waiting time per Op {op_id}, Req {req_id}: {e}")
-                            waiting_time = "Calc Error"
-
-                    # Stampa la riga Tau/Waiting Time *PRIMA* della richiesta (tranne per la prima)
-                    # Modifica: Stampiamo Tau per tutti, anche il primo. Se Tau=0 per il primo va bene.
-                    # Stampiamo Waiting Time solo dal secondo in poi.
-                    if i == 0:
-                         # Per la prima richiesta, potresti voler mostrare solo Tau o un messaggio specifico
-                         # Dipende se il tau iniziale è significativo (es. da deposito a primo paziente)
-                         f_out.write(f"↓ Viaggio iniziale Tau: {tau_value}\n")
-                    else:
-                         f_out.write(f"↓ Tau: {tau_value} - Waiting_time: {waiting_time}\n")
-
-
-                    # Ora stampa i dettagli della richiesta corrente
-                    # Ricerca del paziente per project_id per ottenere le coordinate
-                    patient = next((p for p in patients if p.get("id") == project_id), None)
-                    if patient is not None:
-                        lat = patient.get("lat", "N/A")
-                        lon = patient.get("lon", "N/A")
-                        coord_str = f"Coordinate paziente: ({lat}, {lon})"
-                    else:
-                        coord_str = f"Coordinate paziente: (non trovate per id {project_id})"
-
-                    alpha_str = req.get("min_time_begin", "")
-                    beta_str  = req.get("max_time_begin", "")
-                    t_i_val   = req.get("duration", "N/A")
-                    
-                    # Usa la tua funzione parse_time_to_minutes se necessario
-                    alpha_min = parse_time_to_minutes(alpha_str)
-                    beta_min  = parse_time_to_minutes(beta_str)
-
-                    line_req = f"Richiesta (id: {req_id}, project_id: {project_id}, Alpha: {alpha_min}, Beta: {beta_min}, b_i: {b_i}, t_i: {t_i_val})\n"
-                    f_out.write(line_req)
-                    f_out.write(coord_str + "\n\n") # Aggiunto newline per separare meglio
-
-                    # Aggiorna le variabili per la prossima iterazione
-                    previous_location_id = project_id # La destinazione attuale diventa la partenza per il prossimo
-                    previous_req_data = req
-                    previous_b_i = b_i
-                    previous_t_i = t_i_val # Usa il valore t_i recuperato
-
-            # Non c'è più bisogno di scrivere la riga Tau/WT alla fine del loop
-
-            # Aggiungi un separatore alla fine del file per chiarezza
-            f_out.write("-- Fine scheduling sessione --\n")
-
-        print(f"Scheduling corretto salvato in: {file_path}")
-
-
-import re
+    from scheduling_writer import patient_coordinates, session_rows, snapshot_scheduling, write_scheduling
+    from schedule_store import ScheduleStore
+
+    operator_rows = session_rows(snapshot_scheduling(operators, baseline_operators, tau), *patient_coordinates(patients))
+    store = ScheduleStore(variant_name)
+    try:
+        store.write_session(day, session, operator_rows)
+    finally:
+        store.close()
+    write_scheduling(operator_rows, variant_name, day, session)
+
+
 def aggregate_weekly_schedule(operators, variant_name):
     """
-    Aggrega i file di scheduling per operatore in un unico file settimanale,
-    rilevando automaticamente i giorni (0-6) presenti e usando le sessioni 'm' e 'a'.
-    Stampa ID e coordinate dell'operatore solo una volta all'inizio del file settimanale.
-
-    Legge i file da:
-      RESULT_DIR/variant_<variant_name>/scheduling/day_<day>/session_<session>/scheduling_S<session>_Op<operator_id>.txt
+    Genera un file settimanale per operatore, con ID e coordinate dell'operatore una
+    sola volta all'inizio e le sessioni 'm' e 'a' di ogni giorno presente nello store
+    dello scheduling della variante (ScheduleStore, variant_<variant_name>/schedule.sqlite).
 
     Crea i file settimanali in:
       RESULT_DIR/variant_<variant_name>/scheduling/week/weekly_schedule_Op<operator_id>.txt
@@ -723,145 +595,27 @@ def aggregate_weekly_schedule(operators, variant_name):
     Args:
         operators (list): Una lista di dizionari, ogni dizionario rappresenta un operatore
                           e deve contenere almeno le chiavi 'id', 'lat', 'lon'.
-        variant_name (str): Il nome della variante usata per trovare le directory di input/output.
-        RESULTS_DIR (str): Il percorso della directory base dei risultati.
+        variant_name (str): Il nome della variante.
     """
-    # Mappe per rendere l'output più leggibile (giorni 0-6)
-    day_map = {
-        0: "LUNEDI", 1: "MARTEDI", 2: "MERCOLEDI", 3: "GIOVEDI", 4: "VENERDI",
-        5: "SABATO", 6: "DOMENICA"
-    }
-    # Sessioni fisse: m = morning, a = afternoon
-    sessions_to_process = ['m', 'a']
-    session_map = {
-        'm': "Mattina", 'a': "Pomeriggio"
-    }
-
-    base_scheduling_dir = os.path.join(RESULTS_DIR, f"variant_{variant_name}", "scheduling")
-    weekly_output_dir = os.path.join(base_scheduling_dir, "week")
-
-    # --- Rilevamento automatico dei giorni (0-6) ---
-    discovered_days = []
-    if not os.path.isdir(base_scheduling_dir):
-        print(f"Errore: La directory di scheduling base non esiste: {base_scheduling_dir}")
-        return
-
-    print(f"Ricerca giorni in: {base_scheduling_dir}")
-    try:
-        for entry in os.listdir(base_scheduling_dir):
-            if entry.startswith("day_") and os.path.isdir(os.path.join(base_scheduling_dir, entry)):
-                match = re.match(r"day_(\d+)", entry)
-                if match:
-                    try:
-                        day_num = int(match.group(1))
-                        # Assicurati che il giorno sia nel range atteso (opzionale, ma buono)
-                        if 0 <= day_num <= 6:
-                           discovered_days.append(day_num)
-                        else:
-                           print(f"Attenzione: Ignorata directory giorno fuori range (0-6): {entry}")
-                    except ValueError:
-                        print(f"Attenzione: Ignorata directory con formato giorno non valido: {entry}")
-    except FileNotFoundError:
-         print(f"Errore: Impossibile accedere alla directory di scheduling base: {base_scheduling_dir}")
-         return
-    except Exception as e:
-         print(f"Errore durante la scansione dei giorni in {base_scheduling_dir}: {e}")
-         return
-
-
-    if not discovered_days:
-        print(f"Nessuna directory 'day_*' (con giorni 0-6) trovata in {base_scheduling_dir}. Impossibile aggregare.")
-        return
-
-    discovered_days.sort()
-    print(f"Giorni rilevati da processare: {discovered_days}")
-    # -----------------------------------------
-
-    os.makedirs(weekly_output_dir, exist_ok=True)
-    print(f"Directory per output settimanale: {weekly_output_dir}")
+    from schedule_store import ScheduleStore
 
     if not operators:
-        print("Attenzione: La lista operatori è vuota. Nessun file settimanale verrà generato.")
+        log.warning("Attenzione: La lista operatori è vuota. Nessun file settimanale verrà generato.")
         return
 
-    for op in operators:
-        op_id = op.get('id')
-        op_lat = op.get('lat', 'N/A') # Prendi lat dall'operatore
-        op_lon = op.get('lon', 'N/A') # Prendi lon dall'operatore
-
-        if op_id is None:
-            print("Attenzione: Trovato operatore senza ID, verrà saltato.")
-            continue
-
-        weekly_filename = f"weekly_schedule_Op{op_id}.txt"
-        weekly_filepath = os.path.join(weekly_output_dir, weekly_filename)
+    store = ScheduleStore(variant_name)
+    try:
+        paths = store.render_weekly(operators)
+    finally:
+        store.close()
+    log.info("Aggregazione settimanale finale completata: %s file generati.", len(paths))
 
-        print(f"Generazione file settimanale per Operatore {op_id} in {weekly_filepath}...")
 
-        try:
-            with open(weekly_filepath, "w", encoding='utf-8') as f_weekly:
-                # Scrivi l'intestazione principale UNA SOLA VOLTA con ID e Coordinate
-                f_weekly.write(f"=== Pianificazione Settimanale Operatore ID: {op_id} ===\n")
-                f_weekly.write(f"=== Coordinate Operatore: {op_lat}, {op_lon} ===\n")
-                f_weekly.write(f"=== Variante: {variant_name} ===\n\n")
-
-                found_any_schedule_for_op = False
-                for day in discovered_days:
-                    day_name = day_map.get(day, f"Giorno {day}") # Usa la mappa 0-6
-
-                    for session in sessions_to_process:
-                        session_name = session_map.get(session, f"Sessione {session}")
-
-                        session_dir = os.path.join(base_scheduling_dir, f"day_{day}", f"session_{session}")
-                        individual_filename = f"scheduling_S{session}_Op{op_id}.txt"
-                        individual_filepath = os.path.join(session_dir, individual_filename)
-
-                        # Scrivi l'intestazione della sezione giorno/sessione
-                        f_weekly.write(f"--- {day_name} - Sessione {session_name} ---\n")
-
-                        if os.path.exists(individual_filepath):
-                            try:
-                                with open(individual_filepath, "r", encoding='utf-8') as f_individual:
-                                    full_content = f_individual.read()
-                                    # Trova la fine dell'header originale (prima occorrenza di \n\n)
-                                    header_end_pos = full_content.find('\n\n')
-
-                                    if header_end_pos != -1:
-                                        # Estrai e scrivi solo il contenuto DOPO l'header originale
-                                        schedule_content = full_content[header_end_pos + 2:]
-                                        f_weekly.write(schedule_content)
-                                    else:
-                                        # Fallback se non trova \n\n (improbabile con lo script precedente)
-                                        # Scrive tutto ma avvisa di possibile duplicato header
-                                        print(f"Attenzione: Separatore header '\\n\\n' non trovato in {individual_filepath}. Potrebbe esserci header duplicato nel file settimanale.")
-                                        f_weekly.write(full_content)
-
-                                    # Assicura uno spazio dopo il contenuto della sessione
-                                    if not schedule_content.endswith('\n\n'):
-                                         if not schedule_content.endswith('\n'):
-                                              f_weekly.write("\n\n")
-                                         else:
-                                              f_weekly.write("\n")
-                                    found_any_schedule_for_op = True
-
-                            except Exception as e:
-                                print(f"Errore durante la lettura del file {individual_filepath}: {e}")
-                                f_weekly.write(f"[Errore nella lettura del file: {individual_filename}]\n\n")
-                        else:
-                            f_weekly.write("(Nessuna assegnazione registrata per questa sessione)\n\n")
-
-                if not found_any_schedule_for_op:
-                     f_weekly.write("\n=== Nessuna assegnazione trovata per l'intera settimana ===\n")
-
-        except Exception as e:
-            print(f"Errore durante la scrittura del file settimanale {weekly_filepath}: {e}")
-
-    print("\nAggregazione settimanale finale completata.")
-
-
-def save_histograms(variant_name):
-    import numpy as np
-    import pandas as pd
+def save_histograms(variant_name, table):
+    """
+    Salva gli istogrammi del waiting time e dell'overtime degli operatori
+    (histogram_dt.png e histogram_ov.png) a partire da operator_table.
+    """
     import matplotlib.pyplot as plt
 
 
@@ -870,29 +624,9 @@ def save_histograms(variant_name):
 
 
 
-    #convert in minutes a hour format HH:MM
-    def convert_to_minutes(time):
-        time = time.split(':')
-        return int(time[0])*60 + int(time[1])
-
-
-
-
-    csv_path = os.path.join(RESULTS_DIR, f"variant_{variant_name}", f"global_assignments_variant{variant_name}.csv")
-    dt = pd.read_csv(csv_path)
-
-
-    #Check if dt['Overtime'] is "No Overtime" replace with 0
-    dt['Overtime'] = dt['Overtime'].replace('No overtime', "00:00")
-
-
-    #apply the function to convert the time in minutes
-    dt['Overtime'] = dt['Overtime'].apply(convert_to_minutes)
-    dt['Waiting Time'] = dt['Waiting Time'].apply(convert_to_minutes)
-
-    over = dt['Overtime'].to_numpy()
+    over = table['Overtime_minutes'].to_numpy()
 
-    waiting_time = dt['Waiting Time'].to_numpy()
+    waiting_time = table['Waiting Time_minutes'].to_numpy()
 
 
 
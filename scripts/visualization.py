@@ -6,16 +6,15 @@ from matplotlib.legend_handler import HandlerTuple
 from sklearn.decomposition import PCA
 from sklearn.cluster import KMeans
 
+from diagnostics import log
+
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 output_dir = os.path.join(BASE_DIR, "imgs")
 kmedoids_dir = os.path.join(output_dir, "kmedoids")
-
-# Crea le cartelle se non esistono
-for folder in [output_dir, kmedoids_dir]:
-    os.makedirs(folder, exist_ok=True)
+# Le cartelle non vengono create all'import: plot_clusters crea quella di output quando salva
 
 def plot_clusters(points, clusters, k, variant_name, d_i, s, medoid_indices=None, output_dir=None):
     """
@@ -94,6 +93,6 @@ def plot_clusters(points, clusters, k, variant_name, d_i, s, medoid_indices=None
     filepath = os.path.join(output_dir, filename)
     
     plt.savefig(filepath, dpi=300)
-    print(f"Immagine salvata in: {filepath}")
+    log.info("Immagine salvata in: %s", filepath)
     
     plt.close()
\ No newline at end of file
@@ -4,6 +4,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 from matplotlib.legend_handler import HandlerTuple
+from diagnostics import log
 from utils import RESULTS_DIR # Assicurati che questo import funzioni
 import geopandas as gpd
 import contextily as ctx
@@ -39,7 +40,7 @@ def plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, med
     medoid_indices : list or np.ndarray, optional
         Indici dei medoidi.
     """
-    print("Inizio plot con mappa...")
+    log.debug("Inizio plot con mappa...")
 
     # --- 1. Preparazione dei dati GeoDataFrame ---
     points_lonlat = points_latlon[:, [1, 0]]
@@ -49,7 +50,7 @@ def plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, med
     )
     labels = np.full(len(gdf), -1, dtype=int)
     if not clusters:
-        print("Attenzione: il dizionario 'clusters' è vuoto.")
+        log.warning("Attenzione: il dizionario 'clusters' è vuoto.")
     else:
         for cluster_id, indices in clusters.items():
             valid_indices = [idx for idx in indices if idx < len(labels)]
@@ -59,10 +60,10 @@ def plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, med
     gdf['cluster'] = labels
     unique_clusters = sorted([cid for cid in gdf['cluster'].unique() if cid != -1])
     if not unique_clusters:
-         print("Attenzione: Nessun cluster ID valido trovato nei dati.")
+         log.warning("Attenzione: Nessun cluster ID valido trovato nei dati.")
 
     # --- 2. Trasformazione delle coordinate ---
-    print("Trasformazione coordinate in Web Mercator (EPSG:3857)...")
+    log.debug("Trasformazione coordinate in Web Mercator (EPSG:3857)...")
     gdf_wm = gdf.to_crs(epsg=3857)
     points_wm = np.array([(point.x, point.y) for point in gdf_wm.geometry])
 
@@ -86,20 +87,20 @@ def plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, med
     if len(unique_clusters) == 1:
         single_cluster_id = unique_clusters[0]
         visible_color = custom_palette[0]
-        print(f"Rilevato k=1 (cluster ID: {single_cluster_id}), uso colore specifico: {visible_color}")
+        log.debug("Rilevato k=1 (cluster ID: %s), uso colore specifico: %s", single_cluster_id, visible_color)
         color_map = {single_cluster_id: visible_color}
     elif len(unique_clusters) > 1:
-        print(f"Uso la palette raccomandata 'Dark2' con {num_custom_colors} colori.")
+        log.debug("Uso la palette raccomandata 'Dark2' con %s colori.", num_custom_colors)
         color_map = {cluster_id: custom_palette[i % num_custom_colors]
                      for i, cluster_id in enumerate(unique_clusters)}
         if len(unique_clusters) > num_custom_colors:
-            print(f"Attenzione: Numero cluster ({len(unique_clusters)}) > {num_custom_colors} (colori palette), i colori si ripeteranno.")
+            log.warning("Attenzione: Numero cluster (%s) > %s (colori palette), i colori si ripeteranno.", len(unique_clusters), num_custom_colors)
 
     # Mappa i cluster ID ai colori
     point_colors = gdf_wm['cluster'].apply(lambda cid: color_map.get(cid, default_color))
 
     # Plotta punti (più grandi)
-    print(f"Plotting punti...")
+    log.debug("Plotting punti...")
     # >>> CAMBIAMENTO: Aumentata dimensione 's' <<<
     scatter = ax.scatter(points_wm[:, 0], points_wm[:, 1],
                          color=point_colors,
@@ -115,7 +116,7 @@ def plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, med
         medoid_indices_arr = np.array(medoid_indices, dtype=int)
         valid_medoid_indices = medoid_indices_arr[medoid_indices_arr < len(points_wm)]
         if len(valid_medoid_indices) > 0:
-            print("Plotting medoidi...")
+            log.debug("Plotting medoidi...")
             medoid_points_wm = points_wm[valid_medoid_indices]
             ax.scatter(medoid_points_wm[:, 0], medoid_points_wm[:, 1],
                        color='#FF0000', marker='X', s=160,
@@ -133,30 +134,30 @@ def plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, med
             x_center = (xmin + xmax) / 2
             new_xmin = x_center - required_width / 2
             new_xmax = x_center + required_width / 2
-            print(f"Forzatura limiti X: ({new_xmin:.2f}, {new_xmax:.2f}) per aspect ratio {target_aspect:.2f}")
+            log.debug("Forzatura limiti X: (%.2f, %.2f) per aspect ratio %.2f", new_xmin, new_xmax, target_aspect)
             ax.set_xlim(new_xmin, new_xmax)
             ax.set_ylim(ymin, ymax)
 
     # --- 4. Aggiunta della mappa di sfondo ---
-    print("Aggiunta basemap...")
+    log.debug("Aggiunta basemap...")
     try:
         basemap_provider = ctx.providers.OpenStreetMap.Mapnik
-        print(f"Uso provider basemap: {basemap_provider.name}")
+        log.debug("Uso provider basemap: %s", basemap_provider.name)
         with warnings.catch_warnings():
              warnings.simplefilter("ignore", UserWarning)
              ctx.add_basemap(ax, crs=gdf_wm.crs.to_string(),
                             source=basemap_provider, zoom='auto')
-        print("Basemap aggiunta con successo.")
+        log.debug("Basemap aggiunta con successo.")
         if ax.images:
              # >>> CAMBIAMENTO: Modificata opacità mappa <<<
              map_alpha_value = 0.60
              ax.images[-1].set_alpha(map_alpha_value)
-             print(f"Opacità mappa impostata a: {map_alpha_value}")
+             log.debug("Opacità mappa impostata a: %s", map_alpha_value)
         ax.set_aspect('equal', adjustable='box')
-        print("Aspect ratio dell'asse impostato a 'equal'.")
+        log.debug("Aspect ratio dell'asse impostato a 'equal'.")
     except Exception as e:
-        print(f"Errore durante il download della basemap: {e}")
-        print("Il plot verrà generato senza mappa di sfondo.")
+        log.warning("Errore durante il download della basemap: %s", e)
+        log.warning("Il plot verrà generato senza mappa di sfondo.")
 
     # --- 5. Titolo, Legenda e Stile ---
     ax.set_title(f"Clustering K={k} su Mappa (Variant: {variant_name}, Day: {d_i}, Session: {s})")
@@ -194,12 +195,12 @@ def plot_clusters_with_map(points_latlon, clusters, k, variant_name, d_i, s, med
     filename = f"cluster_map_k{k}.png"
     filepath = os.path.join(save_folder, filename)
 
-    print(f"Salvataggio immagine in: {filepath}")
+    log.debug("Salvataggio immagine in: %s", filepath)
     try:
         # >>> CAMBIAMENTO: Modificato dpi <<<
         plt.savefig(filepath, dpi=150, bbox_inches='tight', pad_inches=0.1)
-        print(f"Immagine salvata.")
+        log.info("Immagine salvata.")
     except Exception as e:
-        print(f"Errore durante il salvataggio dell'immagine: {e}")
+        log.error("Errore durante il salvataggio dell'immagine: %s", e)
     finally:
         plt.close(fig)
\ No newline at end of file
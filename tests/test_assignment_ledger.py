@@ -0,0 +1,38 @@
+import sys
+import os
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from assignment_ledger import AssignmentLedger, ASSIGNED
+from grs_variants import grs_variants
+from regret_insertion import regret_insertion
+from test_local_search import build_instance
+
+
+def scan_unassigned(operators, requests, k):
+    """
+    Richieste non assegnate calcolate come prima del registro, scorrendo Lo_k.
+    """
+    assigned = [req for op in operators for (req, _) in op["Lo_k"][k]]
+    return [r for r in requests if r not in assigned]
+
+
+def test_ledger_matches_routes():
+    for engine in (grs_variants, regret_insertion):
+        for seed in range(5):
+            operators, requests, patients, tau, k = build_instance(n_requests=60, n_operators=3, seed=seed)
+            ledger = AssignmentLedger()
+            engine(operators, requests, patients, shift_end=750, down_time_true=True, tau=tau, k=k,
+                   ledger=ledger, ledger_session=(0, 'm'))
+
+            assert [r["id"] for r in ledger.unassigned(requests)] == [r["id"] for r in scan_unassigned(operators, requests, k)]
+            for op in operators:
+                for req, b_i in op["Lo_k"][k]:
+                    entry = ledger.entries[req["id"]]
+                    assert (entry["status"], entry["operator"], entry["b_i"]) == (ASSIGNED, op["id"], b_i)
+
+            stats = ledger.summary((0, 'm'))
+            assert stats['total_requests'] == len(requests)
+            assert stats['assigned'] == sum(len(op["Lo_k"][k]) for op in operators)
+            assert stats['arrival_fail'] + stats['work_fail'] == stats['not_assigned']
@@ -0,0 +1,130 @@
+import sys
+import os
+import tempfile
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from checkpoint import (save_checkpoint, load_checkpoint, latest_checkpoint, discard_checkpoints, checkpoint_path,
+                        operator_state, restore_operators, previous_session)
+from kpi_accumulator import KPIAccumulator
+
+
+def build_operators():
+    return [{"id": o, "Lo": [], "wo": 0, "do": 0, "road_time": 0, "overtime_minutes": 0, "Lo_k": {}, "wo_k": {}}
+            for o in range(3)]
+
+
+def test_checkpoint_round_trip_restores_operators():
+    operators = build_operators()
+    operators[1]["Lo"].append(({"id": 7, "day": 0}, 480))
+    operators[1]["wo"] = 95
+    operators[1]["Lo_k"][2] = ["temporaneo"]
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        save_checkpoint(checkpoint_dir, 0, "m", {"operators": operator_state(operators), "total_cost": 12.5})
+        state = load_checkpoint(checkpoint_path(checkpoint_dir, 0, "m"))
+
+    assert (state["day"], state["session"], state["total_cost"]) == (0, "m", 12.5)
+    # il chiamante conserva i riferimenti agli stessi dizionari degli operatori
+    fresh = build_operators()
+    refs = list(fresh)
+    restore_operators(fresh, state["operators"])
+    assert all(a is b for a, b in zip(fresh, refs))
+    assert fresh[1]["Lo"] == [({"id": 7, "day": 0}, 480)] and fresh[1]["wo"] == 95
+    assert all("Lo_k" not in op for op in fresh)
+
+
+def test_rerun_discards_later_checkpoints():
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        for day in range(5):
+            for session in ("m", "a"):
+                save_checkpoint(checkpoint_dir, day, session, {"operators": []})
+        assert latest_checkpoint(checkpoint_dir) == checkpoint_path(checkpoint_dir, 4, "a")
+
+        # rielaborazione del giorno 2: si riparte dal pomeriggio del giorno 1
+        start = previous_session(2, "m")
+        assert start == (1, "a")
+        assert latest_checkpoint(checkpoint_dir, before=(2, "m")) == checkpoint_path(checkpoint_dir, *start)
+        removed = discard_checkpoints(checkpoint_dir, start)
+        assert len(removed) == 6
+        # una ripresa successiva parte dal giorno rielaborato, non dal vecchio giorno 4
+        assert latest_checkpoint(checkpoint_dir) == checkpoint_path(checkpoint_dir, *start)
+
+        discard_checkpoints(checkpoint_dir)
+        assert latest_checkpoint(checkpoint_dir) is None
+
+
+def test_checkpoint_restores_kpi_overtime():
+    operators = build_operators()
+    kpi = KPIAccumulator(operators)
+    req = {"id": 7, "day": 0, "duration": 30}
+    operators[1]["Lo"].append((req, 480))
+    operators[1]["overtime_minutes"] = 20
+    kpi.commit(operators[1], (0, "m"), [(req, 480)], waiting=5, road=10, worked=45, overtime=20)
+    # overtime_minutes vale solo per l'ultima sessione: quello della sessione precedente va perso
+    operators[1]["overtime_minutes"] = 0
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        save_checkpoint(checkpoint_dir, 0, "m", {"operators": operator_state(operators), "kpi": kpi.state()})
+        state = load_checkpoint(checkpoint_path(checkpoint_dir, 0, "m"))
+
+    fresh = build_operators()
+    restore_operators(fresh, state["operators"])
+    resumed = KPIAccumulator(fresh)
+    assert resumed.week_totals["overtime"] == 0
+    resumed.restore(state["kpi"])
+    assert resumed.week_totals == kpi.week_totals and resumed.week_totals["overtime"] == 20
+    assert resumed.operator_session((0, "m"), 1)["ids"] == [7]
+
+
+def test_writer_saves_checkpoint_after_session_rows(tmp_path, monkeypatch):
+    import schedule_store
+    from scheduling_writer import SchedulingWriter
+    from checkpoint import checkpoint_payload
+    monkeypatch.setattr(schedule_store, "RESULTS_DIR", str(tmp_path))
+
+    operators = build_operators()
+    baseline = operator_state(operators)
+    operators[0]["Lo"] = [({"id": 7, "project_id": 1, "min_time_begin": "8.00", "max_time_begin": "10.00",
+                            "duration": 30}, 480)]
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    state = {"operators": operator_state(operators)}
+
+    writer = SchedulingWriter([{"id": 1, "lat": 45.0, "lon": 9.0}])
+    writer.submit(operators, baseline, {}, variant_name="T", day=0, session="m",
+                  checkpoint=(checkpoint_dir, checkpoint_payload(0, "m", state)))
+    # Lo stato viene serializzato alla submit: le modifiche successive non entrano nel checkpoint
+    operators[0]["Lo"].append(({"id": 8}, 600))
+    writer.close()
+
+    saved = load_checkpoint(latest_checkpoint(checkpoint_dir))
+    assert [req["id"] for req, _ in saved["operators"][0]["Lo"]] == [7]
+    store = schedule_store.ScheduleStore("T")
+    rows = store.conn.execute("SELECT request FROM schedule WHERE day = 0 AND session = 'm'").fetchall()
+    store.close()
+    assert rows == [(7,)]
+
+
+def test_writer_skips_checkpoint_when_rows_fail(tmp_path, monkeypatch):
+    import schedule_store
+    from scheduling_writer import SchedulingWriter
+    from checkpoint import checkpoint_payload
+    monkeypatch.setattr(schedule_store, "RESULTS_DIR", str(tmp_path))
+
+    def fail(self, day, session, operator_rows):
+        raise OSError("disco pieno")
+    monkeypatch.setattr(schedule_store.ScheduleStore, "write_session", fail)
+
+    operators = build_operators()
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    writer = SchedulingWriter([])
+    writer.submit(operators, operator_state(operators), {}, variant_name="T", day=0, session="m",
+                  checkpoint=(checkpoint_dir, checkpoint_payload(0, "m", {"operators": []})))
+    try:
+        writer.close()
+    except OSError:
+        pass
+    else:
+        raise AssertionError("l'errore del thread deve essere rilanciato da close()")
+    assert latest_checkpoint(checkpoint_dir) is None
@@ -0,0 +1,78 @@
+import sys
+import os
+import random
+import itertools
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from cluster_assignment import (assign_operators_greedy, assign_operators_optimal, cluster_demands,
+                                medoid_patient_ids, OPERATOR_TAU_OFFSET)
+
+
+def build_instance(n_ops, mu, seed):
+    """
+    Istanza giocattolo: operatori e medoidi su una retta, tau = distanza.
+    """
+    rng = random.Random(seed)
+    Ods = [{"id": o} for o in range(n_ops)]
+    medoids = {c: 100 + c for c in range(len(mu))}
+    position = {op["id"] + OPERATOR_TAU_OFFSET: rng.uniform(0, 50) for op in Ods}
+    position.update({m: rng.uniform(0, 50) for m in medoids.values()})
+    tau = {(a, b): abs(position[a] - position[b]) for a in position for b in position}
+    cluster_info = [{"cluster_idx": c, "mu_c": m} for c, m in enumerate(mu)]
+    return Ods, cluster_info, medoids, tau
+
+
+def total_cost(cluster_ops, medoids, tau):
+    return sum(tau[op["id"] + OPERATOR_TAU_OFFSET, medoids[c]] for c, ops in cluster_ops.items() for op in ops)
+
+
+def brute_force_cost(Ods, demands, medoids, tau):
+    """
+    Costo minimo su tutte le assegnazioni che rispettano esattamente la domanda di ogni cluster.
+    """
+    slots = [c for c, d in demands.items() for _ in range(d)]
+    best = float("inf")
+    for chosen in itertools.permutations(Ods, len(slots)):
+        best = min(best, sum(tau[op["id"] + OPERATOR_TAU_OFFSET, medoids[c]] for op, c in zip(chosen, slots)))
+    return best
+
+
+def test_optimal_is_minimal_and_not_worse_than_greedy():
+    for seed in range(30):
+        Ods, cluster_info, medoids, tau = build_instance(6, [1, 2, 1.6], seed)
+        demands = cluster_demands(cluster_info, 1)
+        optimal = assign_operators_optimal(Ods, cluster_info, medoids, tau, 1)
+        greedy = assign_operators_greedy(Ods, cluster_info, medoids, tau, 1)
+
+        for ops in (optimal, greedy):
+            assert {c: len(v) for c, v in ops.items()} == demands
+        assigned = [op["id"] for v in optimal.values() for op in v]
+        assert len(assigned) == len(set(assigned))
+        assert abs(total_cost(optimal, medoids, tau) - brute_force_cost(Ods, demands, medoids, tau)) < 1e-9
+        assert total_cost(optimal, medoids, tau) <= total_cost(greedy, medoids, tau) + 1e-9
+
+
+def test_optimal_covers_every_cluster_when_operators_are_short():
+    for seed in range(10):
+        Ods, cluster_info, medoids, tau = build_instance(4, [3, 2, 1], seed)
+        optimal = assign_operators_optimal(Ods, cluster_info, medoids, tau, 1)
+        assert sum(len(v) for v in optimal.values()) == 4
+        assert all(len(v) >= 1 for v in optimal.values())
+
+
+def test_medoid_positions_are_mapped_to_patient_ids():
+    # id dei pazienti non contigui: una posizione in Pds non è mai un id valido di tau
+    Pds = [{"id": 1010}, {"id": 2020}, {"id": 3030}, {"id": 4040}]
+    medoids_list = [3, 0]  # posizioni in Pds, come da MIPClustering.get_medoids()
+    medoids = medoid_patient_ids(medoids_list, Pds)
+    assert medoids == [4040, 1010]
+
+    Ods = [{"id": 0}, {"id": 1}]
+    position = {0 + OPERATOR_TAU_OFFSET: 0.0, 1 + OPERATOR_TAU_OFFSET: 10.0, 1010: 9.0, 4040: 1.0}
+    tau = {(a, b): abs(position[a] - position[b]) for a in position for b in position}
+    cluster_info = [{"cluster_idx": 0, "mu_c": 1}, {"cluster_idx": 1, "mu_c": 1}]
+    for assign in (assign_operators_optimal, assign_operators_greedy):
+        cluster_ops = assign(Ods, cluster_info, medoids, tau, 1)
+        assert {c: [op["id"] for op in ops] for c, ops in cluster_ops.items()} == {0: [0], 1: [1]}
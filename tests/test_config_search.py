@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from config_search import load_search_space, halving_rounds, SEARCH_SPACE_FILE
+from method_overview import variant_configurations
+
+
+def write_space(tmp_path, **space):
+    space.setdefault("rungs", [{"days": 1, "Kmax": 3}, {"days": 7, "Kmax": 37}])
+    path = tmp_path / "space.json"
+    path.write_text(json.dumps(space))
+    return str(path)
+
+
+def test_default_space_keeps_variant_letters():
+    configurations, eta, rungs = load_search_space(SEARCH_SPACE_FILE)
+    assert sorted(configurations) == sorted(variant_configurations())
+
+
+def test_subset_keeps_variant_letters(tmp_path):
+    path = write_space(tmp_path, epsilon=[0.6, 0.4], down_time_true=[False], multiplier=[1])
+    configurations, _, _ = load_search_space(path)
+    letters = {tuple(config): letter for letter, *config in variant_configurations()}
+    assert [c[0] for c in configurations] == [letters[(0.6, False, 1)], letters[(0.4, False, 1)]]
+
+
+def test_new_configurations_get_free_letters(tmp_path):
+    path = write_space(tmp_path, epsilon=[0.5, 0.7], down_time_true=[True], multiplier=[1.25])
+    configurations, _, _ = load_search_space(path)
+    used = {letter for letter, *_ in variant_configurations()}
+    assert configurations[0] == ("A", 0.5, True, 1.25)
+    assert configurations[1][0] not in used
+
+
+def test_halving_rounds_promotes_best():
+    configurations = variant_configurations()
+    rungs = [{"days": 1, "Kmax": 3}, {"days": 2, "Kmax": 5}, {"days": 7, "Kmax": 37}]
+    # Costo crescente con la lettera nei rung ridotti, invertito nell'ultimo rung
+    cost = {letter: i for i, (letter, *_) in enumerate(configurations)}
+    evaluated = []
+
+    def evaluate(survivors, rung_idx, rung):
+        evaluated.append([c[0] for c in survivors])
+        return {c[0]: cost[c[0]] for c in survivors}
+
+    def run_final(survivors, rung):
+        evaluated.append([c[0] for c in survivors])
+        return {c[0]: -cost[c[0]] for c in survivors}
+
+    summary = halving_rounds(configurations, 2, rungs, evaluate, run_final)
+    assert evaluated == [list("ABCDEFGHIJKL"), list("ABCDEF"), list("ABC")]
+    assert summary["best"] == "C"
+    assert summary["configuration"] == dict(zip(("epsilon", "down_time_true", "multiplier"), configurations[2][1:]))
+    assert [h["rung"] for h in summary["history"]] == [0, 1, 2]
@@ -0,0 +1,52 @@
+import sys
+import os
+import json
+import logging
+import tempfile
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from diagnostics import log, configure_logging, diagnostic, diagnostics_enabled
+from scheduling_writer import session_rows
+
+
+def test_diagnostic_disabled_writes_nothing(capfd):
+    configure_logging("WARNING")
+    assert not diagnostics_enabled()
+    diagnostic("unassigned_request", request=1, reason="arrival")
+    out, err = capfd.readouterr()
+    assert out == "" and err == ""
+
+
+def test_diagnostic_writes_json_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "diagnostics.jsonl")
+        configure_logging("WARNING", path)
+        try:
+            assert diagnostics_enabled()
+            diagnostic("unassigned_request", request=1, reason="arrival")
+            diagnostic("operator_state", operator=3, session=(0, "m"))
+        finally:
+            configure_logging("WARNING")
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+    assert [r["event"] for r in records] == ["unassigned_request", "operator_state"]
+    assert records[0]["request"] == 1 and records[0]["reason"] == "arrival"
+    assert records[1]["session"] == [0, "m"]
+
+
+def test_scheduling_warnings_use_logger(capsys):
+    configure_logging("WARNING")
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    log.addHandler(handler)
+    try:
+        # seconda richiesta che inizia prima della fine della prima: waiting negativo
+        snapshot = [(1, 0, 0, [(1, 5, "8.00", "9.00", 30, 480, 0), (2, 5, "8.00", "9.00", 30, 490, 0)])]
+        session_rows(snapshot, [], [])
+    finally:
+        log.removeHandler(handler)
+    assert capsys.readouterr().out == ""
+    assert [r.levelno for r in records] == [logging.WARNING]
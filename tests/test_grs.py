@@ -0,0 +1,54 @@
+import sys
+import os
+import random
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from grs import grs_time, filter_operators_by_cluster
+from operators_requests import Node, Operator, Request
+
+
+def build_instance(n_requests=15, n_operators=6, clusters=(None, 0, 1), seed=0):
+    """
+    Istanza sintetica con cluster_id misti (None compreso) per operatori e richieste;
+    ogni cluster ha abbastanza operatori da non richiederne di aggiuntivi.
+    """
+    rng = random.Random(seed)
+    operators = [Operator(id=o, home=Node(id=1000 + o, coordinates=(rng.uniform(0, 20), rng.uniform(0, 20))),
+                          cluster_id=clusters[o % len(clusters)])
+                 for o in range(n_operators)]
+    requests = []
+    for i in range(n_requests):
+        alpha = rng.randint(420, 600)
+        requests.append(Request(i=i, patient=Node(id=i, coordinates=(rng.uniform(0, 20), rng.uniform(0, 20))),
+                                duration=rng.choice([15, 30]), temporal_window=(alpha, alpha + 60),
+                                cluster_id=rng.choice(clusters)))
+    return operators, requests
+
+
+def test_operators_without_cluster():
+    # Operatori e richieste senza cluster (cluster_id None di default): GRS termina
+    # e non aggiunge alla lista del chiamante gli operatori già presenti
+    home = Node(id=0, coordinates=(0, 0))
+    operators = [Operator(id=1, home=home), Operator(id=2, home=home)]
+    request = Request(i=1, patient=Node(id=1, coordinates=(3, 4)), duration=30, temporal_window=(420, 480),
+                      cluster_id=None)
+
+    schedule, stats = grs_time(operators, [request])
+
+    assert [op.id for op in operators] == [1, 2]
+    assert stats['assigned'] == 1
+    assert schedule[1] == [request]
+
+
+def test_cluster_filter_matches_filter_operators_by_cluster():
+    # Ogni richiesta assegnata va a un operatore tra quelli di filter_operators_by_cluster
+    operators, requests = build_instance()
+    schedule, stats = grs_time(operators, requests)
+    by_id = {op.id: op for op in operators}
+
+    assert stats['assigned'] + stats['not_assigned'] == len(requests)
+    for op_id, reqs in schedule.items():
+        for req in reqs:
+            assert by_id[op_id] in filter_operators_by_cluster(req, operators)
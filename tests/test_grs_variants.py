@@ -0,0 +1,43 @@
+import sys
+import os
+from copy import deepcopy
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from grs_variants import grs_variants, grs_variants_batch, get_cost_variant, GRS_COST_VARIANTS
+from test_local_search import build_instance
+
+
+def routes(operators, k):
+    return {op["id"]: [(req["id"], b_i) for req, b_i in op["Lo_k"][k]] for op in operators}
+
+
+def test_registry_aliases_and_unknown_variant():
+    assert get_cost_variant("Saturami") is get_cost_variant("MaxTimeUse")
+    assert get_cost_variant("LasciamiInPace") is get_cost_variant("MinResidualTime")
+    try:
+        get_cost_variant("Sconosciuta")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("una variante non registrata deve sollevare ValueError")
+
+
+def test_batch_matches_sequential_runs():
+    variants = sorted(set(GRS_COST_VARIANTS))
+    for seed in range(3):
+        operators, requests, patients, tau, k = build_instance(n_requests=50, n_operators=3, seed=seed)
+        original = deepcopy(requests)
+        batch = grs_variants_batch(variants, operators, requests, patients, 750, True, tau, k)
+        # operatori e richieste passati non vengono modificati
+        assert requests == original and all(not op["Lo_k"][k] for op in operators)
+
+        for variant in variants:
+            ops_seq, reqs_seq = deepcopy(operators), deepcopy(requests)
+            rc, ovc, doc, not_used = grs_variants(ops_seq, reqs_seq, patients, 750, True, tau, k, variant=variant)
+            result = batch[variant]
+            assert (result["routing_cost"], result["overtime_cost"], result["waiting_time"]) == (rc, ovc, doc)
+            assert result["not_used_ops"] == not_used
+            assert routes(result["operators"], k) == routes(ops_seq, k)
+            assert [r.get("b_i") for r in result["requests"]] == [r.get("b_i") for r in reqs_seq]
@@ -0,0 +1,119 @@
+import sys
+import os
+import random
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from grs_variants import grs_variants
+from local_search import local_search, route_node, Route, CostModel, apply_route
+from utils import parse_time_to_minutes, set_operator_state_morning
+
+
+def build_instance(n_patients=30, n_requests=40, n_operators=5, seed=0):
+    """
+    Genera un'istanza sintetica per la sessione mattutina con tau euclideo.
+    """
+    rng = random.Random(seed)
+    coords = {p: (rng.uniform(0, 20), rng.uniform(0, 20)) for p in range(n_patients)}
+    tau = {}
+    for a, (xa, ya) in coords.items():
+        for b, (xb, yb) in coords.items():
+            tau[a, b] = round(((xa - xb) ** 2 + (ya - yb) ** 2) ** 0.5)
+
+    requests = []
+    for i in range(n_requests):
+        alpha = rng.randint(7, 10) + rng.choice([0, 0.15, 0.30, 0.45])
+        beta = alpha + rng.choice([1, 2])
+        requests.append({
+            "id": i,
+            "project_id": rng.randrange(n_patients),
+            "day": 0,
+            "duration": rng.choice([20, 30, 45]),
+            "min_time_begin": f"{alpha:.2f}",
+            "max_time_begin": f"{beta:.2f}",
+        })
+
+    k = 1
+    operators = []
+    for o in range(n_operators):
+        op = {"id": o, "Ho": 600, "wo": 0, "Lo": []}
+        set_operator_state_morning(op)
+        op["Lo_k"] = {k: []}
+        op["wo_k"] = {k: 0}
+        op["do_k"] = {k: 0}
+        op["road_time_k"] = {k: 0}
+        op["overtime_minutes_k"] = {k: 0}
+        op["worked_after_11:30am_k"] = {}
+        op["eo_start_k"] = {k: op["eo"]}
+        operators.append(op)
+
+    patients = [{"id": p} for p in coords]
+    return operators, requests, patients, tau, k
+
+
+def session_cost(operators, k, model, tau):
+    total = 0
+    for op in operators:
+        route = Route(op, [route_node(req) for (req, _) in op["Lo_k"][k]], op["eo_start_k"][k], op["wo"], 0)
+        route.refresh(tau)
+        cost = model.route_cost(route.sub(0, len(route.nodes) - 1), route)
+        assert cost is not None
+        total += cost[0]
+    return total
+
+
+def test_segment_evaluation_matches_forward_simulation():
+    operators, requests, patients, tau, k = build_instance(seed=1)
+    grs_variants(operators, requests, patients, shift_end=750, down_time_true=True, tau=tau, k=k)
+    model = CostModel(750, 0.37, 0.29, True)
+
+    for op in operators:
+        route = Route(op, [route_node(req) for (req, _) in op["Lo_k"][k]], op["eo_start_k"][k], op["wo"], 0)
+        route.refresh(tau)
+        _, _, _, waiting = model.route_cost(route.sub(0, len(route.nodes) - 1), route)
+        # do_k e wo_k sono quelli calcolati da grs_variants in avanti
+        assert abs(waiting - op["do_k"][k]) < 1e-6
+        road, wo = op["road_time_k"][k], op["wo_k"][k]
+        apply_route(route, tau, k, 750)
+        assert abs(op["road_time_k"][k] - road) < 1e-6
+        assert abs(op["wo_k"][k] - wo) < 1e-6
+
+
+def test_local_search_improves_and_keeps_feasibility():
+    for seed in range(5):
+        operators, requests, patients, tau, k = build_instance(seed=seed)
+        grs_variants(operators, requests, patients, shift_end=750, down_time_true=True, tau=tau, k=k)
+        model = CostModel(750, 0.37, 0.29, True)
+        assigned_before = sorted(req["id"] for op in operators for (req, _) in op["Lo_k"][k])
+        cost_before = session_cost(operators, k, model, tau)
+
+        local_search(operators, shift_end=750, tau=tau, k=k, time_budget=5, down_time_true=True)
+
+        assigned_after = sorted(req["id"] for op in operators for (req, _) in op["Lo_k"][k])
+        assert assigned_before == assigned_after
+        assert session_cost(operators, k, model, tau) <= cost_before + 1e-9
+
+        for op in operators:
+            for req, b_i in op["Lo_k"][k]:
+                assert parse_time_to_minutes(req["min_time_begin"]) <= b_i
+                assert b_i <= parse_time_to_minutes(req["max_time_begin"])
+            assert op["eo"] <= 750
+
+
+def test_apply_route_keeps_worked_after_flag():
+    # Il flag impostato da un'assegnazione precedente non viene azzerato dalla ricerca locale
+    operators, requests, patients, tau, k = build_instance(seed=2)
+    grs_variants(operators, requests, patients, shift_end=750, down_time_true=True, tau=tau, k=k)
+    for op in operators:
+        op["worked_after_11:30am_k"][k] = True
+        route = Route(op, [route_node(req) for (req, _) in op["Lo_k"][k]], op["eo_start_k"][k], op["wo"], 0)
+        route.refresh(tau)
+        apply_route(route, tau, k, 750)
+        assert op["worked_after_11:30am_k"][k] is True
+
+
+if __name__ == "__main__":
+    test_segment_evaluation_matches_forward_simulation()
+    test_local_search_improves_and_keeps_feasibility()
+    test_apply_route_keeps_worked_after_flag()
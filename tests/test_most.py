@@ -0,0 +1,63 @@
+import sys
+import os
+import random
+
+import numpy as np
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from MOST import MOST, MOST_batch, patient_profiles, cluster_concurrency
+from utils import parse_time_to_minutes
+
+
+def random_requests(rng, n, n_patients=10):
+    requests = []
+    for i in range(n):
+        alpha = rng.randint(7, 11) + rng.choice([0, 0.10, 0.20, 0.30, 0.45])
+        beta = alpha + rng.choice([0, 0.30, 1, 2])
+        requests.append({"id": i, "project_id": rng.randrange(n_patients), "duration": rng.choice([10, 25, 40, 90]),
+                         "min_time_begin": f"{alpha:.2f}", "max_time_begin": f"{beta:.2f}"})
+    return requests
+
+
+def brute_force(requests, session_start, session_end, slot_minutes):
+    """
+    Conteggio slot per slot come nella versione originale di MOST (matrice richieste x slot),
+    con gli istanti session_start + t * slot_minutes limitati alla sessione.
+    """
+    intervals = [(parse_time_to_minutes(req["max_time_begin"]), parse_time_to_minutes(req["min_time_begin"]) + req["duration"])
+                 for req in requests]
+    n_s = (session_end - session_start) // slot_minutes
+    peak = 0
+    for t in range(n_s + 1):
+        time_slot = session_start + t * slot_minutes
+        peak = max(peak, sum(1 for beta, end in intervals if beta <= time_slot < end))
+    return peak
+
+
+def test_most_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(100):
+        requests = random_requests(rng, rng.randint(0, 25))
+        for slot_minutes in (1, 5, 10):
+            assert MOST(requests, 420, 750, slot_minutes) == brute_force(requests, 420, 750, slot_minutes)
+        # valutazione esatta: ogni istante della sessione (slot di un minuto con orari interi)
+        assert MOST(requests, 420, 750, None) == brute_force(requests, 420, 750, 1)
+
+
+def test_batch_and_cluster_profiles_match_most():
+    rng = random.Random(1)
+    for _ in range(50):
+        requests = random_requests(rng, 30)
+        patient_ids = list(range(10))
+        labels = np.array([rng.randrange(-1, 3) for _ in patient_ids])
+        subsets = [[r for r in requests if labels[r["project_id"]] == c] for c in range(3)]
+
+        expected = [MOST(subset, 420, 750) for subset in subsets]
+        assert MOST_batch(subsets, 420, 750) == expected
+
+        profiles, durations = patient_profiles(requests, patient_ids, 420, 750)
+        mc, total_durations = cluster_concurrency(profiles, durations, labels, 3)
+        assert list(mc) == expected
+        assert list(total_durations) == [sum(r["duration"] for r in subset) for subset in subsets]
@@ -0,0 +1,134 @@
+import sys
+import os
+import random
+import time
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from online_replanning import insert_request, cancel_request, _session_totals
+from utils import parse_time_to_minutes
+
+# Obiettivo di latenza di una singola modifica (secondi)
+REPLAN_TARGET = 1.0
+
+
+def build_instance(n_patients=12, n_requests=16, n_operators=4, seed=0):
+    """
+    Istanza sintetica di un solo giorno con tau euclideo e un piano con un cluster
+    per sessione che contiene tutti i pazienti e tutti gli operatori.
+    """
+    rng = random.Random(seed)
+    coords = {p: (rng.uniform(0, 20), rng.uniform(0, 20)) for p in range(n_patients)}
+    tau = {(a, b): round(((xa - xb) ** 2 + (ya - yb) ** 2) ** 0.5)
+           for a, (xa, ya) in coords.items() for b, (xb, yb) in coords.items()}
+
+    def request(i, session):
+        alpha = (rng.randint(7, 10) if session == 'm' else rng.randint(16, 18)) + rng.choice([0, 0.15, 0.30, 0.45])
+        return {"id": i, "project_id": rng.randrange(n_patients), "day": 0, "duration": rng.choice([20, 30]),
+                "min_time_begin": f"{alpha:.2f}", "max_time_begin": f"{alpha + 2:.2f}"}
+
+    requests = [request(i, 'm' if i % 2 else 'a') for i in range(n_requests)]
+    operators = [{"id": o, "Ho": 600, "wo": 0, "do": 0, "road_time": 0, "Lo": [], "overtime_minutes": 0}
+                 for o in range(n_operators)]
+    patients = [{"id": p} for p in coords]
+    cluster = {"k": 1, "medoids": {0: 0}, "clusters": {0: list(coords)}, "cluster_ops": {0: [o for o in range(n_operators)]}}
+    plan = {(0, 'm'): dict(cluster), (0, 'a'): dict(cluster)}
+    return plan, operators, requests, patients, tau, request
+
+
+def assigned_ids(operators):
+    return sorted(req["id"] for op in operators for (req, _) in op["Lo"])
+
+
+def check_totals(operators, tau):
+    # wo, road_time e do coincidono con quelli ricostruiti dalle assegnazioni consolidate
+    for op in operators:
+        sessions = {}
+        for req, b_i in op["Lo"]:
+            sessions.setdefault(parse_session(req), []).append((req, b_i))
+        totals = [_session_totals(entries, tau) for entries in sessions.values()]
+        assert abs(op["wo"] - sum(t[0] for t in totals)) < 1e-6
+        assert abs(op["road_time"] - sum(t[1] for t in totals)) < 1e-6
+        assert abs(op["do"] - sum(t[2] for t in totals)) < 1e-6
+
+
+def parse_session(req):
+    return 'm' if parse_time_to_minutes(req["min_time_begin"]) < 750 else 'a'
+
+
+def test_insert_and_cancel():
+    plan, operators, requests, patients, tau, request = build_instance()
+    # Il primo inserimento di ogni sessione pianifica tutte le richieste del cluster
+    morning, afternoon = request(100, 'm'), request(101, 'a')
+    result_m = insert_request(plan, operators, requests, patients, tau, morning)
+    result_a = insert_request(plan, operators, requests, patients, tau, afternoon)
+    assert (result_m["day"], result_m["session"]) == (0, 'm')
+    assert (result_a["day"], result_a["session"]) == (0, 'a')
+    unassigned = {r["id"] for r in result_m["unassigned_requests"] + result_a["unassigned_requests"]}
+    assert sorted(assigned_ids(operators) + sorted(unassigned)) == sorted(r["id"] for r in requests)
+    check_totals(operators, tau)
+
+    # Inserimento nella sessione mattutina: le assegnazioni pomeridiane restano invariate
+    afternoon_before = {op["id"]: [e for e in op["Lo"] if parse_session(e[0]) == 'a'] for op in operators}
+    start = time.perf_counter()
+    result = insert_request(plan, operators, requests, patients, tau, request(102, 'm'))
+    assert time.perf_counter() - start < REPLAN_TARGET
+    assert 102 in assigned_ids(operators) or 102 in {r["id"] for r in result["unassigned_requests"]}
+    for op in operators:
+        assert [e for e in op["Lo"] if parse_session(e[0]) == 'a'] == afternoon_before[op["id"]]
+        # b_i in ordine all'interno della sessione
+        b = [b_i for (req, b_i) in op["Lo"] if parse_session(req) == 'm']
+        assert b == sorted(b)
+    check_totals(operators, tau)
+
+    # Cancellazione: la richiesta sparisce da requests e dagli operatori
+    target = assigned_ids(operators)[0]
+    cancel_request(plan, operators, requests, patients, tau, target)
+    assert target not in assigned_ids(operators)
+    assert target not in [r["id"] for r in requests]
+    check_totals(operators, tau)
+
+
+def test_replan_updates_operator_state():
+    plan, operators, requests, patients, tau, request = build_instance(seed=3)
+    insert_request(plan, operators, requests, patients, tau, request(100, 'm'))
+    insert_request(plan, operators, requests, patients, tau, request(101, 'a'))
+    for op in operators:
+        op["overtime_minutes"] = 7
+    # Ripianificare la mattina (non l'ultima sessione) non cambia l'overtime dell'ultima sessione
+    insert_request(plan, operators, requests, patients, tau, request(102, 'm'))
+    cluster_ops = plan[(0, 'm')]["cluster_ops"][0]
+    for op in operators:
+        if op["id"] in cluster_ops:
+            assert op["overtime_minutes"] == 7
+            expected = any(b_i >= 11*60 + 30 and parse_time_to_minutes(req["min_time_begin"]) < 12*60 + 30
+                           for req, b_i in op["Lo"])
+            assert op["worked_after_11:30am"] == expected
+
+
+def test_replan_ignores_later_sessions_work():
+    plan, operators, requests, patients, tau, request = build_instance(seed=5)
+    insert_request(plan, operators, requests, patients, tau, request(100, 'm'))
+    insert_request(plan, operators, requests, patients, tau, request(101, 'a'))
+    assert any(parse_session(req) == 'a' for op in operators for req, _ in op["Lo"])
+    # Una mattina dura al massimo 330 minuti: con Ho = 330 ripianificarla non può andare
+    # in overtime, anche se w_o della settimana comprende già il pomeriggio
+    for op in operators:
+        op["Ho"] = 330
+    result = insert_request(plan, operators, requests, patients, tau, request(102, 'm'), down_time_true=True)
+    assert result["overtime_cost"] == 0
+    check_totals(operators, tau)
+
+
+def test_insert_rejects_unknown_patient():
+    plan, operators, requests, patients, tau, request = build_instance()
+    new_request = dict(request(100, 'm'), project_id=999)
+    try:
+        insert_request(plan, operators, requests, patients, tau, new_request)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("un paziente assente da patients e tau deve sollevare ValueError")
+    assert 100 not in [r["id"] for r in requests]
+    assert 999 not in plan[(0, 'm')]["clusters"][0]
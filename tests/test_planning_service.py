@@ -0,0 +1,44 @@
+import sys
+import os
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from planning_service import PlanningService, PlanRequestError, parse_plan
+
+
+def test_parse_plan_rejects_unsafe_variant():
+    for variant in ("../escape", "a/b", "", "nome con spazi", 3):
+        try:
+            parse_plan({"variant": variant})
+        except PlanRequestError:
+            pass
+        else:
+            raise AssertionError(f"variant {variant!r} dovrebbe essere rifiutata")
+    assert parse_plan({"variant": "Prova_2-b"})[0] == "Prova_2-b"
+
+
+def test_dispatch_status_codes():
+    service = PlanningService()
+    # pool senza dati caricati: la pianificazione stessa fallisce
+    service.pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        def dispatch(body):
+            return asyncio.run(service.dispatch("POST", "/plan", body))[0]
+
+        assert dispatch(b"{non json") == 400
+        assert dispatch(b"\xff") == 400
+        assert dispatch(json.dumps({"variant": "../x"}).encode()) == 400
+        assert dispatch(json.dumps({"sconosciuto": 1}).encode()) == 400
+        assert dispatch(json.dumps({"Kmax": 5}).encode()) == 500
+    finally:
+        service.pool.shutdown()
+
+
+def test_default_variant_names_include_pid():
+    service = PlanningService()
+    assert service._variant_prefix.startswith(f"service{os.getpid()}_")
+    assert parse_plan({"variant": f"{service._variant_prefix}_1"})[0] is not None
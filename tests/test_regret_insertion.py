@@ -0,0 +1,47 @@
+import sys
+import os
+from copy import deepcopy
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from grs_variants import grs_variants
+from regret_insertion import regret_insertion
+from utils import parse_time_to_minutes
+from test_local_search import build_instance
+
+
+def session_cost(result, operators, requests, k):
+    """
+    Costo della sessione come in method_overview: routing + overtime + durata delle richieste non assegnate.
+    """
+    assigned = {req["id"] for op in operators for req, _ in op["Lo_k"][k]}
+    return result[0] + result[1] + sum(r["duration"] for r in requests if r["id"] not in assigned)
+
+
+def check_feasible(operators, tau, k):
+    seen = set()
+    for op in operators:
+        previous = None
+        for req, b_i in op["Lo_k"][k]:
+            assert req["id"] not in seen
+            seen.add(req["id"])
+            assert parse_time_to_minutes(req["min_time_begin"]) <= b_i <= parse_time_to_minutes(req["max_time_begin"])
+            assert req["b_i"] == b_i
+            if previous is not None:
+                prev_req, prev_b_i = previous
+                assert b_i >= prev_b_i + prev_req["duration"] + tau[prev_req["project_id"], req["project_id"]]
+            previous = (req, b_i)
+
+
+def test_regret_is_feasible_and_not_worse_than_greedy():
+    for seed in range(15):
+        for n_requests, n_operators in ((20, 3), (40, 5)):
+            operators, requests, patients, tau, k = build_instance(n_requests=n_requests, n_operators=n_operators,
+                                                                   seed=seed)
+            greedy_ops, greedy_reqs = deepcopy(operators), deepcopy(requests)
+            greedy = grs_variants(greedy_ops, greedy_reqs, patients, 750, True, tau, k)
+            regret = regret_insertion(operators, requests, patients, 750, True, tau, k)
+
+            check_feasible(operators, tau, k)
+            assert session_cost(regret, operators, requests, k) <= session_cost(greedy, greedy_ops, greedy_reqs, k) + 1e-9
@@ -0,0 +1,81 @@
+import sys
+import os
+
+import pandas as pd
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from results_warehouse import ResultsWarehouse
+
+
+def stats(total_cost, waiting="1:30"):
+    return {"Assigned Requests": 10, "Total Waiting Time": waiting, "Average Waiting Time": "0:15",
+            "Total Cost": total_cost, "Routing Cost": total_cost - 1, "Overtime Cost": 1, "Occupation Ratio": 90.5}
+
+
+def parameters(epsilon, days=None):
+    return {"epsilon": epsilon, "down_time_true": True, "multiplier": 1.25, "kmax": 37, "days": days}
+
+
+def test_record_run_latest_and_best(tmp_path):
+    with ResultsWarehouse(str(tmp_path / "results.sqlite")) as warehouse:
+        first = warehouse.record_run("A", parameters(0.5, days=[0, 1]), stats(50), objective_cost=49.5)
+        warehouse.record_run("B", parameters(0.4), stats(30))
+        warehouse.record_run("C", parameters(0.6), {})
+        # Seconda esecuzione di A: latest e best considerano solo questa
+        warehouse.record_run("A", parameters(0.5), stats(20))
+
+        run = warehouse.runs("A").iloc[0]
+        assert run["run_id"] == first
+        assert (run["days"], run["objective_cost"], run["total_waiting_time"]) == ("0,1", 49.5, 90)
+        assert len(warehouse.runs()) == 4
+
+        latest = warehouse.latest()
+        assert list(latest["variant"]) == ["A", "B", "C"]
+        assert list(latest["total_cost"][:2]) == [20, 30]
+
+        # La variante senza statistiche (NULL) va in fondo
+        assert list(warehouse.best()["variant"]) == ["A", "B", "C"]
+        assert list(warehouse.best(n=1)["variant"]) == ["A"]
+        assert list(warehouse.query(order_by="epsilon", limit=2)["variant"]) == ["B", "A"]
+
+
+def test_query_rejects_sql(tmp_path):
+    with ResultsWarehouse(str(tmp_path / "results.sqlite")) as warehouse:
+        warehouse.record_run("A", parameters(0.5), stats(50))
+        for bad in ("total_cost; DROP TABLE runs", "total_cost LIMIT 1"):
+            for call in (lambda: warehouse.best(bad), lambda: warehouse.query(order_by=bad)):
+                try:
+                    call()
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f"order_by {bad!r} deve sollevare ValueError")
+        assert len(warehouse.runs()) == 1
+
+
+def test_export_combined_is_incremental(tmp_path):
+    path = str(tmp_path / "combined_results.csv")
+    with ResultsWarehouse(str(tmp_path / "results.sqlite")) as warehouse:
+        assert warehouse.export_combined(path) is None
+
+        warehouse.record_run("A", parameters(0.5), stats(50))
+        warehouse.record_run("B", parameters(0.4), stats(30))
+        assert warehouse.export_combined(path) == path
+        combined = pd.read_csv(path, dtype={"Variant": str})
+        assert list(combined["Variant"]) == ["A", "B"]
+        assert list(combined["Total Waiting Time"]) == ["1:30", "1:30"]
+
+        # Nessuna nuova esecuzione: il file resta invariato
+        before = open(path).read()
+        assert warehouse.export_combined(path) == path
+        assert open(path).read() == before
+
+        # Una nuova esecuzione di B sostituisce solo la riga di B
+        warehouse.record_run("B", parameters(0.4), stats(25, waiting="2:05"))
+        warehouse.export_combined(path)
+        combined = pd.read_csv(path, dtype={"Variant": str})
+        assert list(combined["Variant"]) == ["A", "B"]
+        assert list(combined["Total Cost"]) == [50, 25]
+        assert list(combined["Total Waiting Time"]) == ["1:30", "2:05"]
@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+import rolling_horizon
+from rolling_horizon import iter_weeks, plan_rolling_horizon
+from kpi_accumulator import KPIAccumulator
+
+
+class Ledger:
+    def summary(self):
+        return {}
+
+
+def fake_method_overview(requests, operators, patients, tau, variant, **kwargs):
+    """
+    Assegna ogni richiesta all'operatore 0 e consolida due sessioni per giorno con
+    overtime solo nella prima: overtime_minutes a fine settimana vale quindi 0.
+    """
+    kpi = KPIAccumulator(operators)
+    op = operators[0]
+    for req in requests:
+        for session, overtime in (('m', 10), ('a', 0)):
+            new = [(req, 480)] if session == 'm' else []
+            kpi.commit(op, (req["day"], session), new, waiting=0, road=5, worked=req["duration"], overtime=overtime)
+            op["Lo"] += new
+            op["wo"] += req["duration"]
+            op["road_time"] += 5
+            op["overtime_minutes"] = overtime
+    return {"total_cost": 1, "total_overtime_cost": 0, "total_routing_cost": 1,
+            "best_k": {}, "ledger": Ledger(), "kpi": kpi}
+
+
+def test_iter_weeks():
+    stream = ({"id": i, "day": day} for i, day in enumerate([0, 6, 7, 13]))
+    weeks = list(iter_weeks(stream))
+    assert [w for w, _ in weeks] == [0, 1]
+    assert [[(r["day"], r["abs_day"]) for r in reqs] for _, reqs in weeks] == [[(0, 0), (6, 6)], [(0, 7), (6, 13)]]
+
+
+def test_two_weeks_carry_kpi_overtime(tmp_path, monkeypatch):
+    monkeypatch.setattr(rolling_horizon, "method_overview", fake_method_overview)
+    monkeypatch.setattr(rolling_horizon, "RESULTS_DIR", str(tmp_path))
+    operators = [{"id": o, "Ho": 600, "wo": 0, "do": 0, "road_time": 0, "Lo": [], "overtime_minutes": 0}
+                 for o in range(2)]
+    # Settimana 0: due richieste, settimana 1: una richiesta
+    stream = [{"id": i, "day": day, "duration": 30} for i, day in enumerate([0, 3, 8])]
+
+    totals = plan_rolling_horizon(iter(stream), operators, [], {}, "T", epsilon=0.5, down_time_true=False,
+                                  Kmax=2, multiplier=1)
+    assert totals["weeks"] == 2
+
+    op = operators[0]
+    # Overtime di tutte le sessioni (10 per richiesta), non quello dell'ultima (0)
+    assert op["total_overtime_minutes"] == 30
+    assert op["total_worked_minutes"] == 2 * 30 * 3
+    assert op["total_road_time"] == 2 * 5 * 3
+    assert op["weeks_planned"] == 2
+    assert (op["Lo"], op["wo"], op["overtime_minutes"]) == ([], 0, 0)
+    assert operators[1]["total_overtime_minutes"] == 0
+
+    with open(tmp_path / "rolling_T.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["week"] for r in records] == [0, 1]
+    assert [r["operators"][0]["overtime_minutes"] for r in records] == [20, 10]
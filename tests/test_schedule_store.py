@@ -0,0 +1,57 @@
+import sys
+import os
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+import schedule_store
+from schedule_store import ScheduleStore
+from scheduling_writer import snapshot_scheduling, session_rows, patient_coordinates, format_operator_session
+
+
+def build_rows():
+    patients = [{"id": 1, "lat": 45.0, "lon": 9.0}, {"id": 2, "lat": 45.1, "lon": 9.1}]
+    requests = [{"id": 10, "project_id": 1, "min_time_begin": "8.00", "max_time_begin": "10.00", "duration": 30},
+                {"id": 11, "project_id": 2, "min_time_begin": "9.00", "max_time_begin": "11.00", "duration": 45}]
+    operators = [{"id": 0, "lat": 44.9, "lon": 8.9, "current_patient_id": None,
+                  "Lo": [(requests[0], 480), (requests[1], 530)]},
+                 {"id": 1, "lat": 44.8, "lon": 8.8, "current_patient_id": None, "Lo": []}]
+    baseline = [{"id": op["id"], "Lo": []} for op in operators]
+    # tau manca per lo spostamento iniziale: nello store resta "N/A"
+    snapshot = snapshot_scheduling(operators, baseline, {(1, 2): 12})
+    return operators, session_rows(snapshot, *patient_coordinates(patients))
+
+
+def test_write_session_round_trip(tmp_path):
+    _, rows = build_rows()
+    store = ScheduleStore("T", path=str(tmp_path / "schedule.sqlite"))
+    store.write_session(0, 'm', rows)
+    assert store.operator_rows(0, 'm') == rows
+    assert store.operator_rows(0, 'm', operator=1) == [rows[1]]
+    assert store.operator_rows(0, 'a') == []
+    assert store.days() == [0]
+
+    # Una nuova scrittura della stessa sessione sostituisce la precedente
+    store.write_session(0, 'm', rows[:1])
+    assert store.operator_rows(0, 'm') == rows[:1]
+    store.clear()
+    assert store.days() == []
+    store.close()
+
+
+def test_render_weekly_from_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(schedule_store, "RESULTS_DIR", str(tmp_path))
+    operators, rows = build_rows()
+    store = ScheduleStore("T")
+    store.write_session(2, 'a', rows)
+    paths = store.render_weekly(operators)
+    store.close()
+
+    assert [os.path.basename(p) for p in paths] == ["weekly_schedule_Op0.txt", "weekly_schedule_Op1.txt"]
+    with open(paths[0], encoding="utf-8") as f:
+        weekly = f.read()
+    assert "=== Pianificazione Settimanale Operatore ID: 0 ===" in weekly
+    assert "--- MERCOLEDI - Sessione Mattina ---\n(Nessuna assegnazione registrata per questa sessione)" in weekly
+    assert format_operator_session(*rows[0])[1] in weekly
+    with open(paths[1], encoding="utf-8") as f:
+        assert "Nessuna nuova richiesta assegnata in questa sessione" in f.read()
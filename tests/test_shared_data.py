@@ -0,0 +1,63 @@
+import sys
+import os
+import pickle
+import random
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from shared_data import SharedTau, SharedObject
+
+
+def build_tau(seed=0):
+    """
+    tau sparsa con id non contigui (come le case degli operatori, id + 249)
+    e una chiave non numerica come quelle aggiunte da GRS.
+    """
+    rng = random.Random(seed)
+    nodes = [1, 2, 5, 8, 250, 253]
+    tau = {(i, j): round(rng.uniform(1, 60), 2) for i in nodes for j in nodes if rng.random() < 0.7}
+    tau[('h', 5)] = 7
+    return tau, nodes
+
+
+def test_shared_tau_matches_dict():
+    tau, nodes = build_tau()
+    shared = SharedTau.create(tau)
+    try:
+        # copia collegata allo stesso blocco, come nei processi figli
+        attached = pickle.loads(pickle.dumps(shared))
+        keys = [(i, j) for i in nodes + [99] for j in nodes + [99]] + [('h', 5), ('h', 1), 'x']
+        for view in (shared, attached):
+            for key in keys:
+                assert (key in view) == (key in tau)
+                assert view.get(key, -1) == tau.get(key, -1)
+                if key in tau:
+                    assert view[key] == tau[key]
+                else:
+                    try:
+                        view[key]
+                    except KeyError:
+                        pass
+                    else:
+                        raise AssertionError(f"{key} dovrebbe sollevare KeyError")
+
+        # le scritture restano locali alla copia che le fa
+        shared[('h', 1)] = 3
+        assert shared[('h', 1)] == 3 and ('h', 1) not in attached
+        attached.close()
+    finally:
+        shared.unlink()
+
+
+def test_shared_object_returns_independent_copies():
+    data = {"operators": [{"id": 1, "Lo": []}]}
+    shared = SharedObject.create(data)
+    try:
+        first = shared.load()
+        first["operators"][0]["Lo"].append(4)
+        attached = pickle.loads(pickle.dumps(shared))
+        assert attached.load() == data
+        attached.close()
+    finally:
+        shared.unlink()
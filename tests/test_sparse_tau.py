@@ -0,0 +1,125 @@
+import sys
+import os
+import csv
+
+import numpy as np
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, scripts_path)
+
+from sparse_tau import SparseTau, tau_coordinates, haversine_km
+from cluster_assignment import OPERATOR_TAU_OFFSET
+
+K = 4
+
+
+def build_grid(side=6, n_operators=2, noise=True):
+    """
+    Griglia side x side di pazienti e n_operators case, con tau denso = 2 + 3 * distanza_km
+    più un disturbo deterministico (se noise) che distingue i tempi esatti dalla stima.
+    """
+    patients = [{"id": r * side + c, "lat": 45.0 + 0.01 * r, "lon": 9.0 + 0.013 * c}
+                for r in range(side) for c in range(side)]
+    operators = [{"id": o, "lat": 45.003 + 0.02 * o, "lon": 9.004 + 0.03 * o} for o in range(n_operators)]
+    coords, hubs = tau_coordinates(patients, operators)
+    tau = {}
+    for i, (lat1, lon1) in coords.items():
+        for j, (lat2, lon2) in coords.items():
+            extra = ((7 * i + 3 * j) % 5) if noise and i != j else 0
+            tau[i, j] = 0.0 if i == j else 2 + 3 * float(haversine_km(lat1, lon1, lat2, lon2)) + extra
+    return tau, coords, hubs
+
+
+def test_kept_pairs_match_dense():
+    tau, coords, hubs = build_grid()
+    sparse = SparseTau.from_tau(tau, coords, K, hubs)
+    # ogni riga CSR contiene il nodo stesso più i suoi K vicini più prossimi
+    assert (np.diff(sparse.indptr) == K + 1).all()
+    nodes = sparse.nodes.tolist()
+    for a, i in enumerate(nodes):
+        row = [nodes[b] for b in sparse.indices[sparse.indptr[a]:sparse.indptr[a + 1]]]
+        assert i in row and all(sparse.is_exact((i, j)) for j in row)
+        for j in coords:
+            key = (i, j)
+            if sparse.is_exact(key):
+                assert np.isclose(sparse[key], tau[key], rtol=1e-6)
+                assert np.isclose(sparse.get(key), tau[key], rtol=1e-6)
+            else:
+                assert sparse[key] == sparse.estimate(i, j)
+            assert key in sparse
+
+
+def test_hub_rows_and_columns_are_exact():
+    tau, coords, hubs = build_grid()
+    sparse = SparseTau.from_tau(tau, coords, K, hubs)
+    assert hubs == [OPERATOR_TAU_OFFSET, OPERATOR_TAU_OFFSET + 1]
+    for hub in hubs:
+        for node in coords:
+            assert sparse.is_exact((hub, node)) and sparse.is_exact((node, hub))
+            assert np.isclose(sparse[hub, node], tau[hub, node], rtol=1e-6)
+            assert np.isclose(sparse[node, hub], tau[node, hub], rtol=1e-6)
+
+
+def test_missing_keys_and_local_writes():
+    tau, coords, hubs = build_grid()
+    sparse = SparseTau.from_tau(tau, coords, K, hubs)
+    assert ('h', 5) not in sparse and (0, 999) not in sparse
+    assert sparse.get((0, 999), "assente") == "assente"
+    try:
+        sparse[999, 0]
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("un nodo sconosciuto deve sollevare KeyError")
+    # Le scritture (es. le chiavi ('h', id) di GRS) restano in locale e hanno la precedenza
+    sparse['h', 5] = 0
+    sparse[0, 1] = 123
+    assert ('h', 5) in sparse and sparse['h', 5] == 0
+    assert sparse[0, 1] == 123
+
+
+def test_calibrate_fits_linear_times():
+    tau, coords, hubs = build_grid(noise=False)
+    sparse = SparseTau.from_tau(tau, coords, K, hubs)
+    intercept, slope = sparse.calibration
+    assert np.isclose(intercept, 2, atol=1e-3) and np.isclose(slope, 3, atol=1e-3)
+    # Senza disturbo anche le coppie stimate coincidono con tau
+    for key, value in tau.items():
+        assert np.isclose(sparse[key], value, atol=1e-3)
+
+    # Senza tempi esatti la stima è nulla
+    empty = SparseTau.build(coords, lambda i, j: tau[()], K, hubs)
+    assert empty.calibration == (0.0, 0.0)
+    assert empty[0, 35] == 0.0
+
+
+def test_from_csv_matches_from_tau(tmp_path):
+    tau, coords, hubs = build_grid()
+    path = tmp_path / "travel_times.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["i", "j", "tau"])
+        # anche coppie di nodi sconosciuti, che vanno ignorate
+        writer.writerow([999, 0, 1.0])
+        for (i, j), value in tau.items():
+            writer.writerow([i, j, value])
+    from_csv = SparseTau.from_csv(str(path), coords, K, hubs)
+    from_tau = SparseTau.from_tau(tau, coords, K, hubs)
+    for name in ("indptr", "indices", "data", "hub_out", "hub_in"):
+        assert np.allclose(getattr(from_csv, name), getattr(from_tau, name), rtol=1e-6)
+    assert np.allclose(from_csv.calibration, from_tau.calibration)
+
+
+def test_save_load_round_trip(tmp_path):
+    tau, coords, hubs = build_grid()
+    sparse = SparseTau.from_tau(tau, coords, K, hubs)
+    sparse['h', 0] = 0
+    path = str(tmp_path / "tau.npz")
+    sparse.save(path)
+    loaded = SparseTau.load(path)
+    assert loaded.calibration == sparse.calibration
+    assert loaded.nbytes == sparse.nbytes
+    for key in tau:
+        assert loaded[key] == sparse[key]
+    # le chiavi locali non vengono salvate
+    assert ('h', 0) not in loaded
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+scripts_path = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+
+# Tempo massimo (secondi) per importare method_overview in un interprete nuovo
+STARTUP_TARGET = 1.5
+
+# Moduli di grafici, report e solver che non devono essere importati all'avvio
+HEAVY_MODULES = ("matplotlib", "geopandas", "contextily", "sklearn", "gurobipy", "pandas", "scipy")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import method_overview
+elapsed = time.perf_counter() - start
+import data_loader
+print(elapsed)
+print(",".join(m for m in {heavy!r} if m in sys.modules))
+print(data_loader._data is None)
+"""
+
+
+def run_probe():
+    """
+    Importa method_overview in un processo separato (avvio a freddo) e restituisce
+    tempo di import, moduli pesanti caricati e se i CSV sono ancora da leggere.
+    """
+    result = subprocess.run([sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+                            cwd=scripts_path, capture_output=True, text=True, check=True)
+    elapsed, loaded, data_pending = result.stdout.strip().splitlines()
+    return float(elapsed), [m for m in loaded.split(",") if m], data_pending == "True"
+
+
+def test_import_is_lazy_and_fast():
+    elapsed, loaded, data_pending = run_probe()
+    assert loaded == []
+    assert data_pending
+    assert elapsed < STARTUP_TARGET, f"Import di method_overview in {elapsed:.2f}s (obiettivo {STARTUP_TARGET}s)"